@@ -0,0 +1,308 @@
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+
+from starlette.routing import Match, compile_path
+
+# Default requests per minute per client (0 disables rate limiting) and burst size
+DEFAULT_RATE_PER_MINUTE = 0.0
+DEFAULT_BURST = 20
+
+# Default admitted requests running at once, requests that may wait for a slot, and how long
+DEFAULT_MAX_CONCURRENT = 64
+DEFAULT_QUEUE_SIZE = 128
+DEFAULT_QUEUE_TIMEOUT = 5.0
+
+# Clients whose token buckets are kept; the least recently seen are dropped beyond it
+DEFAULT_MAX_CLIENTS = 10000
+
+logger = logging.getLogger(__name__)
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, reason: str, retry_after: float, detail: str):
+        """A request turned away by admission control"""
+        super().__init__(detail)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    def __init__(self, rate_per_minute: float = DEFAULT_RATE_PER_MINUTE, burst: int = DEFAULT_BURST,
+                 max_clients: int = DEFAULT_MAX_CLIENTS, clock=time.monotonic):
+        """
+        Token bucket per client
+
+        Each client may send burst requests at once, refilled at
+        rate_per_minute. Buckets of clients not seen for a while are dropped
+        once max_clients are tracked; a dropped client starts with a full
+        bucket again.
+
+        Args:
+            rate_per_minute (float): Sustained requests per minute per client (0 disables the limit)
+            burst (int): Bucket size
+            max_clients (int): Buckets kept
+            clock: Monotonic time source
+        """
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_clients = max_clients
+        self.clock = clock
+        self._buckets = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, client: str) -> float:
+        """
+        Take a token from a client's bucket
+
+        Returns:
+            float: 0 if the request may go ahead, else seconds until a token is available
+        """
+        now = self.clock()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = _Bucket(self.burst, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return 0.0
+        return (1 - bucket.tokens) / self.rate
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limit: int = DEFAULT_MAX_CONCURRENT, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 queue_timeout: float = DEFAULT_QUEUE_TIMEOUT):
+        """
+        Bounded number of requests running at once, with a bounded FIFO queue
+
+        A request that finds every slot taken waits in the queue for at most
+        queue_timeout seconds; when the queue is full it is turned away at
+        once. A released slot goes straight to the longest waiting request.
+        Used from the event loop thread only, so it takes no lock.
+
+        Args:
+            limit (int): Requests running at once
+            queue_size (int): Requests that may wait for a slot
+            queue_timeout (float): Longest wait for a slot in seconds
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = deque()
+        # Smoothed time a slot is held, for Retry-After estimates
+        self._hold = 1.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> float:
+        """Rough time until a newly queued request would get a slot"""
+        return self._hold * (self.queued + 1) / self.limit
+
+    async def acquire(self) -> float:
+        """
+        Wait for a slot
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            Rejected: The queue is full, or no slot freed up within queue_timeout
+        """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return 0.0
+        if len(self._waiters) >= self.queue_size:
+            raise Rejected(503, "queue_full", self.retry_after(), "Server busy, try again later")
+
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise Rejected(503, "queue_timeout", self.retry_after(), "Server busy, try again later")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the request went away
+                self.release()
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+        return time.perf_counter() - start
+
+    def release(self, held: float = None):
+        """
+        Free a slot, handing it to the next waiting request if there is one
+
+        Args:
+            held (float): Seconds the slot was held, for Retry-After estimates
+        """
+        if held is not None:
+            self._hold += (held - self._hold) * 0.1
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionController:
+    def __init__(self, rate_limiter: RateLimiter, limiter: ConcurrencyLimiter, queue_wait=None):
+        """
+        Decides whether a request may run: per-client rate limit first, then a concurrency slot
+
+        Args:
+            rate_limiter (RateLimiter): Per-client token buckets
+            limiter (ConcurrencyLimiter): Global concurrency limit and queue
+            queue_wait (metrics.Histogram): Optional histogram of waits for a slot
+        """
+        self.rate_limiter = rate_limiter
+        self.limiter = limiter
+        self.queue_wait = queue_wait
+        self.admitted = 0
+        self.rejected = {"rate_limited": 0, "queue_full": 0, "queue_timeout": 0}
+
+    async def admit(self, client: str):
+        """
+        Wait until a request of the client may run; release() must follow
+
+        Raises:
+            Rejected: 429 over the client's rate, 503 when no slot is free in time
+        """
+        try:
+            if self.rate_limiter.enabled:
+                wait = self.rate_limiter.take(client)
+                if wait:
+                    raise Rejected(429, "rate_limited", wait, "Too many requests")
+            waited = await self.limiter.acquire()
+        except Rejected as rejection:
+            self.rejected[rejection.reason] += 1
+            raise
+        self.admitted += 1
+        if self.queue_wait is not None:
+            self.queue_wait.observe(waited)
+
+    def release(self, held: float = None):
+        self.limiter.release(held)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.limiter.active,
+            "queued": self.limiter.queued,
+            "limit": self.limiter.limit,
+            "queue_size": self.limiter.queue_size,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "clients": len(self.rate_limiter),
+        }
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, controller: AdmissionController, paths, client_header: str = ""):
+        """
+        ASGI middleware running requests to the given paths through admission control
+
+        Other paths pass straight through. A client over its rate gets 429,
+        and a request that can't get a slot (queue full or waited too long)
+        gets 503, both with a Retry-After header. The slot is held until the
+        response, including a streamed body, is finished.
+
+        Args:
+            app: ASGI application
+            controller (AdmissionController): Rate limits and concurrency slots
+            paths: Request paths or route templates (e.g. /sessions/{session_id}/messages) that need admission
+            client_header (str): Header identifying the client (e.g. X-Forwarded-For
+                behind a proxy); the peer address is used when empty or missing
+        """
+        self.app = app
+        self.controller = controller
+        self.paths = frozenset(path for path in paths if "{" not in path)
+        self.templates = [compile_path(path)[0] for path in paths if "{" in path]
+        self.client_header = client_header.lower().encode("latin-1")
+
+    def _client(self, scope) -> str:
+        if self.client_header:
+            for name, value in scope["headers"]:
+                if name == self.client_header:
+                    # First hop of a forwarding chain
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def _admitted(self, path: str) -> bool:
+        return path in self.paths or any(template.match(path) for template in self.templates)
+
+    @staticmethod
+    async def _reject(scope, send, rejection: Rejected):
+        # Resolve the route like the router would, so request metrics label the rejection by route
+        router = getattr(scope.get("app"), "router", None)
+        for route in getattr(router, "routes", ()):
+            match, child_scope = route.matches(scope)
+            if match is Match.FULL:
+                scope.update(child_scope)
+                break
+        body = json.dumps({"detail": rejection.detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": rejection.status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(rejection.retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._admitted(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.controller.admit(self._client(scope))
+        except Rejected as rejection:
+            if rejection.status == 503:
+                logger.warning("Shed %s %s: %s", scope["method"], scope["path"], rejection.reason,
+                               extra={"reason": rejection.reason})
+            await self._reject(scope, send, rejection)
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(time.perf_counter() - start)
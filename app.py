@@ -1,18 +1,48 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Header, Request, Query, Response
 from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+import functools
+import importlib
 import json
 import os
 import asyncio
-from typing import List, Optional
+import time
+from typing import List, Literal, Optional
 from pydantic import BaseModel
-import aiofiles
-from main_mock import PineconeAssistant
+from dotenv import load_dotenv
+from assistant_pool import DEFAULT_WAIT_SECONDS, AssistantPool, AssistantUnavailable, UnknownAssistant
+from concurrency import DEFAULT_STREAM_WORKERS, UpstreamExecutor
+from cache import DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS, ResponseCache
+from coalesce import SharedStreams, SingleFlight, prompt_key
+from uploads import (DEFAULT_CHUNK_SIZE, DEFAULT_INGEST_CONCURRENCY, DEFAULT_MAX_BATCH_FILES,
+                     DEFAULT_MAX_UPLOAD_MB, IngestionJobs, UploadTooLarge, save_upload)
+from manifest import UploadManifest
+from file_index import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, FileIndex, reserved
+from sessions import DEFAULT_IDLE_SECONDS, DEFAULT_MEMORY_MB, SessionStore
+from history import (DEFAULT_HISTORY_TOKENS, DEFAULT_KEEP_RECENT, DEFAULT_SUMMARY_TOKENS, HistoryCompactor,
+                     message_tokens)
+from resilience import (DEFAULT_FAILURE_THRESHOLD, DEFAULT_HEDGE_MAX_RATIO, DEFAULT_HEDGE_PERCENTILE,
+                        DEFAULT_PROBE_INTERVAL, DEFAULT_PROBE_TIMEOUT, DEFAULT_RESET_SECONDS, DEFAULT_RETRIES,
+                        DEFAULT_STREAM_IDLE_SECONDS, DEFAULT_TIMEOUT_SECONDS, CircuitBreaker, HealthProbe,
+                        ResilientUpstream)
+from admission import (DEFAULT_BURST, DEFAULT_MAX_CONCURRENT, DEFAULT_QUEUE_SIZE, DEFAULT_QUEUE_TIMEOUT,
+                       DEFAULT_RATE_PER_MINUTE, AdmissionController, AdmissionMiddleware, ConcurrencyLimiter,
+                       RateLimiter)
+from log_pipeline import LogPipeline, RequestIdMiddleware
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, MetricsRegistry
+from sse import (DEFAULT_FLUSH_BYTES, DEFAULT_FLUSH_INTERVAL, MEDIA_TYPE as SSE_MEDIA_TYPE, EventStream,
+                 StreamEnd, usage_dict)
+from static_assets import IMMUTABLE, REVALIDATE, AssetStore
+from tracing import DEFAULT_SAMPLE_INTERVAL, ProfileStore, TracingMiddleware, current_trace, span, token_matches
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Load environment variables before any setting is read
+load_dotenv()
+
+# Logs are written by a background thread as JSON lines (LOG_LEVEL, LOG_FORMAT,
+# LOG_SAMPLE_RATE and LOG_QUEUE_SIZE), so request handlers never wait on stderr
+log_pipeline = LogPipeline.from_env()
+log_pipeline.install()
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
@@ -22,12 +52,283 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Mount static files and templates
+# Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
 
-# Global assistant instance
-assistant = None
+# Prometheus metrics, served by GET /metrics
+metrics = MetricsRegistry()
+request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route, including streamed bodies",
+    ("method", "route", "status")
+)
+requests_in_flight = metrics.gauge("http_requests_in_flight", "HTTP requests being handled")
+upstream_call_duration = metrics.histogram(
+    "upstream_call_duration_seconds", "Blocking assistant calls by method, including time waiting for a worker",
+    ("call",)
+)
+stream_first_chunk = metrics.histogram(
+    "stream_time_to_first_chunk_seconds", "Time from a /chat/stream request to its first content chunk",
+    ("source",)
+)
+stream_chunks = metrics.histogram(
+    "stream_chunks", "Content chunks received per /chat/stream response", ("source",),
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+)
+stream_frames = metrics.histogram(
+    "stream_frames", "Events sent per /chat/stream response, after coalescing", ("source",),
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+)
+upload_bytes = metrics.counter("upload_bytes", "Bytes of uploaded files written to disk")
+ingestion_duration = metrics.histogram(
+    "ingestion_duration_seconds", "Time to ingest an uploaded file, once its job started", ("status",)
+)
+
+# Admission control for the endpoints that call the upstream: per-client rate
+# limits (429) and a global concurrency limit with a bounded queue (503)
+ADMITTED_PATHS = ("/chat", "/chat/stream", "/chat/history", "/chat/batch", "/sessions/{session_id}/messages",
+                  "/upload", "/upload/batch")
+admission = AdmissionController(
+    RateLimiter(
+        rate_per_minute=float(os.getenv("RATE_LIMIT_PER_MINUTE", DEFAULT_RATE_PER_MINUTE)),
+        burst=int(os.getenv("RATE_LIMIT_BURST", DEFAULT_BURST))
+    ),
+    ConcurrencyLimiter(
+        limit=int(os.getenv("MAX_CONCURRENT_REQUESTS", DEFAULT_MAX_CONCURRENT)),
+        queue_size=int(os.getenv("ADMISSION_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)),
+        queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", DEFAULT_QUEUE_TIMEOUT))
+    ),
+    queue_wait=metrics.histogram("admission_queue_wait_seconds", "Time admitted requests waited for a slot")
+)
+metrics.collect("admission_in_flight", "Admitted requests running", "gauge", lambda: admission.limiter.active)
+metrics.collect("admission_queue_depth", "Requests waiting for a slot", "gauge", lambda: admission.limiter.queued)
+metrics.collect(
+    "admission_rejected", "Requests turned away by admission control, by reason", "counter",
+    lambda: {(reason,): count for reason, count in admission.rejected.items()}, ("reason",)
+)
+# Added first so it runs inside the metrics and tracing middleware, which then see the rejections
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=admission,
+    paths=ADMITTED_PATHS,
+    client_header=os.getenv("RATE_LIMIT_CLIENT_HEADER", "")
+)
+app.add_middleware(MetricsMiddleware, duration=request_duration, in_flight=requests_in_flight)
+
+# Per-request phase timings (Server-Timing header and log), and profiles of
+# requests sent with X-Profile and a matching X-Admin-Token
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+profiles = ProfileStore()
+app.add_middleware(
+    TracingMiddleware,
+    enabled=os.getenv("SERVER_TIMING", "true").lower() == "true",
+    admin_token=ADMIN_TOKEN,
+    profiles=profiles,
+    sample_interval=float(os.getenv("PROFILE_INTERVAL_MS", DEFAULT_SAMPLE_INTERVAL * 1000)) / 1000
+)
+# Outermost, so every log record of a request, the tracing log line included, carries its id
+app.add_middleware(RequestIdMiddleware)
+metrics.collect(
+    "log_records_dropped", "Log records not written, by reason", "counter",
+    lambda: {("queue_full",): log_pipeline.handler.dropped, ("sampled_out",): log_pipeline.handler.sampled_out},
+    ("reason",)
+)
+
+# Output of build_static.py; templates are only loaded when it is missing
+BUILD_DIR = os.getenv("BUILD_DIR", "build")
+
+@functools.lru_cache(maxsize=1)
+def _static_assets():
+    """Fingerprinted, precompressed copies of static/ written by build_static.py"""
+    return AssetStore(BUILD_DIR)
+
+@functools.lru_cache(maxsize=1)
+def _prerendered_index():
+    """index.html rendered at build time with its precompressed variants, or None"""
+    return _static_assets().page("index.html")
+
+@functools.lru_cache(maxsize=1)
+def _templates():
+    """Jinja2 templates, imported on first use"""
+    from fastapi.templating import Jinja2Templates
+    return Jinja2Templates(directory="templates")
+
+# Worker pool for blocking assistant calls (size set by UPSTREAM_WORKERS)
+upstream = UpstreamExecutor(call_duration=upstream_call_duration)
+
+# Assistants that may be served, by name; the first one is the default
+DEFAULT_ASSISTANT = os.getenv("ASSISTANT_NAME", "manulassistan")
+ASSISTANT_NAMES = [DEFAULT_ASSISTANT] + [
+    name.strip() for name in os.getenv("ASSISTANT_NAMES", "").split(",")
+    if name.strip() and name.strip() != DEFAULT_ASSISTANT
+]
+
+# Assistant implementation: "mock" (canned answers), "pinecone" (main.py) or
+# "local" (offline retrieval over the uploaded documents, local_rag.py)
+ASSISTANT_BACKENDS = {
+    "mock": ("main_mock", "PineconeAssistant"),
+    "pinecone": ("main", "PineconeAssistant"),
+    "local": ("local_rag", "LocalAssistant"),
+}
+ASSISTANT_BACKEND = os.getenv("ASSISTANT_BACKEND", "mock").lower()
+if ASSISTANT_BACKEND not in ASSISTANT_BACKENDS:
+    raise ValueError(f"ASSISTANT_BACKEND must be one of {', '.join(ASSISTANT_BACKENDS)}, not '{ASSISTANT_BACKEND}'")
+
+def _create_assistant(name: str):
+    """Create an assistant; the backend module is imported here, off the startup path"""
+    module_name, class_name = ASSISTANT_BACKENDS[ASSISTANT_BACKEND]
+    return getattr(importlib.import_module(module_name), class_name)(name)
+
+# Assistant instances, created in the background on first use
+assistant_pool = AssistantPool(
+    _create_assistant,
+    ASSISTANT_NAMES,
+    upstream,
+    wait_timeout=float(os.getenv("ASSISTANT_WAIT_SECONDS", DEFAULT_WAIT_SECONDS))
+)
+
+# Separate pool for draining streamed answers, so long streams can't starve /chat
+stream_workers = UpstreamExecutor(
+    int(os.getenv("STREAM_WORKERS", DEFAULT_STREAM_WORKERS)),
+    thread_name_prefix="stream"
+)
+
+# Chat calls get a deadline, retries and optional hedging; a circuit breaker
+# fails them fast while the upstream keeps failing
+resilient = ResilientUpstream(
+    upstream,
+    CircuitBreaker(
+        failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", DEFAULT_FAILURE_THRESHOLD)),
+        reset_timeout=float(os.getenv("CIRCUIT_RESET_SECONDS", DEFAULT_RESET_SECONDS))
+    ),
+    timeout=float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS)),
+    attempt_timeout=float(os.getenv("UPSTREAM_ATTEMPT_TIMEOUT_SECONDS", 0)) or None,
+    retries=int(os.getenv("UPSTREAM_RETRIES", DEFAULT_RETRIES)),
+    hedge=os.getenv("UPSTREAM_HEDGE", "false").lower() == "true",
+    hedge_percentile=float(os.getenv("UPSTREAM_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE)),
+    hedge_max_ratio=float(os.getenv("UPSTREAM_HEDGE_MAX_RATIO", DEFAULT_HEDGE_MAX_RATIO)),
+    stream_idle_timeout=float(os.getenv("UPSTREAM_STREAM_IDLE_SECONDS", DEFAULT_STREAM_IDLE_SECONDS))
+)
+
+async def _probe_upstream():
+    """Health probe: a cheap request to the default assistant's upstream"""
+    instance = assistant_pool.peek()
+    if instance is None:
+        return False
+    ping = getattr(instance, "ping", None)
+    if ping is not None:
+        await upstream.run(ping)
+
+# /health reports the result of the last background probe instead of calling the upstream
+health_probe = HealthProbe(
+    _probe_upstream,
+    interval=float(os.getenv("HEALTH_PROBE_SECONDS", DEFAULT_PROBE_INTERVAL)),
+    timeout=float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", DEFAULT_PROBE_TIMEOUT))
+)
+
+# Cache of answers keyed on normalized question and detected intent
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+    ttl=float(os.getenv("CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+)
+
+# Concurrent identical questions share one upstream call or stream
+chat_flights = SingleFlight()
+stream_flights = SharedStreams()
+
+# Counters the cache and coalescers keep anyway, read when /metrics is scraped
+metrics.collect(
+    "response_cache_lookups", "Response cache lookups by result", "counter",
+    lambda: {("hit",): response_cache.hits, ("miss",): response_cache.misses}, ("result",)
+)
+metrics.collect("response_cache_entries", "Answers in the response cache", "gauge",
+                lambda: response_cache.stats()["entries"])
+metrics.collect("response_cache_evictions", "Answers evicted from the full response cache", "counter",
+                lambda: response_cache.evictions)
+metrics.collect(
+    "coalesced_requests", "Requests that shared another request's upstream call or stream", "counter",
+    lambda: {("chat",): chat_flights.stats()["coalesced"], ("stream",): stream_flights.stats()["coalesced"]},
+    ("endpoint",)
+)
+metrics.collect("upstream_retries", "Retried upstream chat calls", "counter", lambda: resilient.retried)
+metrics.collect("upstream_hedges", "Hedged upstream chat calls, by whether the hedge won", "counter",
+                lambda: {("true",): resilient.hedge_wins, ("false",): resilient.hedged - resilient.hedge_wins},
+                ("won",))
+metrics.collect("upstream_timeouts", "Upstream attempts that ran past their deadline", "counter",
+                lambda: resilient.timeouts)
+metrics.collect("upstream_circuit_rejections", "Calls failed fast by the open circuit", "counter",
+                lambda: resilient.breaker.rejected)
+metrics.collect("upstream_circuit_state", "State of the upstream circuit breaker (1 for the current one)", "gauge",
+                lambda: {(state,): int(resilient.breaker.state == state) for state in ("closed", "half_open", "open")},
+                ("state",))
+
+# Questions answered at once by one /chat/batch request, and the most it accepts
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "8"))
+MAX_BATCH_QUESTIONS = int(os.getenv("MAX_BATCH_QUESTIONS", "500"))
+
+# Server-side conversations for /sessions
+session_store = SessionStore(
+    max_bytes=int(float(os.getenv("SESSION_MEMORY_MB", DEFAULT_MEMORY_MB)) * 1024 * 1024),
+    idle_ttl=float(os.getenv("SESSION_IDLE_SECONDS", DEFAULT_IDLE_SECONDS))
+)
+
+# Token budget for the history sent with /chat/history and session messages
+history_compactor = HistoryCompactor(
+    budget=int(os.getenv("HISTORY_TOKEN_BUDGET", DEFAULT_HISTORY_TOKENS)),
+    keep_recent=int(os.getenv("HISTORY_KEEP_RECENT", DEFAULT_KEEP_RECENT)),
+    summary_tokens=int(os.getenv("HISTORY_SUMMARY_TOKENS", DEFAULT_SUMMARY_TOKENS))
+)
+
+
+def _history_window(messages: list, **kwargs):
+    """
+    Fit a conversation into the history budget, the only place it is compacted
+
+    Args:
+        messages (list): The conversation, as strings or message dicts
+        **kwargs: Passed on to HistoryCompactor.compact
+
+    Returns:
+        HistoryWindow: The messages to send to the assistant
+    """
+    window = history_compactor.compact(messages, **kwargs)
+    logger.info("History window: %d of %d messages, %d summarized, ~%d/%d tokens", len(window.messages),
+                len(messages), window.summarized, window.tokens_sent, window.tokens_available,
+                extra={"history_messages": len(messages), "summarized": window.summarized,
+                       "messages_sent": len(window.messages), "prompt_tokens": window.tokens_sent})
+    return window
+
+# Upload limits and background ingestion jobs
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", DEFAULT_MAX_UPLOAD_MB)) * 1024 * 1024)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_BYTES", DEFAULT_CHUNK_SIZE))
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", DEFAULT_MAX_BATCH_FILES))
+ingestion_jobs = IngestionJobs(max_concurrent=int(os.getenv("INGEST_CONCURRENCY", DEFAULT_INGEST_CONCURRENCY)))
+
+# App state kept outside the user-writable upload directory
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
+def _manifest_path() -> str:
+    """Path of the upload manifest, moving one left in UPLOAD_DIR by older versions"""
+    path = os.path.join(DATA_DIR, "upload_manifest.json")
+    legacy = os.path.join(UPLOAD_DIR, ".manifest.json")
+    if not os.path.exists(path) and os.path.exists(legacy):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        os.replace(legacy, path)
+    return path
+
+# Content hash -> remote file manifest, so identical files are only uploaded once
+upload_manifest = UploadManifest(_manifest_path())
+
+# Metadata of the uploaded files, served by GET /files
+file_index = FileIndex(UPLOAD_DIR)
+
+# Content hash -> task uploading that content, shared by concurrent identical uploads
+_content_uploads = {}
+
+# /chat/stream coalesces deltas arriving within SSE_FLUSH_MS into one event,
+# sending earlier once SSE_FLUSH_BYTES of text are waiting
+SSE_FLUSH_INTERVAL = float(os.getenv("SSE_FLUSH_MS", DEFAULT_FLUSH_INTERVAL * 1000)) / 1000
+SSE_FLUSH_BYTES = int(os.getenv("SSE_FLUSH_BYTES", DEFAULT_FLUSH_BYTES))
 
 # Pydantic models
 class ChatMessage(BaseModel):
@@ -42,190 +343,665 @@ class ChatResponse(BaseModel):
     response: str
     success: bool
     error: Optional[str] = None
+    cached: bool = False
+    tokens_sent: Optional[int] = None
+    tokens_available: Optional[int] = None
+
+class ChatBatch(BaseModel):
+    questions: List[str]
+    concurrency: Optional[int] = None
+    stream: Optional[bool] = False
+
+class ChatBatchItem(BaseModel):
+    index: int
+    question: str
+    response: str
+    success: bool
+    error: Optional[str] = None
+    cached: bool = False
+    latency_ms: float
+
+class ChatBatchResponse(BaseModel):
+    results: List[ChatBatchItem]
+    success: bool
+    concurrency: int
+    total_seconds: float
+
+class SessionMessage(BaseModel):
+    message: str
+
+class SessionResponse(BaseModel):
+    session_id: str
+    response: str
+    success: bool
+    error: Optional[str] = None
+    turns: int = 0
+    tokens_sent: Optional[int] = None
+    tokens_available: Optional[int] = None
 
 class UploadResponse(BaseModel):
     filename: str
     success: bool
     message: str
     error: Optional[str] = None
+    job_id: Optional[str] = None
 
-# Initialize assistant on startup
-def initialize_assistant():
-    global assistant
+class BatchUploadResponse(BaseModel):
+    success: bool
+    message: str
+    batch_id: Optional[str] = None
+    files: List[dict] = []
+
+def set_assistant(instance, name: str = None):
+    """Serve an existing assistant instance under a name (the default one if omitted)"""
+    assistant_pool.register(name or DEFAULT_ASSISTANT, instance)
+
+async def get_assistant(name: Optional[str] = None):
+    """Assistant for a request, waiting briefly if it is still starting"""
     try:
-        assistant = PineconeAssistant("manulassistan")
-        logger.info("Pinecone Assistant initialized successfully")
-    except Exception as e:
-        logger.error(f"Failed to initialize Pinecone Assistant: {e}")
-        assistant = None
+        return await assistant_pool.get(name)
+    except UnknownAssistant:
+        raise HTTPException(status_code=404, detail=f"Unknown assistant: {name}")
+    except AssistantUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 @app.on_event("startup")
 async def startup_event():
-    initialize_assistant()
+    # Create and warm up the default assistant in the background; others start on first use
+    # The file index is built by the first GET /files
+    assistant_pool.start()
+    health_probe.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    health_probe.close()
+    assistant_pool.close()
+    upstream.shutdown(wait=False)
+    stream_workers.shutdown(wait=False)
 
 # Root endpoint - serve the main UI
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    page = _prerendered_index()
+    if page is not None:
+        return page.response(request.headers, REVALIDATE)
+    return _templates().TemplateResponse(request, "index.html")
+
+# Fingerprinted static files - their URL changes with their content, so browsers keep them for good
+@app.get("/assets/{path:path}")
+async def static_asset(path: str, request: Request):
+    asset = _static_assets().get(path)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return asset.response(request.headers, IMMUTABLE)
 
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    assistant_status = assistant is not None
+    assistant_status = assistant_pool.peek() is not None
+    circuit = resilient.breaker.state
+    probe = health_probe.status()
+    if not assistant_status:
+        message = "Assistant not ready - starting or check API key"
+    elif circuit != "closed":
+        message = f"Upstream failing, calls paused for {resilient.breaker.retry_after():.0f}s"
+    elif probe["ok"] is False:
+        message = f"Upstream probe failed: {probe['error']}"
+    else:
+        message = "Assistant ready"
+    healthy = assistant_status and circuit == "closed" and probe["ok"] is not False
     return {
-        "status": "healthy" if assistant_status else "degraded",
+        "status": "healthy" if healthy else "degraded",
         "assistant_available": assistant_status,
-        "message": "Assistant ready" if assistant_status else "Assistant initialization failed - check API key"
+        "message": message,
+        "upstream": {"circuit": circuit, "probe": probe},
+        "assistants": assistant_pool.status()
     }
 
+def _remote_file_id(upload_response):
+    """Id of the remote file from an assistant upload response"""
+    if isinstance(upload_response, dict):
+        return upload_response.get("id")
+    return getattr(upload_response, "id", None)
+
+async def _delete_remote_content(entry):
+    """Delete content that no local file refers to any more from the assistant"""
+    remote_id = entry.get("remote_id")
+    target = assistant_pool.peek()
+    if remote_id and target:
+        await upstream.run(target.delete_file, remote_id)
+    response_cache.invalidate()
+
+async def _ingest_upload(job, file_path: str, digest: str):
+    """Make sure the content is uploaded once, then point the file name at it"""
+    start = time.perf_counter()
+    try:
+        await _ingest_content(job, file_path, digest)
+    except Exception:
+        ingestion_duration.labels("failed").observe(time.perf_counter() - start)
+        raise
+    ingestion_duration.labels("completed").observe(time.perf_counter() - start)
+
+async def _ingest_content(job, file_path: str, digest: str):
+    if upload_manifest.lookup(digest) is not None:
+        job.deduplicated = True
+    else:
+        task = _content_uploads.get(digest)
+        if task is not None:
+            # Identical content is being uploaded right now; share that upload
+            job.deduplicated = True
+            await task
+        else:
+            upstream_assistant = await assistant_pool.get()
+            
+            async def upload_content():
+                try:
+                    upload_response = await upstream.run(upstream_assistant.upload_file, file_path)
+                    upload_manifest.set_uploaded(digest, _remote_file_id(upload_response), job.size)
+                    response_cache.invalidate()
+                finally:
+                    _content_uploads.pop(digest, None)
+            
+            task = _content_uploads[digest] = asyncio.ensure_future(upload_content())
+            await task
+    
+    released = upload_manifest.link(job.filename, digest)
+    if released is not None:
+        # The file name previously held other content that is now unused
+        await _delete_remote_content(released)
+
+async def _receive_upload(file: UploadFile, filename: str):
+    """Stream one uploaded file to disk and start its ingestion job"""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    
+    # Stream uploaded file to disk in fixed-size chunks, hashing the content
+    file_path = os.path.join(UPLOAD_DIR, filename)
+    size, digest = await save_upload(file, file_path, max_bytes=MAX_UPLOAD_BYTES, chunk_size=UPLOAD_CHUNK_SIZE)
+    upload_bytes.inc(size)
+    file_index.record(filename)
+    
+    # Upload to Pinecone in the background, unless identical content is already there
+    job = ingestion_jobs.create(filename, size)
+    duplicate = upload_manifest.lookup(digest) is not None
+    ingestion_jobs.start(job, lambda: _ingest_upload(job, file_path, digest))
+    return job, duplicate
+
 # Upload file endpoint
 @app.post("/upload", response_model=UploadResponse)
 async def upload_file(file: UploadFile = File(...)):
-    if not assistant:
-        raise HTTPException(status_code=503, detail="Assistant not available")
+    await get_assistant()
+    
+    filename = os.path.basename(file.filename or "")
+    if not filename:
+        raise HTTPException(status_code=400, detail="Missing file name")
+    if reserved(filename):
+        raise HTTPException(status_code=400, detail="Reserved file name")
     
     try:
-        # Create uploads directory if it doesn't exist
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Save uploaded file
-        file_path = os.path.join(upload_dir, file.filename)
-        
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
-        
-        # Upload to Pinecone
-        upload_response = assistant.upload_file(file_path)
+        job, duplicate = await _receive_upload(file, filename)
         
         return UploadResponse(
-            filename=file.filename,
+            filename=filename,
             success=True,
-            message="File uploaded and processed successfully"
+            message="Identical file already processed" if duplicate else "File received, processing started",
+            job_id=job.id
         )
         
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        logger.error(f"Error uploading file: {e}")
+        logger.error("Error uploading file: %s", e)
         return UploadResponse(
-            filename=file.filename,
+            filename=filename,
             success=False,
             message="Upload failed",
             error=str(e)
         )
 
+# Batch upload endpoint
+@app.post("/upload/batch", response_model=BatchUploadResponse)
+async def upload_batch(files: List[UploadFile] = File(...)):
+    await get_assistant()
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_FILES} files per batch")
+    
+    # Files are written to disk one after another; ingestion runs in the
+    # background, at most INGEST_CONCURRENCY jobs at a time
+    jobs, rejected, seen = [], [], set()
+    for file in files:
+        filename = os.path.basename(file.filename or "")
+        if not filename:
+            rejected.append({"filename": file.filename or "", "error": "Missing file name"})
+            continue
+        if reserved(filename):
+            rejected.append({"filename": filename, "error": "Reserved file name"})
+            continue
+        if filename in seen:
+            rejected.append({"filename": filename, "error": "Duplicate file name in batch"})
+            continue
+        seen.add(filename)
+        try:
+            job, _ = await _receive_upload(file, filename)
+            jobs.append(job)
+        except Exception as e:
+            logger.error("Error uploading file %s in batch: %s", filename, e)
+            rejected.append({"filename": filename, "error": str(e)})
+    
+    batch = ingestion_jobs.create_batch(jobs, rejected)
+    return BatchUploadResponse(
+        success=bool(jobs),
+        message=f"{len(jobs)} of {len(files)} files received, processing started",
+        batch_id=batch.id,
+        files=batch.to_dict()["files"]
+    )
+
+# Batch processing status
+@app.get("/upload/batch/{batch_id}")
+async def upload_batch_status(batch_id: str):
+    batch = ingestion_jobs.get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Upload batch not found")
+    return batch.to_dict()
+
+# Upload processing status
+@app.get("/upload/{job_id}")
+async def upload_status(job_id: str):
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    return job.to_dict()
+
+def _cache_key(assistant, name: Optional[str], message: str) -> tuple:
+    """Response cache key: answers are cached per assistant, intent and normalized question"""
+    return (name or DEFAULT_ASSISTANT,) + response_cache.make_key(message, assistant.detect_intent(message))
+
+def _flight_key(assistant, name: Optional[str], message: str) -> tuple:
+    """Key identifying identical upstream requests: the assistant and the enhanced prompt sent to it"""
+    return (name or DEFAULT_ASSISTANT, prompt_key(assistant._enhance_user_message(message)))
+
+async def _answer(assistant, name: Optional[str], message: str):
+    """
+    Answer one question through the response cache and the upstream pool
+    
+    Args:
+        assistant: Assistant instance for the request
+        name (str): Its name (None for the default assistant)
+        message (str): User question
+    
+    Returns:
+        tuple: (answer text, whether it came from the cache)
+    """
+    with span("cache"):
+        cache_key = _cache_key(assistant, name, message)
+        content = response_cache.get(cache_key)
+    if content is not None:
+        return content, True
+    
+    generation = response_cache.generation
+    
+    async def fetch():
+        response = await resilient.run(assistant.chat, message, stream=False)
+        content = assistant.get_response_content(response)
+        response_cache.set(cache_key, content, generation)
+        return content
+    
+    # Identical questions already on their way upstream share that call
+    with span("enhance"):
+        flight_key = _flight_key(assistant, name, message)
+    with span("upstream"):
+        content = await chat_flights.do(flight_key, fetch)
+    return content, False
+
 # Chat endpoint (non-streaming)
 @app.post("/chat", response_model=ChatResponse)
-async def chat(chat_message: ChatMessage):
-    if not assistant:
-        raise HTTPException(status_code=503, detail="Assistant not available")
+async def chat(chat_message: ChatMessage, assistant_name: Optional[str] = Query(None, alias="assistant")):
+    assistant = await get_assistant(assistant_name)
     
     try:
-        response = assistant.chat(chat_message.message, stream=False)
-        content = assistant.get_response_content(response)
+        content, cached = await _answer(assistant, assistant_name, chat_message.message)
         
         return ChatResponse(
             response=content,
-            success=True
+            success=True,
+            cached=cached
         )
         
     except Exception as e:
-        logger.error(f"Error in chat: {e}")
+        logger.error("Error in chat: %s", e)
         return ChatResponse(
             response="",
             success=False,
             error=str(e)
         )
 
+# Batch Q&A endpoint for evaluation runs
+@app.post("/chat/batch", response_model=ChatBatchResponse)
+async def chat_batch(batch: ChatBatch, assistant_name: Optional[str] = Query(None, alias="assistant")):
+    assistant = await get_assistant(assistant_name)
+    if len(batch.questions) > MAX_BATCH_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_QUESTIONS} questions per batch")
+    
+    concurrency = max(1, min(batch.concurrency or CHAT_BATCH_CONCURRENCY, CHAT_BATCH_CONCURRENCY))
+    limit = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+    
+    async def answer_one(index: int, question: str) -> ChatBatchItem:
+        async with limit:
+            start = time.perf_counter()
+            content, cached, error = "", False, None
+            try:
+                content, cached = await _answer(assistant, assistant_name, question)
+            except Exception as e:
+                logger.error("Error in batch question %d: %s", index, e)
+                error = str(e)
+            return ChatBatchItem(
+                index=index,
+                question=question,
+                response=content,
+                success=error is None,
+                error=error,
+                cached=cached,
+                latency_ms=round((time.perf_counter() - start) * 1000, 2)
+            )
+    
+    tasks = [asyncio.ensure_future(answer_one(i, q)) for i, q in enumerate(batch.questions)]
+    
+    if batch.stream:
+        async def generate():
+            # One JSON object per line as each question finishes, then a summary line
+            try:
+                failed = 0
+                for next_done in asyncio.as_completed(tasks):
+                    item = await next_done
+                    failed += not item.success
+                    yield item.model_dump_json() + "\n"
+                summary = {"done": True, "total": len(tasks), "failed": failed, "concurrency": concurrency,
+                           "total_seconds": round(time.perf_counter() - started, 3)}
+                yield json.dumps(summary) + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+        
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+    
+    results = await asyncio.gather(*tasks)
+    return ChatBatchResponse(
+        results=results,
+        success=all(item.success for item in results),
+        concurrency=concurrency,
+        total_seconds=round(time.perf_counter() - started, 3)
+    )
+
 # Streaming chat endpoint
 @app.post("/chat/stream")
-async def chat_stream(chat_message: ChatMessage):
-    if not assistant:
-        raise HTTPException(status_code=503, detail="Assistant not available")
+async def chat_stream(chat_message: ChatMessage, assistant_name: Optional[str] = Query(None, alias="assistant")):
+    started = time.perf_counter()
+    assistant = await get_assistant(assistant_name)
     
     try:
-        async def generate():
-            chunks = assistant.chat(chat_message.message, stream=True)
-            for chunk in chunks:
-                if chunk and hasattr(chunk, 'delta') and hasattr(chunk.delta, 'content'):
-                    content = chunk.delta.content
+        with span("cache"):
+            cache_key = _cache_key(assistant, assistant_name, chat_message.message)
+            cached = response_cache.get(cache_key)
+        
+        async def upstream_pieces():
+            generation = response_cache.generation
+            parts = []
+            chunks = resilient.iterate(stream_workers, assistant.chat, chat_message.message, stream=True)
+            async for chunk in chunks:
+                delta = getattr(chunk, "delta", None)
+                if delta is not None:
+                    content = getattr(delta, "content", None)
                     if content:
-                        yield f"data: {json.dumps({'content': content})}\n\n"
-            yield f"data: {json.dumps({'content': '[DONE]'})}\n\n"
+                        parts.append(content)
+                        yield content
+                elif getattr(chunk, "usage", None) is not None:
+                    yield StreamEnd(usage_dict(chunk.usage), getattr(chunk, "finish_reason", None))
+            # Only complete answers are cached
+            if parts:
+                response_cache.set(cache_key, "".join(parts), generation)
+        
+        async def cached_pieces():
+            yield cached
+        
+        async def generate():
+            source = "cache" if cached is not None else "upstream"
+            if cached is not None:
+                # Cached answer: sent as one event
+                pieces = cached_pieces()
+            else:
+                with span("enhance"):
+                    flight_key = _flight_key(assistant, assistant_name, chat_message.message)
+                # Identical questions streaming right now share one upstream stream;
+                # late joiners get what was already sent replayed first
+                pieces = stream_flights.subscribe(flight_key, upstream_pieces)
+            
+            stream = EventStream(pieces, SSE_FLUSH_INTERVAL, SSE_FLUSH_BYTES, started=started,
+                                 cached=cached is not None)
+            waiting = time.perf_counter()
+            async for frame in stream:
+                yield frame
+            
+            if stream.first_chunk_at is not None:
+                stream_first_chunk.labels(source).observe(stream.first_chunk_at - started)
+            stream_chunks.labels(source).observe(stream.chunks)
+            stream_frames.labels(source).observe(stream.frames)
+            trace = current_trace()
+            if trace is not None and stream.first_chunk_at is not None:
+                trace.add("first_chunk", stream.first_chunk_at - waiting)
+                trace.add("stream", time.perf_counter() - stream.first_chunk_at - stream.encode_seconds)
+                trace.add("serialize", stream.encode_seconds)
         
         return StreamingResponse(
             generate(),
-            media_type="text/plain",
-            headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
+            media_type=SSE_MEDIA_TYPE,
+            headers={"Cache-Control": "no-cache", "Connection": "keep-alive", "X-Accel-Buffering": "no"}
         )
         
     except Exception as e:
-        logger.error(f"Error in streaming chat: {e}")
+        logger.error("Error in streaming chat: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # Chat with history endpoint
 @app.post("/chat/history", response_model=ChatResponse)
-async def chat_with_history(chat_history: ChatHistory):
-    if not assistant:
-        raise HTTPException(status_code=503, detail="Assistant not available")
+async def chat_with_history(chat_history: ChatHistory, assistant_name: Optional[str] = Query(None, alias="assistant")):
+    assistant = await get_assistant(assistant_name)
     
     try:
-        response = assistant.chat_with_history(chat_history.messages, stream=False)
+        with span("history"):
+            window = _history_window(chat_history.messages)
+        with span("upstream"):
+            response = await resilient.run(assistant.chat_with_history, window.messages, stream=False)
         content = assistant.get_response_content(response)
         
         return ChatResponse(
             response=content,
-            success=True
+            success=True,
+            tokens_sent=window.tokens_sent,
+            tokens_available=window.tokens_available
         )
         
     except Exception as e:
-        logger.error(f"Error in chat with history: {e}")
+        logger.error("Error in chat with history: %s", e)
         return ChatResponse(
             response="",
             success=False,
             error=str(e)
         )
 
+# Create a server-side conversation
+@app.post("/sessions")
+async def create_session():
+    session = session_store.create()
+    return {"session_id": session.id}
+
+# Session store statistics
+@app.get("/sessions/stats")
+async def session_stats():
+    return session_store.stats()
+
+# Stored turns of a conversation
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session.to_dict()
+
+# End a conversation
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"success": True}
+
+# Send the next turn of a server-side conversation
+@app.post("/sessions/{session_id}/messages", response_model=SessionResponse)
+async def session_message(session_id: str, session_message: SessionMessage,
+                          assistant_name: Optional[str] = Query(None, alias="assistant")):
+    assistant = await get_assistant(assistant_name)
+    
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    # One turn at a time per session, so questions and answers stay paired
+    async with session.lock:
+        try:
+            messages = session.messages()
+            messages.append({"role": "user", "content": session_message.message})
+            window = _history_window(
+                messages,
+                tokens=session.token_counts() + [message_tokens(session_message.message)],
+                key=session.id
+            )
+            response = await resilient.run(assistant.chat_with_history, window.messages, stream=False)
+            content = assistant.get_response_content(response)
+            
+            # Only completed exchanges are stored
+            session_store.append(session, "user", session_message.message)
+            session_store.append(session, "assistant", content)
+            
+            return SessionResponse(
+                session_id=session_id,
+                response=content,
+                success=True,
+                turns=len(session.turns),
+                tokens_sent=window.tokens_sent,
+                tokens_available=window.tokens_available
+            )
+            
+        except Exception as e:
+            logger.error("Error in session %s: %s", session_id, e)
+            return SessionResponse(
+                session_id=session_id,
+                response="",
+                success=False,
+                error=str(e),
+                turns=len(session.turns)
+            )
+
+# Response cache statistics
+@app.get("/cache/stats")
+async def cache_stats():
+    return response_cache.stats()
+
+# Upstream call statistics: retries, hedges, timeouts and the circuit breaker
+@app.get("/upstream/stats")
+async def upstream_stats():
+    return {**resilient.stats(), "probe": health_probe.status()}
+
+# Admission control statistics: running and queued requests, rejections
+@app.get("/admission/stats")
+async def admission_stats():
+    return admission.stats()
+
+# Request coalescing statistics
+@app.get("/coalescing/stats")
+async def coalescing_stats():
+    chat_stats, stream_stats = chat_flights.stats(), stream_flights.stats()
+    requests = chat_stats["requests"] + stream_stats["requests"]
+    coalesced = chat_stats["coalesced"] + stream_stats["coalesced"]
+    return {
+        "chat": chat_stats,
+        "stream": stream_stats,
+        "coalescing_ratio": round(coalesced / requests, 4) if requests else 0.0
+    }
+
+# Prometheus metrics
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+# Download a request profile (collapsed stacks for flamegraph.pl or speedscope)
+@app.get("/debug/profiles/{profile_id}")
+async def download_profile(profile_id: str, admin_token: Optional[str] = Header(None, alias="X-Admin-Token")):
+    if not token_matches(ADMIN_TOKEN, admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(
+        profile.folded(),
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'}
+    )
+
 # Get uploaded files list
 @app.get("/files")
-async def list_files():
+async def list_files(
+    request: Request,
+    response: Response,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    sort: Literal["name", "size", "modified"] = "name",
+    order: Literal["asc", "desc"] = "asc",
+    prefix: str = ""
+):
     try:
-        upload_dir = "uploads"
-        if not os.path.exists(upload_dir):
-            return {"files": []}
-        
-        files = []
-        for filename in os.listdir(upload_dir):
-            file_path = os.path.join(upload_dir, filename)
-            if os.path.isfile(file_path):
-                stat = os.stat(file_path)
-                files.append({
-                    "name": filename,
-                    "size": stat.st_size,
-                    "modified": stat.st_mtime
-                })
-        
-        return {"files": files}
+        # Picks up files added or removed outside the app (one stat of the directory)
+        file_index.refresh()
+        
+        etag = file_index.etag(offset, limit, sort, order, prefix)
+        if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+            return Response(status_code=304, headers={"ETag": etag})
+        
+        files, total = file_index.page(offset, limit, sort, order == "desc", prefix)
+        response.headers["ETag"] = etag
+        return {"files": files, "total": total, "offset": offset, "limit": limit}
         
     except Exception as e:
-        logger.error(f"Error listing files: {e}")
+        logger.error("Error listing files: %s", e)
         return {"files": [], "error": str(e)}
 
 # Delete file endpoint
 @app.delete("/files/{filename}")
 async def delete_file(filename: str):
+    if reserved(filename) or os.path.basename(filename) != filename:
+        raise HTTPException(status_code=400, detail="Reserved file name")
     try:
-        file_path = os.path.join("uploads", filename)
-        if os.path.exists(file_path):
+        file_path = os.path.join(UPLOAD_DIR, filename)
+        found = os.path.exists(file_path)
+        if found:
             os.remove(file_path)
+            file_index.remove(filename)
+        
+        # The remote file is only deleted once no local file refers to its content
+        tracked, released = upload_manifest.unlink(filename)
+        if released is not None:
+            await _delete_remote_content(released)
+        elif found and not tracked:
+            response_cache.invalidate()
+        
+        if found or tracked:
             return {"success": True, "message": f"File {filename} deleted"}
         else:
             return {"success": False, "message": "File not found"}
             
     except Exception as e:
-        logger.error(f"Error deleting file: {e}")
+        logger.error("Error deleting file: %s", e)
         return {"success": False, "error": str(e)}
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # uvicorn's own records go through the log pipeline; requests are already logged by the tracing middleware
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None, access_log=False)
\ No newline at end of file
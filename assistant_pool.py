@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the first retry of a failed initialization, and the cap for later ones
+DEFAULT_RETRY_INITIAL = 1.0
+DEFAULT_RETRY_MAX = 60.0
+
+# Seconds a request waits for an assistant that is still starting
+DEFAULT_WAIT_SECONDS = 10.0
+
+
+class AssistantUnavailable(Exception):
+    """Raised when an assistant could not be initialized (yet)"""
+
+
+class UnknownAssistant(KeyError):
+    """Raised for assistant names that are not configured"""
+
+
+class _Slot:
+    __slots__ = ("name", "instance", "task", "error", "attempts", "requested_at", "ready_at", "first_attempt")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.instance = None
+        self.task = None
+        self.error = None
+        self.attempts = 0
+        self.requested_at = None
+        self.ready_at = None
+        self.first_attempt = None
+
+
+class AssistantPool:
+    def __init__(self, factory, names: list, executor, retry_initial: float = DEFAULT_RETRY_INITIAL,
+                 retry_max: float = DEFAULT_RETRY_MAX, wait_timeout: float = DEFAULT_WAIT_SECONDS):
+        """
+        Registry of assistant instances keyed by assistant name
+
+        Instances are created on first use (or by start()) in the background.
+        A failed initialization is retried with jittered exponential backoff
+        instead of leaving the assistant unavailable until restart. After
+        creation, the instance's warm_up() (if it has one) opens the upstream
+        connection so the first user request doesn't pay for it.
+
+        Args:
+            factory: Called with an assistant name to create an instance (blocking)
+            names (list): Assistant names that may be served; the first is the default
+            executor: UpstreamExecutor that runs the blocking factory and warm-up calls
+            retry_initial (float): Seconds before the first retry
+            retry_max (float): Longest delay between retries
+            wait_timeout (float): Seconds get() waits for an assistant that is starting
+        """
+        if not names:
+            raise ValueError("At least one assistant name is required")
+        self.factory = factory
+        self.executor = executor
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+        self.wait_timeout = wait_timeout
+        self.default = names[0]
+        self._slots = {name: _Slot(name) for name in names}
+
+    @property
+    def names(self) -> list:
+        return list(self._slots)
+
+    def _slot(self, name: str = None) -> _Slot:
+        slot = self._slots.get(name or self.default)
+        if slot is None:
+            raise UnknownAssistant(name)
+        return slot
+
+    def start(self, name: str = None):
+        """Begin creating an assistant in the background, unless it exists or is being created"""
+        slot = self._slot(name)
+        # A task left over from another (finished) event loop can never complete
+        stale = slot.task is not None and slot.task.get_loop() is not asyncio.get_running_loop()
+        if slot.instance is None and (slot.task is None or slot.task.done() or stale):
+            slot.requested_at = time.perf_counter()
+            slot.first_attempt = asyncio.Event()
+            slot.task = asyncio.ensure_future(self._create(slot))
+        return slot
+
+    async def _create(self, slot: _Slot):
+        delay = self.retry_initial
+        while True:
+            slot.attempts += 1
+            try:
+                instance = await self.executor.run(self.factory, slot.name)
+                warm_up = getattr(instance, "warm_up", None)
+                if warm_up is not None:
+                    try:
+                        await self.executor.run(warm_up)
+                    except Exception as e:
+                        # A cold connection is still usable; don't fail the assistant for it
+                        logger.warning("Warm-up of assistant '%s' failed: %s", slot.name, e, extra={"assistant": slot.name})
+                slot.instance = instance
+                slot.error = None
+                slot.ready_at = time.perf_counter()
+                ready_s = slot.ready_at - slot.requested_at
+                logger.info("Assistant '%s' ready after %.3fs (%d attempt(s))", slot.name, ready_s, slot.attempts,
+                            extra={"assistant": slot.name, "ready_ms": round(ready_s * 1000, 1),
+                                   "attempt": slot.attempts})
+                return
+            except Exception as e:
+                slot.error = str(e)
+                logger.error("Failed to initialize assistant '%s' (attempt %d): %s", slot.name, slot.attempts, e,
+                             extra={"assistant": slot.name, "attempt": slot.attempts})
+            finally:
+                slot.first_attempt.set()
+            await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+            delay = min(delay * 2, self.retry_max)
+
+    async def get(self, name: str = None):
+        """
+        Assistant instance for a name, creating it if needed
+
+        Args:
+            name (str): Assistant name (defaults to the first configured one)
+
+        Returns:
+            Assistant instance
+
+        Raises:
+            UnknownAssistant: The name isn't configured
+            AssistantUnavailable: Initialization failed or didn't finish within wait_timeout;
+                it keeps being retried in the background
+        """
+        slot = self._slot(name)
+        if slot.instance is not None:
+            return slot.instance
+
+        self.start(slot.name)
+        try:
+            await asyncio.wait_for(slot.first_attempt.wait(), self.wait_timeout)
+        except asyncio.TimeoutError:
+            raise AssistantUnavailable(f"Assistant '{slot.name}' is still starting")
+        if slot.instance is None:
+            raise AssistantUnavailable(f"Assistant '{slot.name}' unavailable: {slot.error}")
+        return slot.instance
+
+    def peek(self, name: str = None):
+        """Instance if it is ready, else None; never starts initialization"""
+        return self._slot(name).instance
+
+    def register(self, name: str, instance):
+        """Use an existing instance for a name (replacing any pending initialization)"""
+        slot = self._slots.setdefault(name, _Slot(name))
+        self._cancel(slot)
+        slot.instance = instance
+        slot.error = None
+
+    def status(self) -> dict:
+        """Readiness of every configured assistant"""
+        status = {}
+        for name, slot in self._slots.items():
+            status[name] = {
+                "ready": slot.instance is not None,
+                "starting": slot.instance is None and slot.task is not None and not slot.task.done(),
+                "attempts": slot.attempts,
+                "error": slot.error,
+                "init_seconds": round(slot.ready_at - slot.requested_at, 3)
+                if slot.ready_at and slot.requested_at else None,
+            }
+        return status
+
+    @staticmethod
+    def _cancel(slot: _Slot):
+        task = slot.task
+        if task is not None and not task.done() and not task.get_loop().is_closed():
+            task.cancel()
+
+    def close(self):
+        """Stop pending initializations and retries"""
+        for slot in self._slots.values():
+            self._cancel(slot)
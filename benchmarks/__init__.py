@@ -0,0 +1,5 @@
+"""
+Benchmark scripts for the TATA Nexon Assistant API
+
+Run from the project root, e.g. ``python -m benchmarks.bench_upstream_offload``.
+"""
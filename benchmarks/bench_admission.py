@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+A burst of /chat requests larger than the upstream can take, with and without admission control.
+
+--burst distinct questions arrive at once against a simulated upstream
+answering in --ttft-ms. "before" admits everything (as app.py used to):
+requests pile up in the upstream worker queue and all of them get slow.
+"after" runs --limit at a time with a queue of --queue-size waiting at most
+--queue-timeout seconds; the rest get an immediate 503 with Retry-After.
+
+    python -m benchmarks.bench_admission --burst 400 --ttft-ms 200 --limit 32 --queue-size 64
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+import httpx
+
+import app as app_module
+from admission import ConcurrencyLimiter
+from benchmarks.harness import percentile, print_table
+from cache import ResponseCache
+from main_mock import LatencyProfile, PineconeAssistant
+
+
+async def burst(requests: int, offset: int) -> dict:
+    served, shed = [], []
+    # Requests go straight into the ASGI app; with hundreds of sockets the
+    # in-process HTTP client would dominate the timings
+    transport = httpx.ASGITransport(app=app_module.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        async def one(i):
+            start = time.perf_counter()
+            response = await client.post("/chat", json={"message": f"Burst question {offset + i}?"})
+            (served if response.status_code == 200 else shed).append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "served": len(served),
+        "shed": len(shed),
+        "served_p50_ms": round(percentile(served, 50) * 1000, 1),
+        "served_p99_ms": round(percentile(served, 99) * 1000, 1),
+        "shed_p99_ms": round(percentile(shed, 99) * 1000, 1),
+        "wall_s": round(elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=400)
+    parser.add_argument("--ttft-ms", type=float, default=200)
+    parser.add_argument("--limit", type=int, default=32)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--queue-timeout", type=float, default=1.0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+
+    variants = {
+        "before (no admission)": ConcurrencyLimiter(limit=args.burst * 2, queue_size=0),
+        "after": ConcurrencyLimiter(limit=args.limit, queue_size=args.queue_size, queue_timeout=args.queue_timeout),
+    }
+    results = {}
+    app_module.set_assistant(PineconeAssistant(profile=LatencyProfile(ttft_ms=args.ttft_ms)))
+    for offset, (label, limiter) in enumerate(variants.items()):
+        app_module.response_cache = ResponseCache()
+        app_module.admission.limiter = limiter
+        results[label] = asyncio.run(burst(args.burst, offset * args.burst))
+
+    print_table(
+        f"Burst of {args.burst} /chat requests, {args.ttft_ms:.0f} ms upstream, "
+        f"{app_module.upstream.max_workers} upstream workers",
+        results
+    )
+
+
+if __name__ == "__main__":
+    main()
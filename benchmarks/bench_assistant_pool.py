@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Cold start and first-request latency with the assistant pool.
+
+The stand-in assistant takes --init seconds to construct and its first call
+pays --connect seconds of connection setup unless warm_up() ran first.
+
+"before" copies the old startup: the assistant is built synchronously in
+the startup hook and never warmed up. "after" is the current app: startup
+returns at once, and the pool builds and warms up the default assistant in
+the background.
+
+    python -m benchmarks.bench_assistant_pool --init 0.5 --connect 0.3
+"""
+import argparse
+import threading
+import time
+
+import httpx
+from fastapi import FastAPI
+
+import app as app_module
+from assistant_pool import AssistantPool
+from benchmarks.harness import free_port, print_table
+from benchmarks.stand_in import SlowAssistant
+from cache import ResponseCache
+from concurrency import UpstreamExecutor
+
+
+class ColdAssistant(SlowAssistant):
+    def __init__(self, init: float, connect: float):
+        time.sleep(init)
+        super().__init__(latency=0.05)
+        self.connect = connect
+        self.connected = False
+
+    def warm_up(self):
+        time.sleep(self.connect)
+        self.connected = True
+
+    def chat(self, message: str, stream: bool = False):
+        if not self.connected:
+            self.warm_up()
+        return super().chat(message, stream=stream)
+
+
+def build_legacy_app(make_assistant) -> FastAPI:
+    legacy = FastAPI()
+    state = {}
+
+    @legacy.on_event("startup")
+    async def startup():
+        state["assistant"] = make_assistant()
+
+    @legacy.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @legacy.post("/chat")
+    async def chat(body: dict):
+        assistant = state["assistant"]
+        response = assistant.chat(body["message"])
+        return {"response": assistant.get_response_content(response), "success": True}
+
+    return legacy
+
+
+def measure(app, idle: float) -> dict:
+    """Server start -> first /health; first /chat sent right away and one sent after idling"""
+    import uvicorn
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    start = time.perf_counter()
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            while True:
+                try:
+                    client.get("/health")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.005)
+            health_s = time.perf_counter() - start
+            time.sleep(idle)
+
+            first = time.perf_counter()
+            assert client.post("/chat", json={"message": "First question"}).json()["success"]
+            first_chat_s = time.perf_counter() - first
+            answered_s = time.perf_counter() - start
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    return health_s, first_chat_s, answered_s
+
+
+def compare(make_app, idle: float) -> dict:
+    health_s, first_chat_s, answered_s = measure(make_app(), 0)
+    _, idle_chat_s, _ = measure(make_app(), idle)
+    return {
+        "to_health_ms": round(health_s * 1000, 1),
+        "first_chat_ms": round(first_chat_s * 1000, 1),
+        "start_to_answer_ms": round(answered_s * 1000, 1),
+        "first_chat_idle_ms": round(idle_chat_s * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--init", type=float, default=0.5, help="Seconds to construct an assistant")
+    parser.add_argument("--connect", type=float, default=0.3, help="Seconds of connection setup on first call")
+    args = parser.parse_args()
+
+    def legacy_app():
+        return build_legacy_app(lambda: ColdAssistant(args.init, args.connect))
+
+    def pooled_app():
+        app_module.assistant_pool = AssistantPool(
+            lambda name: ColdAssistant(args.init, args.connect), [app_module.DEFAULT_ASSISTANT], UpstreamExecutor(4)
+        )
+        app_module.response_cache = ResponseCache()
+        return app_module.app
+
+    idle = args.init + args.connect + 0.5
+    results = {"before": compare(legacy_app, idle), "after": compare(pooled_app, idle)}
+
+    print_table(
+        f"Assistant construction {args.init * 1000:.0f} ms, connection setup {args.connect * 1000:.0f} ms",
+        results
+    )
+    print(f"\nfirst_chat_ms is sent as soon as /health answers; first_chat_idle_ms after {idle:.1f} s "
+          "without traffic, when the pool has finished warming up.")
+
+
+if __name__ == "__main__":
+    main()
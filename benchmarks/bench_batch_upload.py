@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Onboarding throughput: many documents one at a time through POST /upload
+versus one POST /upload/batch.
+
+"one at a time" uploads a file and waits for its ingestion job before sending
+the next, like uploading PDFs one by one in the UI. "batch" sends every file in
+one multipart request and polls GET /upload/batch/{batch_id} until all jobs are
+done; ingestion runs with INGEST_CONCURRENCY jobs in parallel.
+
+    python -m benchmarks.bench_batch_upload --files 40 --size-kb 512 --latency 0.2
+"""
+import argparse
+import os
+import time
+
+import httpx
+
+import app as app_module
+from benchmarks.harness import print_table, serve
+from benchmarks.stand_in import SlowAssistant
+from manifest import UploadManifest
+from uploads import IngestionJobs
+
+
+def make_documents(count: int, size_kb: int, tag: str) -> list:
+    """Distinct document bodies, so deduplication doesn't skip any of them"""
+    return [(f"bench-{tag}-{i}.pdf", os.urandom(size_kb * 1024)) for i in range(count)]
+
+
+def wait_until(client, url: str, done) -> dict:
+    while True:
+        status = client.get(url).json()
+        if done(status):
+            return status
+        time.sleep(0.01)
+
+
+def one_at_a_time(client, documents) -> float:
+    start = time.perf_counter()
+    for name, content in documents:
+        job_id = client.post("/upload", files={"file": (name, content)}).json()["job_id"]
+        status = wait_until(client, f"/upload/{job_id}", lambda s: s["status"] in ("completed", "failed"))
+        assert status["status"] == "completed", status
+    return time.perf_counter() - start
+
+
+def batch(client, documents) -> float:
+    start = time.perf_counter()
+    files = [("files", (name, content)) for name, content in documents]
+    batch_id = client.post("/upload/batch", files=files).json()["batch_id"]
+    status = wait_until(client, f"/upload/batch/{batch_id}", lambda s: s["finished"])
+    assert status["completed"] == len(documents), status
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--size-kb", type=int, default=512)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per upstream upload")
+    parser.add_argument("--concurrency", type=int, default=8, help="INGEST_CONCURRENCY for the batch run")
+    args = parser.parse_args()
+
+    app_module.set_assistant(SlowAssistant(latency=args.latency))
+    app_module.ingestion_jobs = IngestionJobs(max_concurrent=args.concurrency)
+    app_module.upload_manifest = UploadManifest(os.path.join(app_module.UPLOAD_DIR, ".bench-manifest.json"))
+
+    total_mb = args.files * args.size_kb / 1024
+    results = {}
+    with serve(app_module.app) as base_url, httpx.Client(base_url=base_url, timeout=600) as client:
+        for label, run in (("one at a time", one_at_a_time), (f"batch (concurrency {args.concurrency})", batch)):
+            documents = make_documents(args.files, args.size_kb, label.split()[0])
+            elapsed = run(client, documents)
+            results[label] = {
+                "files": args.files,
+                "seconds": round(elapsed, 2),
+                "files_per_s": round(args.files / elapsed, 2),
+                "mb_per_s": round(total_mb / elapsed, 2),
+            }
+            for name, _ in documents:
+                client.delete(f"/files/{name}")
+
+    os.remove(app_module.upload_manifest.path)
+    print_table(
+        f"Ingesting {args.files} x {args.size_kb} KB documents, {args.latency * 1000:.0f} ms per upstream upload",
+        results
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation run: N questions one by one through POST /chat versus
+one POST /chat/batch.
+
+The one-by-one loop is what looping test_chat_api.py-style requests does.
+Every question is distinct, so the response cache doesn't help either run.
+
+    python -m benchmarks.bench_chat_batch --questions 200 --latency 0.2 --concurrency 16
+"""
+import argparse
+import time
+
+import httpx
+
+import app as app_module
+from benchmarks.harness import print_table, serve
+from benchmarks.stand_in import SlowAssistant
+from cache import ResponseCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per upstream answer")
+    parser.add_argument("--concurrency", type=int, default=16, help="CHAT_BATCH_CONCURRENCY for the batch run")
+    args = parser.parse_args()
+
+    app_module.set_assistant(SlowAssistant(latency=args.latency))
+    app_module.CHAT_BATCH_CONCURRENCY = args.concurrency
+
+    results = {}
+    with serve(app_module.app) as base_url, httpx.Client(base_url=base_url, timeout=3600) as client:
+        app_module.response_cache = ResponseCache()
+        questions = [f"Evaluation question {i} about the Nexon" for i in range(args.questions)]
+        start = time.perf_counter()
+        for question in questions:
+            assert client.post("/chat", json={"message": question}).json()["success"]
+        elapsed = time.perf_counter() - start
+        results["one by one (/chat)"] = {"questions": len(questions), "seconds": round(elapsed, 2),
+                                          "questions_per_s": round(len(questions) / elapsed, 2)}
+
+        app_module.response_cache = ResponseCache()
+        start = time.perf_counter()
+        body = client.post("/chat/batch", json={"questions": questions}).json()
+        elapsed = time.perf_counter() - start
+        assert body["success"]
+        results[f"/chat/batch (concurrency {body['concurrency']})"] = {
+            "questions": len(questions), "seconds": round(elapsed, 2),
+            "questions_per_s": round(len(questions) / elapsed, 2)}
+
+    print_table(f"{args.questions} distinct questions, {args.latency * 1000:.0f} ms per upstream answer", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Burst of identical questions, as when many users click the same quick
+question at once.
+
+All requests arrive before the first answer is cached, so the response cache
+can't help. "before" sends each one upstream; "after" shares one upstream call
+(/chat) or one upstream stream (/chat/stream) per distinct question.
+
+    python -m benchmarks.bench_coalescing --burst 200 --latency 0.3
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import httpx
+
+import app as app_module
+from benchmarks.harness import print_table, serve, summarize
+from benchmarks.stand_in import SlowAssistant
+from cache import ResponseCache
+from coalesce import SharedStreams, SingleFlight
+
+
+class CountingAssistant(SlowAssistant):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def chat(self, message: str, stream: bool = False):
+        with self._lock:
+            self.calls += 1
+        return super().chat(message, stream=stream)
+
+
+class NoCoalescing:
+    """Passes every request straight upstream, like the app did before"""
+
+    def do(self, key, fn):
+        return fn()
+
+    def subscribe(self, key, source_factory):
+        return source_factory()
+
+
+async def burst(base_url: str, path: str, size: int) -> tuple:
+    latencies = []
+    limits = httpx.Limits(max_connections=size + 8)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def one():
+            start = time.perf_counter()
+            resp = await client.post(path, json={"message": "What is the Global NCAP rating of the Nexon?"})
+            resp.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(size)])
+        return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    results = {}
+    with serve(app_module.app) as base_url:
+        for label, chat_flights, stream_flights in (
+            ("before", NoCoalescing(), NoCoalescing()),
+            ("after", SingleFlight(), SharedStreams()),
+        ):
+            for path in ("/chat", "/chat/stream"):
+                fake = CountingAssistant(latency=args.latency)
+                app_module.set_assistant(fake)
+                app_module.response_cache = ResponseCache()
+                app_module.chat_flights = chat_flights
+                app_module.stream_flights = stream_flights
+                latencies, elapsed = asyncio.run(burst(base_url, path, args.burst))
+                row = summarize(latencies, elapsed)
+                results[f"{label} {path}"] = {
+                    "upstream_calls": fake.calls,
+                    "p50_ms": row["p50_ms"],
+                    "p99_ms": row["p99_ms"],
+                    "throughput_rps": row["throughput_rps"],
+                }
+
+    print_table(f"Burst of {args.burst} identical questions, {args.latency * 1000:.0f} ms upstream", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Cold start: a fresh Python process serving app.py, timed from process
+launch to the first /health response and then the first GET /.
+
+Each run starts a new interpreter, so nothing imported by an earlier run is
+reused. "cached bytecode" uses the __pycache__ next to the sources (as
+after running build_static.py); "no bytecode" points PYTHONPYCACHEPREFIX at
+an empty directory per run, as on a read-only deployment that ships only
+.py files. "import app" is the bare `import app` the serverless runtime
+does before it can call the handler.
+
+    python -m benchmarks.bench_cold_start --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.harness import free_port, print_table
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Target for process launch -> first /health response
+TARGET_MS = 300
+
+SERVER = "import uvicorn; uvicorn.run('app:app', host='127.0.0.1', port={port}, log_level='warning')"
+IMPORT_ONLY = "import time; start = time.perf_counter(); import app; print(time.perf_counter() - start)"
+
+
+def environment(no_bytecode: bool, cache_dir: str) -> dict:
+    env = dict(os.environ)
+    if no_bytecode:
+        env["PYTHONPYCACHEPREFIX"] = cache_dir
+    return env
+
+
+def time_server(env: dict) -> tuple:
+    """Seconds from launch to the first /health response, and for the first GET / after it"""
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", SERVER.format(port=port)], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=10) as client:
+            while True:
+                try:
+                    client.get("/health").raise_for_status()
+                    break
+                except httpx.TransportError:
+                    if process.poll() is not None:
+                        raise RuntimeError("Server exited before answering /health")
+                    time.sleep(0.002)
+            health_s = time.perf_counter() - start
+            index = time.perf_counter()
+            client.get("/").raise_for_status()
+            index_s = time.perf_counter() - index
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return health_s, index_s
+
+
+def time_import(env: dict) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_ONLY], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    # Populate __pycache__ once, like a build step would
+    subprocess.run([sys.executable, "-c", "import app"], cwd=ROOT, check=True, capture_output=True)
+
+    results = {}
+    for label, no_bytecode in (("cached bytecode", False), ("no bytecode", True)):
+        health, index, imports = [], [], []
+        for _ in range(args.runs):
+            with tempfile.TemporaryDirectory() as cache_dir:
+                env = environment(no_bytecode, cache_dir)
+                imports.append(time_import(env))
+            with tempfile.TemporaryDirectory() as cache_dir:
+                health_s, index_s = time_server(environment(no_bytecode, cache_dir))
+            health.append(health_s)
+            index.append(index_s)
+        results[label] = {
+            "import_app_ms": round(statistics.median(imports) * 1000, 1),
+            "to_health_p50_ms": round(statistics.median(health) * 1000, 1),
+            "to_health_max_ms": round(max(health) * 1000, 1),
+            "first_index_ms": round(statistics.median(index) * 1000, 1),
+        }
+
+    print_table(f"Cold start over {args.runs} fresh processes (target: /health under {TARGET_MS} ms)", results)
+    verdict = "meets" if results["cached bytecode"]["to_health_p50_ms"] < TARGET_MS else "misses"
+    print(f"\nWith cached bytecode the median cold start {verdict} the {TARGET_MS} ms target.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tokens sent per turn as a support conversation grows, and the cost of
+compacting the history on every turn.
+
+"before" forwards the whole conversation, as chat_with_history used to;
+"after" sends what HistoryCompactor selects for the configured budget.
+Compaction is timed for a session (cached per-turn token estimates and a
+summary that is extended as the window moves) and for a plain message list.
+
+    python -m benchmarks.bench_history --turns 200 --budget 3000
+"""
+import argparse
+import random
+import time
+
+from benchmarks.harness import print_table
+from history import HistoryCompactor, message_tokens
+from sessions import SessionStore
+
+_WORDS = ["nexon", "service", "tyre", "pressure", "warning", "light", "dashboard", "engine", "check",
+          "battery", "km", "the", "is", "my", "when", "should", "dealer", "replace", "reset", "manual"]
+
+
+def sentence(rng, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=3000)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    compactor = HistoryCompactor(budget=args.budget)
+    store = SessionStore()
+    session = store.create()
+    messages = []
+
+    checkpoints = {}
+    session_seconds = list_seconds = 0.0
+    for turn in range(1, args.turns + 1):
+        question = sentence(rng, rng.randint(8, 20))
+        messages.append({"role": "user", "content": question})
+
+        start = time.perf_counter()
+        window = compactor.compact(session.messages() + [messages[-1]],
+                                   tokens=session.token_counts() + [message_tokens(question)], key=session.id)
+        session_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        unkeyed = compactor.compact(messages)
+        list_seconds += time.perf_counter() - start
+        assert unkeyed.tokens_sent == window.tokens_sent
+
+        answer = " ".join(sentence(rng, rng.randint(10, 25)) for _ in range(rng.randint(3, 8)))
+        messages.append({"role": "assistant", "content": answer})
+        store.append(session, "user", question)
+        store.append(session, "assistant", answer)
+
+        if turn in (1, 10, 25, 50, 100, 200) or turn == args.turns:
+            sent = messages[:-1]
+            checkpoints[f"turn {turn}"] = {
+                "messages": len(sent),
+                "before_tokens": sum(message_tokens(m["content"]) for m in sent),
+                "after_tokens": window.tokens_sent,
+                "summarized": window.summarized,
+            }
+
+    print_table(f"Tokens sent per turn, budget {args.budget}", checkpoints)
+    print(f"\nCompaction per turn: {session_seconds / args.turns * 1e6:.1f} us for a session, "
+          f"{list_seconds / args.turns * 1e6:.1f} us for a plain message list")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Intent classification throughput over a large synthetic query corpus.
+
+"before" runs the two keyword chains the assistants used to have (one
+``any(word in message_lower ...)`` scan per keyword, in main.py and
+main_mock.py); "after" runs the shared single-pass classifier, one message
+at a time and through the batch API. The old chains could stop at the first
+keyword hit; the classifier always collects every hit so it can score all labels.
+
+    python -m benchmarks.bench_intents --queries 200000
+    python -m benchmarks.bench_intents --queries 50000 --min-words 80 --max-words 150
+"""
+import argparse
+import random
+import time
+
+from benchmarks.harness import print_table
+from intents import IntentClassifier
+
+_MAIN_CHAIN = [
+    ("safety", ["safety", "secure", "protection", "airbag"]),
+    ("maintenance", ["maintenance", "service", "schedule"]),
+    ("engine", ["engine", "performance", "power", "specifications"]),
+    ("features", ["features", "technology", "infotainment"]),
+    ("troubleshooting", ["problem", "issue", "trouble", "fix"]),
+    ("comparison", ["compare", "vs", "difference", "better"]),
+]
+
+_MOCK_CHAIN = [
+    ("safety", ["safety", "airbag", "ncap", "protection"]),
+    ("engine", ["engine", "petrol", "diesel", "performance", "power"]),
+    ("maintenance", ["maintenance", "service", "schedule", "oil"]),
+    ("greeting", ["hello", "hi", "help", "start"]),
+]
+
+_TOPIC_WORDS = [
+    "safety", "airbags", "ncap", "maintenance", "service", "schedule", "oil", "engine",
+    "performance", "power", "petrol", "diesel", "features", "infotainment", "technology",
+    "problem", "issue", "troubleshoot", "fix", "compare", "vs", "difference", "better", "hello",
+]
+
+_FILLER_WORDS = [
+    "what", "is", "the", "of", "my", "tata", "nexon", "how", "do", "i", "tell", "me", "about",
+    "which", "variant", "should", "choose", "and", "in", "winter", "city", "highway", "mileage",
+    "boot", "space", "colour", "price", "warranty", "tyres", "brakes", "please", "explain",
+]
+
+
+def legacy_classify(message: str, chain) -> str:
+    message_lower = message.lower()
+    for label, words in chain:
+        if any(word in message_lower for word in words):
+            return label
+    return "general"
+
+
+def synthetic_corpus(size: int, min_words: int = 5, max_words: int = 25, seed: int = 7) -> list:
+    """Queries of filler words, most with one or two topic keywords somewhere in them"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        words = [rng.choice(_FILLER_WORDS) for _ in range(rng.randint(min_words, max_words))]
+        for _ in range(rng.choice([0, 1, 1, 2])):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(_TOPIC_WORDS))
+        message = " ".join(words)
+        corpus.append(message.capitalize() + "?")
+    return corpus
+
+
+def timed(label_fn, corpus) -> tuple:
+    start = time.perf_counter()
+    labels = label_fn(corpus)
+    return time.perf_counter() - start, labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200000)
+    parser.add_argument("--min-words", type=int, default=5)
+    parser.add_argument("--max-words", type=int, default=25)
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.queries, args.min_words, args.max_words)
+    classifier = IntentClassifier()
+
+    runs = {
+        "before main.py chain": lambda c: [legacy_classify(m, _MAIN_CHAIN) for m in c],
+        "before mock chain": lambda c: [legacy_classify(m, _MOCK_CHAIN) for m in c],
+        "after detect()": lambda c: [classifier.detect(m) for m in c],
+        "after classify()": lambda c: [classifier.classify(m) for m in c],
+        "after detect_batch()": classifier.detect_batch,
+        "after classify_batch()": classifier.classify_batch,
+    }
+
+    results = {}
+    for name, fn in runs.items():
+        elapsed, _ = timed(fn, corpus)
+        results[name] = {
+            "queries": len(corpus),
+            "seconds": round(elapsed, 3),
+            "queries_per_s": int(len(corpus) / elapsed),
+            "us_per_query": round(elapsed / len(corpus) * 1e6, 2),
+        }
+
+    _, old_labels = timed(runs["before main.py chain"], corpus)
+    _, new_labels = timed(runs["after detect()"], corpus)
+    changed = sum(1 for old, new in zip(old_labels, new_labels) if old != new)
+
+    print_table(
+        f"Intent classification over {len(corpus)} synthetic queries "
+        f"of {args.min_words}-{args.max_words} words",
+        results
+    )
+    print(f"\nPrimary label differs from the old main.py chain for {changed} queries "
+          f"({changed / len(corpus):.1%}): word-boundary matching and the merged keyword sets")
+
+
+if __name__ == "__main__":
+    main()
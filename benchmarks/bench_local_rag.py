@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Local retrieval backend: index build time and query latency over a synthetic
+corpus of a few thousand pages.
+
+The corpus is --docs text documents with --pages pages in total, about 300
+words a page drawn from a Zipf-distributed vocabulary, so term statistics
+look like real prose. "build" indexes every document through
+LocalAssistant.upload_file (read, hash, chunk, tokenize, embed, insert);
+"incremental" adds one more document to the full index. Queries are a few
+words taken from random passages. The "pure-Python BM25" row scores the same
+postings with a dict accumulator, to show what the NumPy scoring saves.
+
+    python -m benchmarks.bench_local_rag --pages 3000 --docs 30 --queries 500
+"""
+import argparse
+import math
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+
+from benchmarks.harness import percentile, print_table
+from local_rag import BM25_B, BM25_K1, LocalAssistant, tokenize
+
+
+def make_vocabulary(size: int, rng: random.Random) -> list:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(size)]
+
+
+def make_page(vocabulary: list, weights: list, rng: random.Random, words: int = 300) -> str:
+    return " ".join(rng.choices(vocabulary, weights, k=words))
+
+
+def python_bm25(index, lengths: list, alive: list, query: str, top_k: int) -> list:
+    """Term-at-a-time BM25 over the index's postings, with passage data in Python lists"""
+    terms = tokenize(query)
+    live = index._live_passages
+    avg_length = index._live_length / live
+    scores = defaultdict(float)
+    for term in set(terms):
+        df = index._df.get(term, 0)
+        if df <= 0:
+            continue
+        idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+        positions, tfs = index._postings[term]
+        for position, tf in zip(positions, tfs):
+            if alive[position]:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[position] / avg_length)
+                scores[position] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+def timed_queries(search, queries: list) -> dict:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        latencies.append(time.perf_counter() - start)
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "queries_per_s": round(len(latencies) / sum(latencies), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=3000)
+    parser.add_argument("--docs", type=int, default=30)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    pages_per_doc = max(1, args.pages // args.docs)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for d in range(args.docs + 1):
+            path = os.path.join(tmp, f"manual-{d:03d}.txt")
+            with open(path, "w") as f:
+                f.write("\f".join(make_page(vocabulary, weights, rng) for _ in range(pages_per_doc)))
+            paths.append(path)
+
+        assistant = LocalAssistant(upload_dir=tmp)
+        start = time.perf_counter()
+        for path in paths[:-1]:
+            assistant.upload_file(path)
+        build_s = time.perf_counter() - start
+        built_passages = len(assistant.index)
+
+        start = time.perf_counter()
+        assistant.upload_file(paths[-1])
+        incremental_s = time.perf_counter() - start
+
+        index = assistant.index
+        passages = index._passages
+        queries = []
+        for _ in range(args.queries):
+            words = rng.choice(passages).text.split()
+            offset = rng.randrange(max(1, len(words) - 4))
+            queries.append(" ".join(words[offset:offset + 4]))
+
+        indexing = {
+            f"build ({args.docs} docs, {pages_per_doc * args.docs} pages)": {
+                "seconds": round(build_s, 3),
+                "pages_per_s": round(pages_per_doc * args.docs / build_s, 1),
+                "passages": built_passages,
+            },
+            f"incremental (+1 doc, {pages_per_doc} pages)": {
+                "seconds": round(incremental_s, 3),
+                "pages_per_s": round(pages_per_doc / incremental_s, 1),
+                "passages": len(index),
+            },
+        }
+        print_table("Indexing", indexing)
+
+        lengths, alive = index._lengths.tolist(), index._alive.tolist()
+        results = {
+            "hybrid search (NumPy)": timed_queries(lambda q: index.search(q, 3), queries),
+            "pure-Python BM25 only": timed_queries(lambda q: python_bm25(index, lengths, alive, q, 3), queries),
+            "LocalAssistant.chat": timed_queries(assistant.chat, queries),
+        }
+        print_table(f"Query latency over {len(index)} passages ({args.queries} queries)", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+/chat requests per second with logging off, written inline, and through the queue.
+
+--requests distinct questions go through the app to the simulated upstream
+(answering at once, so the web tier's own cost shows) from --concurrency
+clients. Each /chat logs its prompt and its request line at INFO. Log
+output goes to a sink whose writes take --write-ms, like a stderr pipe to
+a busy log collector:
+
+- "off": LOG_LEVEL=WARNING, nothing is written;
+- "inline (before)": logging.basicConfig's handler, writing text lines in
+  the request's thread;
+- "queue": the log pipeline, JSON lines written by its background thread;
+- "queue, 10% sampled": the same with LOG_SAMPLE_RATE=0.1.
+
+    python -m benchmarks.bench_logging --requests 5000 --concurrency 16 --write-ms 0.2
+"""
+import argparse
+import asyncio
+import io
+import logging
+import time
+
+import httpx
+
+import app as app_module
+from benchmarks.harness import print_table, summarize
+from cache import ResponseCache
+from log_pipeline import TEXT_FORMAT, LogPipeline
+from main_mock import LatencyProfile, PineconeAssistant
+
+
+class SlowSink(io.TextIOBase):
+    """Discards what is written, blocking for write_ms per write like a full pipe (without holding the GIL)"""
+
+    def __init__(self, write_ms: float):
+        self.delay = write_ms / 1000
+        self.writes = 0
+
+    def write(self, text: str) -> int:
+        self.writes += 1
+        time.sleep(self.delay)
+        return len(text)
+
+
+async def run_chats(requests: int, concurrency: int, offset: int) -> dict:
+    latencies = []
+    questions = iter(range(requests))
+    transport = httpx.ASGITransport(app=app_module.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for i in questions:
+                start = time.perf_counter()
+                await client.post("/chat", json={"message": f"Logging question {offset + i}?"})
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    summary = summarize(latencies, elapsed)
+    del summary["mean_ms"], summary["p95_ms"]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--write-ms", type=float, default=0.2)
+    args = parser.parse_args()
+
+    root = logging.getLogger()
+    app_module.log_pipeline.close()
+    # The client's own request log isn't part of the app's cost
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    app_module.set_assistant(PineconeAssistant(profile=LatencyProfile(ttft_ms=0)))
+
+    variants = ["off", "inline (before)", "queue", "queue, 10% sampled"]
+    results = {}
+    for offset, label in enumerate(variants):
+        sink = SlowSink(args.write_ms)
+        pipeline = None
+        if label == "off":
+            root.setLevel(logging.WARNING)
+        elif label == "inline (before)":
+            handler = logging.StreamHandler(sink)
+            handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+            root.addHandler(handler)
+            root.setLevel(logging.INFO)
+        else:
+            pipeline = LogPipeline(sample_rate=0.1 if "sampled" in label else 1.0, stream=sink)
+            pipeline.install()
+
+        app_module.response_cache = ResponseCache()
+        results[label] = asyncio.run(run_chats(args.requests, args.concurrency, offset * args.requests))
+        if pipeline is not None:
+            pipeline.close()
+        root.handlers = [handler for handler in root.handlers if getattr(handler, "stream", None) is not sink]
+        results[label]["lines_written"] = sink.writes
+
+    print_table(
+        f"{args.requests} /chat requests, concurrency {args.concurrency}, {args.write_ms} ms per log write",
+        results
+    )
+
+
+if __name__ == "__main__":
+    main()
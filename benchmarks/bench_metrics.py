@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Cost of recording metrics on the request path.
+
+"record" times the operations the app performs per request: a labelled
+histogram observation and a gauge increment, against the same operations
+guarded by a threading.Lock (how a thread-safe client library records).
+"requests" sends --requests GET /health requests through the ASGI app with
+and without MetricsMiddleware and reports the added time per request.
+
+    python -m benchmarks.bench_metrics --ops 1000000 --requests 5000
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+from fastapi import FastAPI
+
+from benchmarks.harness import print_table
+from metrics import MetricsMiddleware, MetricsRegistry
+
+
+class LockedHistogram:
+    """Histogram updated under a lock, for comparison"""
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self.lock:
+            self.histogram.labels(*labels).observe(value)
+
+
+def time_ops(func, ops: int) -> float:
+    start = time.perf_counter()
+    for i in range(ops):
+        func(i)
+    return (time.perf_counter() - start) / ops * 1e9
+
+
+def record_cost(ops: int) -> dict:
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("method", "route", "status"))
+    gauge = registry.gauge("in_flight", "In flight")
+    locked = LockedHistogram(histogram)
+    values = [(i % 1000) / 1000 for i in range(1000)]
+
+    def lock_free(i):
+        gauge.inc()
+        histogram.labels("GET", "/health", "200").observe(values[i % 1000])
+        gauge.dec()
+
+    def with_lock(i):
+        gauge.inc()
+        locked.observe(("GET", "/health", "200"), values[i % 1000])
+        gauge.dec()
+
+    return {
+        "lock-free (metrics.py)": {"ns_per_request": round(time_ops(lock_free, ops), 1)},
+        "with threading.Lock": {"ns_per_request": round(time_ops(with_lock, ops), 1)},
+    }
+
+
+async def drive(app, requests: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/health", "raw_path": b"/health", "root_path": "",
+             "scheme": "http", "query_string": b"", "headers": [], "server": ("bench", 80),
+             "client": ("bench", 1234), "http_version": "1.1", "asgi": {"version": "3.0"}}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def make_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    if instrumented:
+        registry = MetricsRegistry()
+        app.add_middleware(
+            MetricsMiddleware,
+            duration=registry.histogram("duration_seconds", "Duration", ("method", "route", "status")),
+            in_flight=registry.gauge("in_flight", "In flight")
+        )
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=1_000_000)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    print_table(f"Recording one request's metrics ({args.ops} times)", record_cost(args.ops))
+
+    results = {}
+    for label, instrumented in (("without middleware", False), ("with MetricsMiddleware", True)):
+        app = make_app(instrumented)
+        asyncio.run(drive(app, 200))
+        results[label] = {"us_per_request": round(asyncio.run(drive(app, args.requests)), 2)}
+    print_table(f"{args.requests} GET /health through the ASGI app", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Simulated upstream (main_mock.PineconeAssistant): cost of its stream chunks
+and how faithfully /chat/stream reproduces the configured latency.
+
+"chunks" compares the old mock, which built two classes with type() for
+every word, with the __slots__ chunk objects now shared by the mock and the
+local backend. The second table streams --streams concurrent distinct
+questions through /chat/stream against a mock with the given time to first
+token and tokens per second. "upstream" is measured where app.py receives
+the mock's chunks; "client" is what the HTTP client sees, including the web
+tier and the client itself, which shares the process (and GIL) with the
+server here.
+
+    python -m benchmarks.bench_mock_upstream --ttft-ms 300 --tokens-per-s 40 --streams 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import statistics
+import time
+import tracemalloc
+
+import httpx
+
+import app as app_module
+from benchmarks.harness import percentile, print_table, serve
+from cache import ResponseCache
+from chunks import ContentChunk
+from main_mock import LatencyProfile, PineconeAssistant
+
+
+class TimedAssistant(PineconeAssistant):
+    """Records time to first token and token rate of every stream it produces"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.samples = []
+
+    def chat(self, message: str, stream: bool = False):
+        start = time.perf_counter()
+        chunks = super().chat(message, stream=stream)
+        if not stream:
+            return chunks
+
+        def timed():
+            first = last = None
+            tokens = 0
+            for chunk in chunks:
+                if hasattr(chunk, "delta"):
+                    last = time.perf_counter()
+                    first = first or last
+                    tokens += 1
+                yield chunk
+            self.samples.append((first - start, (tokens - 1) / (last - first)))
+
+        return timed()
+
+
+def summarize_streams(samples: list) -> dict:
+    ttfts = [ttft for ttft, _ in samples]
+    return {
+        "ttft_p50_ms": round(percentile(ttfts, 50) * 1000, 1),
+        "ttft_p95_ms": round(percentile(ttfts, 95) * 1000, 1),
+        "tokens_per_s_p50": round(statistics.median(rate for _, rate in samples), 1),
+    }
+
+
+def legacy_chunk(content: str):
+    return type('MockChunk', (), {
+        'delta': type('MockDelta', (), {'content': content})()
+    })()
+
+
+def chunk_cost(make, tokens: int) -> dict:
+    words = [f" word{i}" for i in range(tokens)]
+    start = time.perf_counter()
+    for word in words:
+        make(word)
+    per_chunk_us = (time.perf_counter() - start) / tokens * 1e6
+
+    tracemalloc.start()
+    kept = [make(word) for word in words]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return {"us_per_chunk": round(per_chunk_us, 2), "bytes_per_chunk": size // tokens}
+
+
+async def stream_one(client, question: str) -> tuple:
+    start = time.perf_counter()
+    first = last = done = None
+    async with client.stream("POST", "/chat/stream", json={"message": question}) as resp:
+        async for line in resp.aiter_lines():
+            if line.startswith("event: done"):
+                done = True
+            elif line.startswith("data:") and done:
+                tokens = json.loads(line[len("data:"):])["chunks"]
+            elif line.startswith("data:"):
+                last = time.perf_counter()
+                first = first or last
+    # Deltas are coalesced into fewer events; the done event counts them
+    rate = (tokens - 1) / (last - first) if tokens > 1 and last > first else 0.0
+    return first - start, rate
+
+
+async def stream_all(base_url: str, count: int) -> list:
+    limits = httpx.Limits(max_connections=count + 8)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        # Open the connections first, so connection setup isn't counted as time to first token
+        await asyncio.gather(*[client.get("/health") for _ in range(count)])
+        return await asyncio.gather(*[
+            stream_one(client, f"Question {i} about the Nexon's service schedule") for i in range(count)
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--ttft-sigma", type=float, default=0.3)
+    parser.add_argument("--tokens-per-s", type=float, default=40)
+    parser.add_argument("--tokens-sigma", type=float, default=0.2)
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--chunk-tokens", type=int, default=20000)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print_table(f"Creating {args.chunk_tokens} stream chunks", {
+        "before (type() per word)": chunk_cost(legacy_chunk, args.chunk_tokens),
+        "after (__slots__)": chunk_cost(lambda word: ContentChunk("id", "mock", word), args.chunk_tokens),
+    })
+
+    profile = LatencyProfile(ttft_ms=args.ttft_ms, ttft_sigma=args.ttft_sigma, tokens_per_s=args.tokens_per_s,
+                             tokens_sigma=args.tokens_sigma, seed=1)
+    assistant = TimedAssistant(profile=profile)
+    app_module.set_assistant(assistant)
+    app_module.response_cache = ResponseCache()
+    with serve(app_module.app) as base_url:
+        results = asyncio.run(stream_all(base_url, args.streams))
+
+    print_table(f"{args.streams} concurrent streams through /chat/stream", {
+        "configured": {
+            "ttft_p50_ms": args.ttft_ms,
+            "ttft_p95_ms": round(args.ttft_ms * math.exp(1.645 * args.ttft_sigma), 1),
+            "tokens_per_s_p50": args.tokens_per_s,
+        },
+        "upstream": summarize_streams(assistant.samples),
+        "client": summarize_streams(results),
+    })
+
+
+if __name__ == "__main__":
+    main()
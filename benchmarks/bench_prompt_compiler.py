@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Prompt size and latency per intent: precompiled, intent-pruned templates vs the
+old full-system-prompt concatenation.
+
+Render cost is timed directly. End-to-end latency goes through
+PineconeAssistant.chat against a stand-in upstream whose latency grows with
+the number of input tokens (base latency plus a prefill cost per 1k tokens).
+
+    python -m benchmarks.bench_prompt_compiler --prefill-ms-per-1k 60
+"""
+import argparse
+import logging
+import statistics
+import time
+import timeit
+
+from benchmarks.harness import print_table
+from main import PineconeAssistant
+from prompts import INTENT_CONTEXTS, PromptCompiler, build_system_prompt, estimate_tokens
+
+SAMPLE_QUESTIONS = {
+    "safety": "What makes TATA Nexon's 5-Star safety rating special and what safety features does it include?",
+    "maintenance": "Give me the complete maintenance schedule for TATA Nexon with service intervals",
+    "engine": "What is the engine power and real-world performance of the petrol variant?",
+    "features": "How do I use the infotainment features and connect my phone?",
+    "troubleshooting": "My car has a warning light and unusual sound - help me troubleshoot the problem",
+    "comparison": "Compare the XZ and XZ+ variants and tell me the difference",
+    "general": "Tell me about the TATA Nexon",
+}
+
+
+def legacy_enhance(system_prompt: str, user_message: str, intent: str) -> str:
+    """The old per-call concatenation of the full system prompt"""
+    context = f"{system_prompt}\n\n"
+    context += INTENT_CONTEXTS[intent]
+    return f"{context}\n\n**USER QUESTION**: {user_message}\n\nPlease provide a detailed, structured response following the guidelines above."
+
+
+class TokenCostUpstream:
+    """Stand-in upstream whose latency depends on prompt size"""
+
+    def __init__(self, base_ms: float, prefill_ms_per_1k: float):
+        self.base_ms = base_ms
+        self.prefill_ms_per_1k = prefill_ms_per_1k
+
+    def chat(self, messages, stream=False):
+        tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        time.sleep((self.base_ms + self.prefill_ms_per_1k * tokens / 1000) / 1000)
+        return {"message": {"content": "ok"}}
+
+
+def make_assistant(prune: bool, upstream) -> PineconeAssistant:
+    """PineconeAssistant wired to the stand-in upstream, without touching the network"""
+    assistant = PineconeAssistant.__new__(PineconeAssistant)
+    assistant.assistant_name = "benchmark"
+    assistant.assistant = upstream
+    assistant.logger = logging.getLogger("benchmark")
+    assistant.system_prompt = assistant._create_system_prompt()
+    assistant.prompts = PromptCompiler(prune=prune)
+    return assistant
+
+
+def time_chat(assistant: PineconeAssistant, question: str, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        assistant.chat(question)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-ms", type=float, default=20.0, help="Stand-in fixed latency (ms)")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=60.0, help="Stand-in cost per 1k input tokens (ms)")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    upstream = TokenCostUpstream(args.base_ms, args.prefill_ms_per_1k)
+    before = make_assistant(prune=False, upstream=upstream)
+    after = make_assistant(prune=True, upstream=upstream)
+    system_prompt = build_system_prompt()
+
+    results = {}
+    for intent, question in SAMPLE_QUESTIONS.items():
+        assert after.detect_intent(question) == intent, f"sample question for {intent} misclassified"
+        old_prompt = legacy_enhance(system_prompt, question, intent)
+        new_prompt = after.render_prompt(question)
+
+        old_render = timeit.timeit(lambda: legacy_enhance(system_prompt, question, intent), number=20000) / 20000
+        new_render = timeit.timeit(lambda: after.prompts.render(question, intent), number=20000) / 20000
+
+        results[intent] = {
+            "chars_before": len(old_prompt),
+            "chars_after": new_prompt.chars,
+            "tokens_before": estimate_tokens(old_prompt),
+            "tokens_after": new_prompt.tokens,
+            "render_us_before": round(old_render * 1e6, 2),
+            "render_us_after": round(new_render * 1e6, 2),
+            "e2e_ms_before": round(time_chat(before, question, args.repeats), 2),
+            "e2e_ms_after": round(time_chat(after, question, args.repeats), 2),
+        }
+
+    print_table(
+        f"Prompt size and latency per intent ({args.base_ms:.0f} ms + "
+        f"{args.prefill_ms_per_1k:.0f} ms/1k tokens stand-in upstream)",
+        results
+    )
+
+
+if __name__ == "__main__":
+    main()
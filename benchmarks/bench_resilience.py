@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+/chat tail latency when the upstream browns out.
+
+The simulated upstream answers with a log-normal time to first token
+(--ttft-ms median, --ttft-sigma spread) and hangs for --stall-seconds on a
+--stall-rate share of calls. --requests distinct questions are sent through
+/chat by --concurrency clients, with the upstream calls made:
+
+- "before": without deadline or retries (as app.py used to);
+- "deadline + retries": UPSTREAM_ATTEMPT_TIMEOUT_SECONDS=--attempt-timeout
+  and two jittered retries;
+- "+ hedging": additionally a hedged attempt after the p95 latency.
+
+    python -m benchmarks.bench_resilience --requests 400 --concurrency 16 --stall-rate 0.03
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+import httpx
+
+import app as app_module
+from benchmarks.harness import print_table, serve, summarize
+from cache import ResponseCache
+from main_mock import LatencyProfile, PineconeAssistant
+from resilience import CircuitBreaker, ResilientUpstream
+
+
+async def run_chats(base_url: str, requests: int, concurrency: int, offset: int) -> dict:
+    latencies, errors = [], 0
+    questions = iter(range(requests))
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        async def worker():
+            nonlocal errors
+            for i in questions:
+                start = time.perf_counter()
+                response = await client.post("/chat", json={"message": f"Brown-out question {offset + i}?"})
+                latencies.append(time.perf_counter() - start)
+                errors += not response.json()["success"]
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    summary = summarize(latencies, elapsed)
+    del summary["mean_ms"]
+    return {"errors": errors, **summary}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--ttft-ms", type=float, default=100)
+    parser.add_argument("--ttft-sigma", type=float, default=0.5)
+    parser.add_argument("--stall-rate", type=float, default=0.03)
+    parser.add_argument("--stall-seconds", type=float, default=5.0)
+    parser.add_argument("--attempt-timeout", type=float, default=1.0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+
+    variants = {
+        "before": dict(timeout=3600, retries=0),
+        "deadline + retries": dict(attempt_timeout=args.attempt_timeout, retries=2),
+        "+ hedging": dict(attempt_timeout=args.attempt_timeout, retries=2, hedge=True),
+    }
+    results = {}
+    with serve(app_module.app) as base_url:
+        for offset, (label, options) in enumerate(variants.items()):
+            profile = LatencyProfile(ttft_ms=args.ttft_ms, ttft_sigma=args.ttft_sigma, timeout_rate=args.stall_rate,
+                                     timeout_seconds=args.stall_seconds, seed=1)
+            app_module.set_assistant(PineconeAssistant(profile=profile))
+            app_module.response_cache = ResponseCache()
+            app_module.resilient = ResilientUpstream(
+                app_module.upstream, CircuitBreaker(failure_threshold=args.requests), **options)
+            results[label] = asyncio.run(run_chats(base_url, args.requests, args.concurrency,
+                                                   offset * args.requests))
+            stats = app_module.resilient.stats()
+            results[label].update(retries=stats["retries"], hedged=stats["hedged"])
+
+    print_table(
+        f"{args.requests} /chat requests, concurrency {args.concurrency}, {args.stall_rate:.0%} of upstream "
+        f"calls stalling {args.stall_seconds:.0f}s",
+        results
+    )
+
+
+if __name__ == "__main__":
+    main()
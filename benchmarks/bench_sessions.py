@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Memory of stored conversations and request size per turn.
+
+Memory: 10k sessions of N turns, stored as SessionStore turns (slotted
+records with interned role tags) versus one {"role", "content"} dict per turn.
+Message texts are generated the same way for both and counted in both totals.
+
+Request size: JSON body of turn k for /chat/history, which resends every
+earlier message, versus POST /sessions/{id}/messages, which only sends the
+new one. "both sides" is what a client would have to resend to keep the
+assistant's answers in the history.
+
+    python -m benchmarks.bench_sessions --sessions 10000 --turns 20
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+from benchmarks.harness import print_table
+from sessions import SessionStore
+
+_WORDS = [
+    "nexon", "service", "interval", "airbag", "tyre", "pressure", "engine", "oil", "warranty",
+    "infotainment", "mileage", "diesel", "petrol", "brake", "battery", "how", "what", "when",
+    "should", "i", "the", "my", "is", "every", "km", "months", "check", "recommended",
+]
+
+
+def make_turns(rng, turns: int) -> list:
+    return [
+        ("user" if i % 2 == 0 else "assistant",
+         " ".join(rng.choice(_WORDS) for _ in range(rng.randint(8, 16) if i % 2 == 0 else rng.randint(40, 80))))
+        for i in range(turns)
+    ]
+
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+
+    def dict_turns():
+        rng = random.Random(1)
+        conversations = {}
+        for i in range(args.sessions):
+            conversations[str(i)] = [{"role": role, "content": text} for role, text in make_turns(rng, args.turns)]
+        return conversations
+
+    def session_store():
+        rng = random.Random(1)
+        store = SessionStore(max_bytes=1 << 40)
+        for _ in range(args.sessions):
+            session = store.create()
+            for role, text in make_turns(rng, args.turns):
+                store.append(session, role, text)
+        return store
+
+    # Roles in the dict variant come from the same literals, so they are shared there too;
+    # the difference is the per-turn container
+    results = {}
+    for name, build in (("dict per turn", dict_turns), ("SessionStore", session_store)):
+        used = measure(build)
+        results[name] = {
+            "sessions": args.sessions,
+            "turns_each": args.turns,
+            "MB_total": round(used / 1024 / 1024, 2),
+            "KB_per_session": round(used / args.sessions / 1024, 2),
+        }
+    print_table(f"Memory for {args.sessions} conversations of {args.turns} turns", results)
+
+    rng = random.Random(2)
+    conversation = make_turns(rng, args.turns)
+    sizes = {}
+    for turn in range(1, args.turns + 1, 2):
+        earlier_user = [text for role, text in conversation[:turn] if role == "user"]
+        history_body = json.dumps({"messages": earlier_user, "stream": False})
+        full_body = json.dumps({"messages": [{"role": r, "content": t} for r, t in conversation[:turn]]})
+        session_body = json.dumps({"message": conversation[turn - 1][1]})
+        sizes[f"user turn {turn // 2 + 1}"] = {
+            "/chat/history_bytes": len(history_body.encode()),
+            "both_sides_bytes": len(full_body.encode()),
+            "/sessions_bytes": len(session_body.encode()),
+        }
+    print_table("Request body per user turn", sizes)
+    print("\n/chat/history bodies only carry user messages (it drops assistant turns), "
+          "and still grow every turn.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Frames, bytes and CPU per streamed answer for the /chat/stream framing.
+
+"before" is the old framing: one ``data: {"content": ...}`` JSON frame per
+upstream delta plus a ``[DONE]`` frame, served as text/plain. "sse, no window"
+is the event stream with SSE_FLUSH_MS=0 (raw text, one frame per delta) and
+"sse, N ms window" the default coalescing. --streams concurrent answers of
+--tokens deltas arriving at --tokens-per-s are sent through the ASGI app into
+a send() that only counts, so the CPU time is the server's share per answer.
+
+    python -m benchmarks.bench_sse --streams 200 --tokens 300 --tokens-per-s 100
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from benchmarks.harness import print_table
+from sse import DEFAULT_FLUSH_BYTES, DEFAULT_FLUSH_INTERVAL, MEDIA_TYPE, EventStream, StreamEnd
+
+WORDS = "the engine should be serviced every 500 hours of operation or once a year".split()
+
+
+async def deltas(tokens: int, tokens_per_s: float):
+    """Upstream stand-in: word-sized deltas at a steady rate, then the usage"""
+    for i in range(tokens):
+        await asyncio.sleep(1 / tokens_per_s)
+        yield " " + WORDS[i % len(WORDS)]
+    yield StreamEnd({"prompt_tokens": 50, "completion_tokens": tokens, "total_tokens": 50 + tokens}, "stop")
+
+
+def make_app(framing: str, tokens: int, tokens_per_s: float, flush_interval: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/chat/stream")
+    async def chat_stream():
+        if framing == "before":
+            async def generate():
+                async for piece in deltas(tokens, tokens_per_s):
+                    if isinstance(piece, str):
+                        yield f"data: {json.dumps({'content': piece})}\n\n"
+                yield f"data: {json.dumps({'content': '[DONE]'})}\n\n"
+
+            return StreamingResponse(generate(), media_type="text/plain")
+
+        stream = EventStream(deltas(tokens, tokens_per_s), flush_interval, DEFAULT_FLUSH_BYTES)
+        return StreamingResponse(stream, media_type=MEDIA_TYPE, headers={"Cache-Control": "no-cache"})
+
+    return app
+
+
+async def drive(app, streams: int) -> dict:
+    scope = {"type": "http", "method": "POST", "path": "/chat/stream", "raw_path": b"/chat/stream",
+             "root_path": "", "scheme": "http", "query_string": b"", "headers": [], "server": ("bench", 80),
+             "client": ("bench", 1234), "http_version": "1.1", "asgi": {"version": "3.0"}}
+    frames = sizes = 0
+
+    async def receive():
+        await asyncio.sleep(3600)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal frames, sizes
+        if message["type"] == "http.response.body" and message.get("body"):
+            frames += 1
+            sizes += len(message["body"])
+
+    async def one_stream():
+        # The request body is never read, so receive() only matters for disconnect detection
+        await app(dict(scope), receive, send)
+
+    cpu, start = time.process_time(), time.perf_counter()
+    await asyncio.gather(*(one_stream() for _ in range(streams)))
+    cpu, elapsed = time.process_time() - cpu, time.perf_counter() - start
+    return {
+        "frames_per_answer": round(frames / streams, 1),
+        "frames_per_s": round(frames / elapsed),
+        "bytes_per_answer": round(sizes / streams),
+        "cpu_ms_per_answer": round(cpu / streams * 1000, 2),
+        "wall_s": round(elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--tokens", type=int, default=300, help="Deltas per answer")
+    parser.add_argument("--tokens-per-s", type=float, default=100, help="Upstream delta rate per stream")
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_FLUSH_INTERVAL * 1000)
+    args = parser.parse_args()
+
+    variants = {
+        "before (JSON per delta)": ("before", 0),
+        "sse, no window": ("sse", 0),
+        f"sse, {args.window_ms:.0f} ms window": ("sse", args.window_ms / 1000),
+    }
+    results = {}
+    for label, (framing, window) in variants.items():
+        app = make_app(framing, args.tokens, args.tokens_per_s, window)
+        results[label] = asyncio.run(drive(app, args.streams))
+
+    print_table(
+        f"{args.streams} concurrent answers of {args.tokens} deltas at {args.tokens_per_s:.0f} deltas/s",
+        results
+    )
+
+
+if __name__ == "__main__":
+    main()
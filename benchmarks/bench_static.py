@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Landing page cost: bytes transferred and page loads per second.
+
+A page load fetches / and the stylesheet and script it links, like a
+browser sending "Accept-Encoding: gzip, deflate, br". A repeat visit
+revalidates whatever the first visit cached without a freshness lifetime
+(If-None-Match when there was an ETag, a plain GET otherwise) and skips
+files marked immutable.
+
+- "before": build/index.html pre-rendered (as build_static.py used to do),
+  static/ served as is by the /static mount;
+- "after": the full build, with fingerprinted, precompressed /assets/ files.
+
+    python -m benchmarks.bench_static --loads 2000 --concurrency 16
+"""
+import argparse
+import asyncio
+import logging
+import re
+import tempfile
+import time
+
+import httpx
+from fastapi.responses import HTMLResponse
+
+import app as app_module
+import build_static
+from benchmarks.harness import print_table
+
+BROWSER_HEADERS = {"Accept-Encoding": "gzip, deflate, br"}
+LINKED = re.compile(r'(?:href|src)="(/(?:static|assets)/[^"]+)"')
+
+
+class UncompressedPage:
+    """GET / as it used to be served: the pre-rendered bytes, without compression or validators"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.body = f.read()
+
+    def response(self, headers, cache_control: str) -> HTMLResponse:
+        return HTMLResponse(self.body)
+
+
+async def page_load(client: httpx.AsyncClient, cache: dict) -> tuple:
+    """
+    Fetch the page and what it links, through a browser-like cache
+
+    Returns:
+        tuple: (requests sent, bytes received)
+    """
+    requests = received = 0
+
+    async def fetch(url: str) -> httpx.Response:
+        nonlocal requests, received
+        cached = cache.get(url)
+        if cached is not None and "immutable" in cached.headers.get("cache-control", ""):
+            return cached
+        headers = dict(BROWSER_HEADERS)
+        if cached is not None and "etag" in cached.headers:
+            headers["If-None-Match"] = cached.headers["etag"]
+        response = await client.get(url, headers=headers)
+        requests += 1
+        received += response.num_bytes_downloaded
+        if response.status_code == 304:
+            return cached
+        cache[url] = response
+        return response
+
+    page = await fetch("/")
+    await asyncio.gather(*(fetch(url) for url in LINKED.findall(page.text)))
+    return requests, received
+
+
+async def measure(loads: int, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        warm = {}
+        first = await page_load(client, warm)
+        repeat = await page_load(client, dict(warm))
+
+        results = {}
+        for label, fresh in (("first", True), ("repeat", False)):
+            remaining = iter(range(loads))
+
+            async def visitor():
+                for _ in remaining:
+                    await page_load(client, {} if fresh else dict(warm))
+
+            start = time.perf_counter()
+            await asyncio.gather(*(visitor() for _ in range(concurrency)))
+            results[label] = loads / (time.perf_counter() - start)
+
+    return {
+        "first_requests": first[0],
+        "first_kb": round(first[1] / 1024, 1),
+        "repeat_requests": repeat[0],
+        "repeat_kb": round(repeat[1] / 1024, 2),
+        "first_loads_per_s": round(results["first"]),
+        "repeat_loads_per_s": round(results["repeat"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loads", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+
+    results = {}
+    prerendered_index = app_module._prerendered_index
+    for label, full in (("before", False), ("after", True)):
+        with tempfile.TemporaryDirectory() as tmp:
+            app_module.BUILD_DIR = build_static.BUILD_DIR = tmp
+            app_module._static_assets.cache_clear()
+            prerendered_index.cache_clear()
+            if full:
+                assets = build_static.build_assets()
+                build_static.write_manifest(assets, build_static.render_pages(assets))
+                app_module._prerendered_index = prerendered_index
+            else:
+                page = UncompressedPage(build_static.render_pages()[0])
+                app_module._prerendered_index = lambda: page
+            results[label] = asyncio.run(measure(args.loads, args.concurrency))
+
+    print_table(f"{args.loads} landing page loads, concurrency {args.concurrency}", results)
+
+
+if __name__ == "__main__":
+    main()
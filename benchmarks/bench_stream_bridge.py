@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-byte and inter-chunk latency of /chat/stream under concurrent streams.
+
+Compares the old endpoint, which iterates the blocking upstream generator on
+the event loop, with the current one that drains it on a worker thread
+through a bounded buffer.
+
+    python -m benchmarks.bench_stream_bridge --streams 50 --chunk-interval 0.02
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+import app as app_module
+from benchmarks.harness import percentile, print_table, serve
+from benchmarks.stand_in import SlowAssistant
+
+
+def build_legacy_app(assistant) -> FastAPI:
+    """Copy of the old streaming endpoint that iterates upstream chunks on the event loop"""
+    legacy = FastAPI()
+
+    @legacy.post("/chat/stream")
+    async def chat_stream(body: dict):
+        async def generate():
+            for chunk in assistant.chat(body["message"], stream=True):
+                yield f"data: {json.dumps({'content': chunk.delta.content})}\n\n"
+            yield f"data: {json.dumps({'content': '[DONE]'})}\n\n"
+
+        return StreamingResponse(generate(), media_type="text/plain")
+
+    return legacy
+
+
+async def run_streams(base_url: str, streams: int):
+    """Open `streams` concurrent streams and time the first and subsequent chunks"""
+    ttfb, gaps, totals = [], [], []
+    limits = httpx.Limits(max_connections=streams + 4)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def one_stream(i):
+            start = time.perf_counter()
+            last = None
+            payload = {"message": f"Tell me about safety {i}", "stream": True}
+            async with client.stream("POST", "/chat/stream", json=payload) as resp:
+                async for line in resp.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    now = time.perf_counter()
+                    if last is None:
+                        ttfb.append(now - start)
+                    else:
+                        gaps.append(now - last)
+                    last = now
+            totals.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_stream(i) for i in range(streams)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "streams": streams,
+        "wall_s": round(elapsed, 2),
+        "ttfb_p50_ms": round(percentile(ttfb, 50) * 1000, 1),
+        "ttfb_p99_ms": round(percentile(ttfb, 99) * 1000, 1),
+        "gap_p50_ms": round(percentile(gaps, 50) * 1000, 1),
+        "gap_p99_ms": round(percentile(gaps, 99) * 1000, 1),
+        "total_p99_ms": round(percentile(totals, 99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.1, help="Stand-in time to first chunk (s)")
+    parser.add_argument("--chunk-interval", type=float, default=0.02, help="Stand-in gap between chunks (s)")
+    args = parser.parse_args()
+
+    stand_in = SlowAssistant(latency=args.latency, chunk_interval=args.chunk_interval)
+    results = {}
+
+    with serve(build_legacy_app(stand_in)) as url:
+        results["before"] = asyncio.run(run_streams(url, args.streams))
+
+    with serve(app_module.app) as url:
+        app_module.set_assistant(stand_in)
+        results["after"] = asyncio.run(run_streams(url, args.streams))
+
+    print_table(
+        f"{args.streams} concurrent streams, {args.latency * 1000:.0f} ms to first chunk, "
+        f"{args.chunk_interval * 1000:.0f} ms between chunks",
+        results
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Overhead of per-request phase timing and of the opt-in profiler.
+
+"span" times one span() around an empty block outside a traced request
+(how library code like main.py runs without the middleware) and inside one.
+"requests" sends --requests requests through an ASGI app whose endpoint
+enters five spans, like /chat: without TracingMiddleware, with it disabled
+(SERVER_TIMING=false), with it enabled, and with every request profiled.
+
+    python -m benchmarks.bench_tracing --ops 1000000 --requests 5000
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+
+from benchmarks.harness import print_table
+from tracing import Trace, TracingMiddleware, _current, span
+
+PHASES = ("cache", "enhance", "upstream", "prompt", "assistant_call")
+
+
+def span_cost(ops: int) -> float:
+    start = time.perf_counter()
+    for _ in range(ops):
+        with span("upstream"):
+            pass
+    return (time.perf_counter() - start) / ops * 1e9
+
+
+def make_app(middleware: dict = None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/chat")
+    async def chat():
+        for phase in PHASES:
+            with span(phase):
+                pass
+        return {"success": True}
+
+    if middleware is not None:
+        app.add_middleware(TracingMiddleware, **middleware)
+    return app
+
+
+async def drive(app, requests: int, headers: list) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/chat", "raw_path": b"/chat", "root_path": "",
+             "scheme": "http", "query_string": b"", "headers": headers, "server": ("bench", 80),
+             "client": ("bench", 1234), "http_version": "1.1", "asgi": {"version": "3.0"}}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=1_000_000)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    off = span_cost(args.ops)
+    token = _current.set(Trace())
+    on = span_cost(args.ops)
+    _current.reset(token)
+    print_table(f"One span ({args.ops} times)", {
+        "outside a traced request": {"ns_per_span": round(off, 1)},
+        "inside a traced request": {"ns_per_span": round(on, 1)},
+    })
+
+    profile_headers = [(b"x-profile", b"1"), (b"x-admin-token", b"secret")]
+    runs = {
+        "no middleware": (None, []),
+        "SERVER_TIMING=false": ({"enabled": False}, []),
+        "SERVER_TIMING=true": ({"enabled": True}, []),
+        "profiled (X-Profile)": ({"enabled": True, "admin_token": "secret"}, profile_headers),
+    }
+    results = {}
+    for label, (middleware, headers) in runs.items():
+        app = make_app(middleware)
+        requests = args.requests if not headers else max(1, args.requests // 50)
+        asyncio.run(drive(app, min(requests, 200), headers))
+        results[label] = {"requests": requests, "us_per_request": round(asyncio.run(drive(app, requests, headers)), 2)}
+    print_table("GET /chat (five spans) through the ASGI app", results)
+
+
+if __name__ == "__main__":
+    main()
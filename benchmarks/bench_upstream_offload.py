@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Throughput and tail latency of /chat under many concurrent conversations.
+
+Compares the old behaviour (blocking assistant call inside the async endpoint)
+with the current app, which runs upstream calls in a worker pool. A /health
+probe runs alongside the load to show whether the event loop stays responsive.
+
+    python -m benchmarks.bench_upstream_offload --concurrency 64 --latency 0.1
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+import app as app_module
+from benchmarks.harness import print_table, serve, summarize
+from benchmarks.stand_in import SlowAssistant
+
+
+def build_legacy_app(assistant) -> FastAPI:
+    """Minimal copy of the old endpoints that call the assistant on the event loop"""
+    legacy = FastAPI()
+
+    @legacy.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @legacy.post("/chat")
+    async def chat(body: dict):
+        response = assistant.chat(body["message"], stream=False)
+        return {"response": assistant.get_response_content(response), "success": True}
+
+    return legacy
+
+
+async def run_load(base_url: str, concurrency: int, rounds: int):
+    """Fire `concurrency` chats per round and probe /health while they run"""
+    chat_latencies, health_latencies = [], []
+    limits = httpx.Limits(max_connections=concurrency + 8)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def one_chat(i):
+            start = time.perf_counter()
+            resp = await client.post("/chat", json={"message": f"Question {i} about safety"})
+            resp.raise_for_status()
+            chat_latencies.append(time.perf_counter() - start)
+
+        async def probe_health(stop):
+            while not stop.is_set():
+                start = time.perf_counter()
+                await client.get("/health")
+                health_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.02)
+
+        stop = asyncio.Event()
+        prober = asyncio.create_task(probe_health(stop))
+        start = time.perf_counter()
+        for r in range(rounds):
+            await asyncio.gather(*(one_chat(r * concurrency + i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await prober
+
+    return summarize(chat_latencies, elapsed), summarize(health_latencies, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.1, help="Stand-in upstream latency (s)")
+    args = parser.parse_args()
+
+    stand_in = SlowAssistant(latency=args.latency)
+    results = {}
+
+    with serve(build_legacy_app(stand_in)) as url:
+        chat, health = asyncio.run(run_load(url, args.concurrency, args.rounds))
+        results["before /chat"] = chat
+        results["before /health"] = health
+
+    with serve(app_module.app) as url:
+        app_module.set_assistant(stand_in)
+        chat, health = asyncio.run(run_load(url, args.concurrency, args.rounds))
+        results["after /chat"] = chat
+        results["after /health"] = health
+
+    print_table(
+        f"{args.concurrency} concurrent chats x {args.rounds} rounds, "
+        f"{args.latency * 1000:.0f} ms upstream, {app_module.upstream.max_workers} workers",
+        results
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Shared helpers for the benchmark scripts: serving an ASGI app on a local port
+and summarizing latency samples.
+"""
+import logging
+import socket
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+
+import uvicorn
+
+# Per-request client logging would drown out the results
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def free_port() -> int:
+    """Return a TCP port that is currently free on localhost"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve(app, port: int = None):
+    """
+    Run an ASGI app with uvicorn in a background thread
+
+    Args:
+        app: ASGI application
+        port (int): Port to bind (a free one is picked if omitted)
+
+    Yields:
+        str: Base URL of the running server
+    """
+    port = port or free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Server did not start within 10 seconds")
+        time.sleep(0.01)
+
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+def percentile(samples, pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies, elapsed: float) -> dict:
+    """
+    Summarize request latencies (seconds) collected over a wall-clock interval
+
+    Returns:
+        dict: Request count, throughput and latency percentiles in milliseconds
+    """
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def print_table(title: str, rows: dict):
+    """Print benchmark results as an aligned table"""
+    print(f"\n=== {title} ===")
+    if not rows:
+        return
+    columns = list(next(iter(rows.values())).keys())
+    width = max(len(name) for name in rows) + 2
+    widths = [max(16, len(col) + 2) for col in columns]
+    print("".ljust(width) + "".join(col.rjust(w) for col, w in zip(columns, widths)))
+    for name, row in rows.items():
+        print(name.ljust(width) + "".join(str(row[col]).rjust(w) for col, w in zip(columns, widths)))
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Load-test suite for the HTTP API, run in-process against the simulated upstream.
+
+Starts app.app with uvicorn in this process, backed by the mock assistant with
+the given latency profile, and drives each scenario (/chat, /chat/stream,
+/chat/history, /upload and /files) with --concurrency workers until
+--requests requests are done. Every chat question is distinct, so the
+response cache and request coalescing don't hide upstream latency. Uploads
+and the upload manifest go to a temporary directory.
+
+For every scenario it reports throughput, error count and p50/p95/p99
+latency; streams also report time to first token and tokens per second.
+Results are written as JSON (by default benchmarks/results/<commit>.json);
+--compare checks them against an earlier run and exits with status 1 if a
+scenario got slower or lost throughput by more than --tolerance.
+
+    python -m benchmarks.loadtest --concurrency 32 --requests 500
+    python -m benchmarks.loadtest --compare benchmarks/results/<base commit>.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+import app as app_module
+from benchmarks.harness import percentile, print_table, serve
+from cache import ResponseCache
+from file_index import FileIndex
+from main_mock import LatencyProfile, PineconeAssistant
+from manifest import UploadManifest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# Metrics checked by --compare: name -> True if higher is better
+COMPARED_METRICS = {"throughput_rps": True, "p50_ms": False, "p95_ms": False, "ttft_p50_ms": False}
+
+
+# Ingestion jobs started by upload(), awaited before the next scenario
+_upload_jobs = []
+
+class Sample:
+    __slots__ = ("latency", "ok", "ttft", "tokens_per_s")
+
+    def __init__(self, latency: float, ok: bool, ttft: float = None, tokens_per_s: float = None):
+        self.latency = latency
+        self.ok = ok
+        self.ttft = ttft
+        self.tokens_per_s = tokens_per_s
+
+
+async def chat(client, i: int) -> Sample:
+    start = time.perf_counter()
+    resp = await client.post("/chat", json={"message": f"Load test question {i} about the Nexon's safety"})
+    return Sample(time.perf_counter() - start, resp.status_code == 200 and resp.json()["success"])
+
+
+async def chat_stream(client, i: int) -> Sample:
+    start = time.perf_counter()
+    first = last = done = None
+    event = "message"
+    async with client.stream("POST", "/chat/stream",
+                             json={"message": f"Load test question {i} about the Nexon's engine"}) as resp:
+        if resp.status_code != 200:
+            await resp.aread()
+            return Sample(time.perf_counter() - start, False)
+        async for line in resp.aiter_lines():
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:") and event == "done":
+                done = json.loads(line[len("data:"):])
+            elif line.startswith("data:") and event == "message":
+                last = time.perf_counter()
+                first = first or last
+            elif not line:
+                event = "message"
+    latency = time.perf_counter() - start
+    if first is None or done is None:
+        return Sample(latency, False)
+    # Deltas are coalesced into fewer events; the done event counts them
+    tokens = done["chunks"]
+    rate = (tokens - 1) / (last - first) if tokens > 1 and last > first else None
+    return Sample(latency, True, first - start, rate)
+
+
+async def chat_history(client, i: int) -> Sample:
+    messages = [
+        "Tell me about the Nexon's engine",
+        "The Nexon has a 1.2L Revotron turbo petrol engine.",
+        f"Load test follow-up {i}: what about its safety features?",
+    ]
+    start = time.perf_counter()
+    resp = await client.post("/chat/history", json={"messages": messages})
+    return Sample(time.perf_counter() - start, resp.status_code == 200 and resp.json()["success"])
+
+
+async def upload(client, i: int) -> Sample:
+    # Distinct content, so deduplication doesn't skip the upstream upload
+    content = f"Load test document {i} {time.time_ns()}\n".encode() * 256
+    start = time.perf_counter()
+    resp = await client.post("/upload", files={"file": (f"loadtest-{i}.txt", content)})
+    latency = time.perf_counter() - start
+    ok = resp.status_code == 200 and resp.json()["success"]
+    if ok:
+        _upload_jobs.append(resp.json()["job_id"])
+    return Sample(latency, ok)
+
+
+async def list_files(client, i: int) -> Sample:
+    start = time.perf_counter()
+    resp = await client.get("/files", params={"limit": 50, "offset": (i * 50) % 500})
+    return Sample(time.perf_counter() - start, resp.status_code == 200 and "error" not in resp.json())
+
+
+# Scenario name -> coroutine sending request number i
+SCENARIOS = {
+    "chat": chat,
+    "chat_stream": chat_stream,
+    "chat_history": chat_history,
+    "upload": upload,
+    "files": list_files,
+}
+
+
+async def drive(base_url: str, scenario, concurrency: int, requests: int) -> tuple:
+    """
+    Send `requests` requests with `concurrency` workers, each starting its
+    next request as soon as the previous one finished
+
+    Returns:
+        tuple: (samples, elapsed seconds)
+    """
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        counter = iter(range(requests))
+        samples = []
+
+        async def worker():
+            for i in counter:
+                try:
+                    samples.append(await scenario(client, i))
+                except httpx.HTTPError:
+                    samples.append(Sample(0.0, False))
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        return samples, time.perf_counter() - start
+
+
+def summarize_samples(samples: list, elapsed: float) -> dict:
+    """Throughput and latency percentiles of the successful requests, plus stream metrics"""
+    ok = [sample for sample in samples if sample.ok]
+    latencies = [sample.latency for sample in ok]
+    result = {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+    ttfts = [sample.ttft for sample in ok if sample.ttft is not None]
+    if ttfts:
+        rates = [sample.tokens_per_s for sample in ok if sample.tokens_per_s is not None]
+        result.update({
+            "ttft_p50_ms": round(percentile(ttfts, 50) * 1000, 2),
+            "ttft_p95_ms": round(percentile(ttfts, 95) * 1000, 2),
+            "ttft_p99_ms": round(percentile(ttfts, 99) * 1000, 2),
+            "tokens_per_s_p50": round(statistics.median(rates), 1) if rates else 0.0,
+        })
+    return result
+
+
+def git_commit() -> str:
+    """Short hash of the checked-out commit, with "-dirty" for uncommitted changes"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def run_suite(scenarios: list, concurrency: int, requests: int, profile, warmup: int = 10) -> dict:
+    """
+    Run the scenarios against app.app served in-process
+
+    Args:
+        scenarios (list): Names from SCENARIOS, run one after another
+        concurrency (int): Concurrent workers per scenario
+        requests (int): Requests per scenario
+        profile (LatencyProfile): Latency profile of the simulated upstream
+        warmup (int): Requests sent before each scenario and not measured
+
+    Returns:
+        dict: Results per scenario
+    """
+    upload_dir = tempfile.mkdtemp(prefix="loadtest-uploads-")
+    saved = {name: getattr(app_module, name)
+             for name in ("UPLOAD_DIR", "file_index", "upload_manifest", "response_cache")}
+    app_module.UPLOAD_DIR = upload_dir
+    app_module.file_index = FileIndex(upload_dir)
+    app_module.upload_manifest = UploadManifest(os.path.join(upload_dir, ".manifest.json"))
+    app_module.set_assistant(PineconeAssistant(profile=profile))
+
+    results = {}
+    try:
+        with serve(app_module.app) as base_url:
+            for name in scenarios:
+                app_module.response_cache = ResponseCache()
+                scenario = SCENARIOS[name]
+                if warmup:
+                    # Negative request numbers keep warm-up questions and files distinct
+                    asyncio.run(drive(base_url, lambda client, i: scenario(client, -1 - i),
+                                      min(concurrency, warmup), warmup))
+                samples, elapsed = asyncio.run(drive(base_url, scenario, concurrency, requests))
+                results[name] = summarize_samples(samples, elapsed)
+                asyncio.run(wait_for_ingestion(base_url))
+    finally:
+        for name, value in saved.items():
+            setattr(app_module, name, value)
+        for entry in os.scandir(upload_dir):
+            os.remove(entry.path)
+        os.rmdir(upload_dir)
+    return results
+
+
+async def wait_for_ingestion(base_url: str, timeout: float = 60):
+    """Let background ingestion of the uploads finish, so it doesn't overlap the next scenario"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while _upload_jobs and time.monotonic() < deadline:
+            status = (await client.get(f"/upload/{_upload_jobs[-1]}")).json()["status"]
+            if status in ("completed", "failed"):
+                _upload_jobs.pop()
+            else:
+                await asyncio.sleep(0.01)
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Differences from a baseline run beyond the tolerance
+
+    Args:
+        current (dict): Scenario results of this run
+        baseline (dict): Scenario results of the earlier run
+        tolerance (float): Allowed relative change, e.g. 0.2 for 20%
+
+    Returns:
+        list: (scenario, metric, baseline value, current value, change) for each regression
+    """
+    regressions = []
+    for name, result in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if not before.get(metric) or metric not in result:
+                continue
+            change = result[metric] / before[metric] - 1
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append((name, metric, before[metric], result[metric], round(change, 3)))
+        if result["errors"] > before["errors"]:
+            regressions.append((name, "errors", before["errors"], result["errors"], None))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--ttft-ms", type=float, default=50, help="Median time to first token of the upstream")
+    parser.add_argument("--tokens-per-s", type=float, default=200, help="Median token rate of the upstream")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the upstream's latencies")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="Results file of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Relative change --compare accepts before failing (default: 0.2)")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    # Per-request logging would dominate the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+
+    profile = LatencyProfile(ttft_ms=args.ttft_ms, ttft_sigma=0.3, tokens_per_s=args.tokens_per_s,
+                             tokens_sigma=0.2, seed=args.seed)
+    results = run_suite(scenarios, args.concurrency, args.requests, profile)
+    print_table(f"{args.requests} requests per scenario, concurrency {args.concurrency}", {
+        name: {key: result.get(key, "") for key in
+               ("errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "ttft_p50_ms", "tokens_per_s_p50")}
+        for name, result in results.items()
+    })
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"concurrency": args.concurrency, "requests": args.requests, "scenarios": scenarios,
+                   "upstream": profile._asdict()},
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print(f"⚠️  {args.compare} was run with a different configuration")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"\n❌ Regressions against {baseline.get('commit', args.compare)}:")
+            for name, metric, before, after, change in regressions:
+                print(f"   {name}.{metric}: {before} -> {after}" + (f" ({change:+.0%})" if change is not None else ""))
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.tolerance:.0%} against {baseline.get('commit', args.compare)}")
+
+
+if __name__ == "__main__":
+    main()
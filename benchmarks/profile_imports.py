@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Import-time profile of the app: what a cold start spends before serving.
+
+Runs `python -X importtime -c "import app"` in a fresh process and reports
+the cost per top-level package (summed self time of all its modules) and the
+most expensive individual modules. It also checks that the dependencies the
+app defers until first use (Jinja2, aiofiles, the assistant backends, the
+Pinecone SDK and NumPy) are not imported at startup.
+
+    python -m benchmarks.profile_imports --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from benchmarks.harness import print_table
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use, never by `import app`
+DEFERRED = ("jinja2", "aiofiles", "dotenv", "main", "main_mock", "local_rag", "pinecone", "numpy")
+
+
+def import_profile(module: str) -> list:
+    """(module, self_us, cumulative_us) for every module imported by `import <module>`"""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app", help="Module to import")
+    parser.add_argument("--top", type=int, default=15, help="Packages and modules to list")
+    args = parser.parse_args()
+
+    rows = import_profile(args.module)
+    total_us = sum(self_us for _, self_us, _ in rows)
+
+    packages = defaultdict(lambda: [0, 0])
+    for name, self_us, _ in rows:
+        package = packages[name.split(".")[0]]
+        package[0] += self_us
+        package[1] += 1
+    by_package = sorted(packages.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+    print_table(f"import {args.module}: {total_us / 1000:.1f} ms in {len(rows)} modules, by package", {
+        name: {"self_ms": round(self_us / 1000, 1), "share_pct": round(100 * self_us / total_us, 1), "modules": count}
+        for name, (self_us, count) in by_package
+    })
+
+    by_module = sorted(rows, key=lambda row: row[1], reverse=True)[:args.top]
+    print_table("Most expensive modules", {
+        name: {"self_ms": round(self_us / 1000, 1), "cumulative_ms": round(cumulative_us / 1000, 1)}
+        for name, self_us, cumulative_us in by_module
+    })
+
+    imported = {name.split(".")[0] for name, _, _ in rows}
+    eager = [name for name in DEFERRED if name in imported]
+    if eager:
+        print(f"\n❌ Imported at startup although deferred: {', '.join(eager)}")
+        sys.exit(1)
+    print(f"\n✅ Deferred until first use: {', '.join(DEFERRED)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Slow local stand-in for the Pinecone assistant used by the benchmarks.
+
+It exposes the same methods that app.py calls on PineconeAssistant and blocks
+the calling thread for a fixed time, like a real upstream round-trip.
+"""
+import time
+
+
+class _Delta:
+    __slots__ = ("content",)
+
+    def __init__(self, content):
+        self.content = content
+
+
+class _Chunk:
+    __slots__ = ("delta",)
+
+    def __init__(self, content):
+        self.delta = _Delta(content)
+
+
+class SlowAssistant:
+    def __init__(self, latency: float = 0.1, chunk_interval: float = 0.01,
+                 answer: str = "The TATA Nexon has a 5-Star Global NCAP safety rating."):
+        """
+        Args:
+            latency (float): Seconds each call blocks before answering
+            chunk_interval (float): Seconds between streamed chunks
+            answer (str): Answer text returned for every question
+        """
+        self.latency = latency
+        self.chunk_interval = chunk_interval
+        self.answer = answer
+        self.assistant_name = "stand-in"
+
+    def detect_intent(self, message: str):
+        return "general"
+
+    def _enhance_user_message(self, message: str) -> str:
+        return f"Question: {message}"
+
+    def chat(self, message: str, stream: bool = False):
+        time.sleep(self.latency)
+        if stream:
+            return self._stream()
+        return {"message": {"role": "assistant", "content": self.answer}}
+
+    def chat_with_history(self, messages: list, stream: bool = False):
+        return self.chat(messages[-1] if messages else "", stream=stream)
+
+    def upload_file(self, file_path: str, timeout: int = None):
+        time.sleep(self.latency)
+        return {"id": file_path, "status": "Available"}
+
+    def delete_file(self, file_id: str):
+        time.sleep(self.latency)
+
+    def get_response_content(self, response):
+        return response["message"]["content"]
+
+    def _stream(self):
+        for i, word in enumerate(self.answer.split()):
+            if i:
+                time.sleep(self.chunk_interval)
+            yield _Chunk(word if i == 0 else " " + word)
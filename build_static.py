@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Build-time precomputation for fast cold starts
+
+Run before deploying (deploy.sh does this):
+
+    python build_static.py
+
+- Copies static/ into build/static under content-hashed names
+  (css/style.css -> css/style.<digest>.css), served under /assets/ with a
+  year-long immutable Cache-Control, and lists them in build/manifest.json.
+- Renders templates/index.html into build/index.html, so GET / serves the
+  file without importing Jinja2, with its /static/ URLs pointing at the
+  fingerprinted copies. Templates that need the request to render are
+  skipped and keep being rendered per request.
+- Writes gzip (and, with the brotli package installed, brotli) variants of
+  the text files next to them, so they're never compressed per request.
+- Byte-compiles the app's modules, so a fresh process doesn't compile them
+  from source on its first import.
+"""
+import compileall
+import gzip
+import json
+import os
+import re
+import shutil
+import sys
+
+from static_assets import ASSETS_URL, ENCODINGS, MANIFEST, digest, fingerprinted_name
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip variants are written
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = os.path.join(ROOT, os.getenv("BUILD_DIR", "build"))
+STATIC_DIR = os.path.join(ROOT, "static")
+
+# Pages served from the build directory instead of being rendered per request
+PAGES = ["index.html"]
+
+# Files worth compressing; images and fonts are compressed already
+COMPRESSIBLE = {".css", ".js", ".html", ".json", ".map", ".svg", ".txt"}
+
+# References to files under static/ in rendered pages
+STATIC_URL = re.compile(r"/static/([\w./-]+)")
+
+
+def precompress(path: str) -> dict:
+    """
+    Write .gz and .br variants next to a file, keeping only those smaller than it
+
+    Returns:
+        dict: Size in bytes by content coding, "identity" included
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    compressors = {"gzip": lambda: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressors["br"] = lambda: brotli.compress(data, quality=11)
+    sizes = {"identity": len(data)}
+    for encoding, suffix in ENCODINGS:
+        compressed = compressors[encoding]() if encoding in compressors else None
+        if compressed is not None and len(compressed) < len(data):
+            with open(path + suffix, "wb") as f:
+                f.write(compressed)
+            sizes[encoding] = len(compressed)
+        elif os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return sizes
+
+
+def _sizes(sizes: dict) -> str:
+    return ", ".join(f"{encoding} {size}" for encoding, size in sizes.items())
+
+
+def build_assets() -> dict:
+    """
+    Copy the files under static/ into BUILD_DIR/static under fingerprinted names
+
+    Returns:
+        dict: Fingerprinted name by path relative to static/
+    """
+    out_dir = os.path.join(BUILD_DIR, "static")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    assets = {}
+    for directory, _, files in os.walk(STATIC_DIR):
+        for filename in sorted(files):
+            source = os.path.relpath(os.path.join(directory, filename), STATIC_DIR).replace(os.sep, "/")
+            with open(os.path.join(directory, filename), "rb") as f:
+                data = f.read()
+            fingerprinted = fingerprinted_name(source, data)
+            path = os.path.join(out_dir, fingerprinted)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+            sizes = precompress(path) if os.path.splitext(source)[1] in COMPRESSIBLE else {"identity": len(data)}
+            assets[source] = fingerprinted
+            print(f"✅ Fingerprinted {source} -> {ASSETS_URL}{fingerprinted} ({_sizes(sizes)} bytes)")
+    if brotli is None:
+        print("⚠️  brotli is not installed; only gzip variants were written")
+    return assets
+
+
+def render_pages(assets: dict = None) -> list:
+    """
+    Render the request-independent templates into BUILD_DIR
+
+    Args:
+        assets (dict): Fingerprinted names from build_assets(); /static/ URLs
+            of these files are rewritten to their /assets/ copies
+    """
+    from jinja2 import Environment, FileSystemLoader, StrictUndefined, UndefinedError
+
+    env = Environment(loader=FileSystemLoader(os.path.join(ROOT, "templates")), undefined=StrictUndefined)
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    rendered = []
+    for name in PAGES:
+        path = os.path.join(BUILD_DIR, name)
+        try:
+            html = env.get_template(name).render()
+        except UndefinedError as e:
+            print(f"⚠️  {name} depends on the request ({e}); it stays rendered per request")
+            for stale in [path] + [path + suffix for _, suffix in ENCODINGS]:
+                if os.path.exists(stale):
+                    os.remove(stale)
+            continue
+        if assets:
+            html = STATIC_URL.sub(
+                lambda m: ASSETS_URL + assets[m.group(1)] if m.group(1) in assets else m.group(0), html)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+        rendered.append(path)
+        print(f"✅ Rendered {name} -> {os.path.relpath(path, ROOT)} ({_sizes(precompress(path))} bytes)")
+    return rendered
+
+
+def write_manifest(assets: dict, pages: list):
+    """Record the fingerprinted assets and the digests of the rendered pages for the app"""
+    digests = {}
+    for path in pages:
+        with open(path, "rb") as f:
+            digests[os.path.relpath(path, BUILD_DIR).replace(os.sep, "/")] = digest(f.read())
+    with open(os.path.join(BUILD_DIR, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"assets": assets, "pages": digests}, f, indent=2, sort_keys=True)
+
+
+def compile_modules() -> bool:
+    """Write __pycache__ for the modules in the project root"""
+    ok = compileall.compile_dir(ROOT, maxlevels=0, rx=re.compile(r"[\\/]test_[^\\/]*\.py$"), quiet=1)
+    print("✅ Byte-compiled app modules" if ok else "❌ Byte-compiling failed")
+    return bool(ok)
+
+
+def main():
+    assets = build_assets()
+    write_manifest(assets, render_pages(assets))
+    if not compile_modules():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
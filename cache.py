@@ -0,0 +1,124 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Default cache bounds
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 3600.0
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL_SECONDS,
+                 clock=time.monotonic):
+        """
+        In-process LRU cache of assistant answers with TTL expiry
+
+        Args:
+            max_entries (int): Maximum number of cached answers (0 disables caching)
+            ttl (float): Seconds an answer stays valid
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Bumped on every invalidation so answers computed against an old
+        # document set are not stored after the set changed
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        """Normalize a user message so trivially different spellings share an entry"""
+        message = _WHITESPACE.sub(" ", message.strip().lower())
+        return _TRAILING_PUNCTUATION.sub("", message)
+
+    def make_key(self, message: str, intent: str) -> tuple:
+        """Build the cache key for a message and the intent the assistant picked for it"""
+        return (intent, self.normalize(message))
+
+    def get(self, key) -> Optional[str]:
+        """
+        Look up a cached answer
+
+        Returns:
+            str or None: Cached answer, or None on a miss or expired entry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value: str, generation: int = None):
+        """
+        Store an answer
+
+        Args:
+            key: Key from make_key()
+            value (str): Answer text
+            generation (int): Cache generation read before the upstream call;
+                the answer is dropped if the cache was invalidated since
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self) -> int:
+        """
+        Drop all cached answers, e.g. after the document set changed
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+            return removed
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,46 @@
+"""
+Streamed response chunks in the shape of the Pinecone assistant's
+
+app.py reads ``chunk.delta.content`` from content chunks and skips chunks
+without a ``delta`` (message start and end). Backends that produce their own
+streams (the simulated and the local assistant) use these classes; they use
+__slots__ because a long answer creates one chunk per token.
+"""
+
+
+class Delta:
+    __slots__ = ("content",)
+
+    def __init__(self, content: str):
+        self.content = content
+
+
+class MessageStartChunk:
+    __slots__ = ("id", "model", "role")
+    type = "message_start"
+
+    def __init__(self, id: str, model: str, role: str = "assistant"):
+        self.id = id
+        self.model = model
+        self.role = role
+
+
+class ContentChunk:
+    __slots__ = ("id", "model", "delta")
+    type = "content_chunk"
+
+    def __init__(self, id: str, model: str, content: str):
+        self.id = id
+        self.model = model
+        self.delta = Delta(content)
+
+
+class MessageEndChunk:
+    __slots__ = ("id", "model", "finish_reason", "usage")
+    type = "message_end"
+
+    def __init__(self, id: str, model: str, finish_reason: str = "stop", usage: dict = None):
+        self.id = id
+        self.model = model
+        self.finish_reason = finish_reason
+        self.usage = usage or {}
@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+
+
+def prompt_key(prompt: str) -> str:
+    """Short, fixed-size key for an enhanced prompt"""
+    return hashlib.blake2b(prompt.encode(), digest_size=16).hexdigest()
+
+
+class _Counters:
+    def __init__(self):
+        self.requests = 0
+        self.upstream_calls = 0
+
+    def stats(self) -> dict:
+        coalesced = self.requests - self.upstream_calls
+        return {
+            "requests": self.requests,
+            "upstream_calls": self.upstream_calls,
+            "coalesced": coalesced,
+            "coalescing_ratio": round(coalesced / self.requests, 4) if self.requests else 0.0,
+        }
+
+
+def _consume_exception(future: asyncio.Future):
+    # Waiters may all have gone away; don't log the error as never retrieved
+    if not future.cancelled():
+        future.exception()
+
+
+class SingleFlight(_Counters):
+    def __init__(self):
+        """
+        Shares one upstream call between concurrent identical requests
+
+        The first request for a key starts the call; requests for the same key
+        arriving while it runs wait for the same result. A waiter going away
+        doesn't cancel the call for the others.
+        """
+        super().__init__()
+        self._calls = {}
+
+    async def do(self, key, fn):
+        """
+        Run fn() once per key at a time
+
+        Args:
+            key: Identity of the request
+            fn: Coroutine function making the upstream call
+
+        Returns:
+            Result of the shared call (its exception is raised to every waiter)
+        """
+        self.requests += 1
+        future = self._calls.get(key)
+        if future is None:
+            self.upstream_calls += 1
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+
+            def forget(done):
+                if self._calls.get(key) is done:
+                    del self._calls[key]
+                _consume_exception(done)
+
+            future.add_done_callback(forget)
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "in_flight": len(self._calls)}
+
+
+class _SharedStream:
+    def __init__(self, source, on_done):
+        self.pieces = []
+        self.done = False
+        self.closing = False
+        self.error = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self._on_done = on_done
+        self._task = asyncio.ensure_future(self._pump(source))
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def _pump(self, source):
+        try:
+            async for piece in source:
+                self.pieces.append(piece)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = ConnectionAbortedError("Upstream stream cancelled")
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+            self._on_done(self)
+
+    def subscribe(self):
+        # Counted right away, so the stream can't be cancelled before the new
+        # subscriber starts reading
+        self.subscribers += 1
+        return self._follow()
+
+    async def _follow(self):
+        index = 0
+        try:
+            while True:
+                # Replays what was already emitted, then follows the live stream
+                if index < len(self.pieces):
+                    yield self.pieces[index]
+                    index += 1
+                elif self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                else:
+                    await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                # Nobody is listening any more; stop pulling from upstream
+                self.closing = True
+                self._task.cancel()
+
+
+class SharedStreams(_Counters):
+    def __init__(self):
+        """
+        Fans one upstream stream out to every concurrent identical request
+
+        Subscribers joining while a stream runs get the pieces emitted so far
+        replayed, then follow it live. The upstream stream is cancelled once its
+        last subscriber leaves.
+        """
+        super().__init__()
+        self._streams = {}
+
+    def subscribe(self, key, source_factory):
+        """
+        Join the stream for a key, starting it if none is running
+
+        Args:
+            key: Identity of the request
+            source_factory: Called without arguments to start the upstream
+                stream; returns an async iterator of pieces
+
+        Returns:
+            Async iterator over every piece of the shared stream
+        """
+        self.requests += 1
+        stream = self._streams.get(key)
+        if stream is None or stream.done or stream.closing:
+            self.upstream_calls += 1
+
+            def forget(finished):
+                if self._streams.get(key) is finished:
+                    del self._streams[key]
+
+            stream = self._streams[key] = _SharedStream(source_factory(), forget)
+        return stream.subscribe()
+
+    def stats(self) -> dict:
+        return {**super().stats(), "in_flight": len(self._streams)}
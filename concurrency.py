@@ -0,0 +1,158 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Default number of threads available for blocking upstream calls
+DEFAULT_UPSTREAM_WORKERS = 32
+
+# Default number of threads that can drain upstream streams at once
+DEFAULT_STREAM_WORKERS = 64
+
+# Default number of chunks a stream may buffer ahead of a slow client
+DEFAULT_STREAM_BUFFER = 64
+
+# How often a producer blocked on a full buffer checks whether the consumer left
+_PRODUCER_POLL_SECONDS = 0.1
+
+
+class _StreamEnd:
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException = None):
+        self.error = error
+
+
+class UpstreamExecutor:
+    def __init__(self, max_workers: int = None, thread_name_prefix: str = "upstream", call_duration=None):
+        """
+        Bounded worker pool for running blocking assistant calls off the event loop
+
+        Args:
+            max_workers (int): Maximum number of worker threads
+                (defaults to the UPSTREAM_WORKERS environment variable)
+            thread_name_prefix (str): Prefix for worker thread names
+            call_duration (metrics.Histogram): Optional histogram labelled with
+                the called function's name, observing how long run() calls take
+        """
+        if max_workers is None:
+            max_workers = int(os.getenv("UPSTREAM_WORKERS", DEFAULT_UPSTREAM_WORKERS))
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self.call_duration = call_duration
+        self._pool = None
+
+    @property
+    def pool(self):
+        """Thread pool, created on first use so importing the app stays cheap"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=self.thread_name_prefix
+            )
+        return self._pool
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run a blocking callable in the worker pool and await its result
+
+        Context variables are copied into the worker thread, like asyncio.to_thread.
+
+        Args:
+            func: Blocking callable
+            *args, **kwargs: Arguments for the callable
+
+        Returns:
+            Whatever the callable returns
+        """
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, func, *args, **kwargs)
+        if self.call_duration is None:
+            return await loop.run_in_executor(self.pool, call)
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self.pool, call)
+        finally:
+            self.call_duration.labels(getattr(func, "__name__", "call")).observe(time.perf_counter() - start)
+
+    async def iterate(self, func, *args, buffer_size: int = None, **kwargs):
+        """
+        Iterate a blocking generator on a worker thread as an async iterator
+
+        ``func(*args, **kwargs)`` is called on a worker thread and the iterator it
+        returns is drained there. Items are handed to the event loop through a
+        buffer of at most ``buffer_size`` chunks; when the buffer is full the
+        worker waits, so a slow client applies backpressure to the upstream
+        instead of piling chunks up in memory. If the consumer stops early
+        (e.g. the client disconnects) the worker closes the upstream iterator.
+
+        Args:
+            func: Blocking callable returning an iterator
+            *args, **kwargs: Arguments for the callable
+            buffer_size (int): Maximum chunks buffered ahead of the consumer
+                (defaults to the STREAM_BUFFER_CHUNKS environment variable)
+
+        Yields:
+            Items produced by the upstream iterator
+        """
+        if buffer_size is None:
+            buffer_size = int(os.getenv("STREAM_BUFFER_CHUNKS", DEFAULT_STREAM_BUFFER))
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        slots = threading.Semaphore(buffer_size)
+        stop = threading.Event()
+
+        def hand_over(item) -> bool:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+                return True
+            except RuntimeError:
+                # Event loop already closed
+                stop.set()
+                return False
+
+        def produce():
+            iterator = None
+            try:
+                iterator = iter(func(*args, **kwargs))
+                for item in iterator:
+                    while not slots.acquire(timeout=_PRODUCER_POLL_SECONDS):
+                        if stop.is_set():
+                            return
+                    if stop.is_set() or not hand_over(item):
+                        return
+                hand_over(_StreamEnd())
+            except BaseException as e:
+                hand_over(_StreamEnd(e))
+            finally:
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    close()
+
+        ctx = contextvars.copy_context()
+        loop.run_in_executor(self.pool, functools.partial(ctx.run, produce))
+        try:
+            while True:
+                item = await queue.get()
+                if isinstance(item, _StreamEnd):
+                    if item.error is not None:
+                        raise item.error
+                    break
+                slots.release()
+                yield item
+        finally:
+            stop.set()
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker threads"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
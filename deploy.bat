@@ -18,6 +18,10 @@ set /p PINECONE_API_KEY="Enter your Pinecone API key: "
 
 echo %PINECONE_API_KEY% | vercel env add PINECONE_API_KEY production
 
+REM Pre-render pages and byte-compile modules for faster cold starts
+echo 🏗️ Building static artifacts...
+python build_static.py || exit /b 1
+
 REM Deploy to production
 echo 🌐 Deploying to production...
 vercel --prod
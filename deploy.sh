@@ -19,6 +19,10 @@ read -s PINECONE_API_KEY
 
 vercel env add PINECONE_API_KEY production <<< "$PINECONE_API_KEY"
 
+# Pre-render pages and byte-compile modules for faster cold starts
+echo "🏗️  Building static artifacts..."
+python build_static.py || exit 1
+
 # Deploy to production
 echo "🌐 Deploying to production..."
 vercel --prod
@@ -0,0 +1,135 @@
+import hashlib
+import os
+import uuid
+
+# Sort keys accepted by FileIndex.page()
+SORT_KEYS = ("name", "size", "modified")
+
+# Page size used when the client doesn't ask for one, and the largest allowed
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def reserved(name: str) -> bool:
+    """Whether a file name is kept for the app's own files (dotfiles, partial uploads, temporary files)"""
+    return name.startswith(".") or name.endswith((".part", ".tmp"))
+
+
+def _listed(name: str) -> bool:
+    """Whether a directory entry is an uploaded file"""
+    return not reserved(name)
+
+
+class FileIndex:
+    def __init__(self, directory: str):
+        """
+        In-memory metadata index of the uploaded files
+
+        The index is built with one os.scandir pass and kept current by the
+        upload and delete paths. Each read compares the directory mtime with the
+        one seen at the last scan, so files added, renamed or removed behind the
+        app's back trigger a rescan. Files rewritten in place without touching
+        the directory aren't noticed until the next rescan.
+
+        Args:
+            directory (str): Directory holding the uploaded files
+        """
+        self.directory = directory
+        self.version = 0
+        self._entries = {}
+        self._sorted = {}
+        self._dir_mtime = None
+        # Distinguishes ETags of this process from those of earlier runs
+        self._instance = uuid.uuid4().hex[:8]
+
+    def _directory_mtime(self):
+        try:
+            return os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _changed(self):
+        self.version += 1
+        self._sorted.clear()
+
+    def rescan(self):
+        """Rebuild the index from the directory"""
+        entries = {}
+        dir_mtime = self._directory_mtime()
+        if dir_mtime is not None:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if _listed(entry.name) and entry.is_file():
+                        stat = entry.stat()
+                        entries[entry.name] = {"name": entry.name, "size": stat.st_size, "modified": stat.st_mtime}
+        self._dir_mtime = dir_mtime
+        if entries != self._entries:
+            self._entries = entries
+            self._changed()
+
+    def refresh(self):
+        """Rescan if the directory changed since the index last saw it"""
+        if self._dir_mtime is None or self._directory_mtime() != self._dir_mtime:
+            self.rescan()
+
+    def _ensure_built(self):
+        if self._dir_mtime is None:
+            self.rescan()
+
+    def record(self, name: str):
+        """Add or update one file after the app wrote it"""
+        self._ensure_built()
+        stat = os.stat(os.path.join(self.directory, name))
+        self._entries[name] = {"name": name, "size": stat.st_size, "modified": stat.st_mtime}
+        self._dir_mtime = self._directory_mtime()
+        self._changed()
+
+    def remove(self, name: str):
+        """Drop one file after the app deleted it"""
+        self._ensure_built()
+        if self._entries.pop(name, None) is not None:
+            self._changed()
+        self._dir_mtime = self._directory_mtime()
+
+    def _ordered(self, sort: str, descending: bool) -> list:
+        # Sorted views are computed once per index version
+        key = (sort, descending)
+        ordered = self._sorted.get(key)
+        if ordered is None:
+            entries = self._entries.values()
+            if sort == "name":
+                ordered = sorted(entries, key=lambda e: e["name"], reverse=descending)
+            else:
+                ordered = sorted(entries, key=lambda e: (e[sort], e["name"]), reverse=descending)
+            self._sorted[key] = ordered
+        return ordered
+
+    def etag(self, *query) -> str:
+        """ETag of one listing: changes whenever the index or the query changes"""
+        raw = f"{self._instance}:{self.version}:{query!r}"
+        return '"' + hashlib.blake2b(raw.encode(), digest_size=8).hexdigest() + '"'
+
+    def page(self, offset: int = 0, limit: int = DEFAULT_PAGE_SIZE, sort: str = "name",
+             descending: bool = False, prefix: str = "") -> tuple:
+        """
+        One page of the listing
+
+        Args:
+            offset (int): Entries to skip
+            limit (int): Entries to return
+            sort (str): One of SORT_KEYS
+            descending (bool): Reverse the sort order
+            prefix (str): Only include file names starting with this
+
+        Returns:
+            tuple: (list of {"name", "size", "modified"}, number of matching files)
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        ordered = self._ordered(sort, descending)
+        if prefix:
+            ordered = [e for e in ordered if e["name"].startswith(prefix)]
+        return ordered[offset:offset + limit], len(ordered)
+
+    def __len__(self):
+        return len(self._entries)
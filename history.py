@@ -0,0 +1,166 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+from prompts import CHARS_PER_TOKEN, estimate_tokens
+
+# Default history budget, in estimated tokens
+DEFAULT_HISTORY_TOKENS = 3000
+
+# Latest messages that are always sent, even over budget
+DEFAULT_KEEP_RECENT = 2
+
+# Share of the budget the summary of older turns may take
+DEFAULT_SUMMARY_TOKENS = 300
+
+# Summaries kept for reuse between turns
+DEFAULT_MAX_SUMMARIES = 1024
+
+# Role and framing tokens added to every message on top of its text
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Longest excerpt of one older turn in the summary
+_EXCERPT_CHARS = 200
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+
+
+def message_tokens(content: str) -> int:
+    """Estimated tokens of one message"""
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def as_message(message) -> dict:
+    """Message dict for a history entry given as a string or a dict"""
+    if isinstance(message, str):
+        return {"role": "user", "content": message}
+    return message
+
+
+class HistoryWindow(NamedTuple):
+    messages: list
+    tokens_sent: int
+    tokens_available: int
+    summarized: int
+
+
+def _excerpt(message: dict) -> str:
+    """First sentence of a message, clipped, as one summary line"""
+    text = " ".join(message.get("content", "").split())
+    text = _SENTENCE_END.split(text, 1)[0]
+    if len(text) > _EXCERPT_CHARS:
+        text = text[:_EXCERPT_CHARS - 1].rstrip() + "…"
+    return f"- {message.get('role', 'user').capitalize()}: {text}"
+
+
+class HistoryCompactor:
+    def __init__(self, budget: int = DEFAULT_HISTORY_TOKENS, keep_recent: int = DEFAULT_KEEP_RECENT,
+                 summary_tokens: int = DEFAULT_SUMMARY_TOKENS, max_summaries: int = DEFAULT_MAX_SUMMARIES):
+        """
+        Fits a conversation into a token budget
+
+        System messages and the latest keep_recent messages are always sent.
+        Newer turns fill the rest of the budget; the turns that don't fit are
+        collapsed into one summary message built from the first sentence of
+        each. Summaries are cached per conversation and only rebuilt when the
+        window moves.
+
+        Args:
+            budget (int): Estimated tokens available for the whole history
+            keep_recent (int): Latest messages always kept
+            summary_tokens (int): Tokens reserved for the summary of older turns
+            max_summaries (int): Conversations whose summary is cached
+        """
+        self.budget = budget
+        self.keep_recent = max(1, keep_recent)
+        self.summary_tokens = summary_tokens
+        self.max_summaries = max_summaries
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compact(self, messages: list, tokens: list = None, reserved: int = 0, key=None) -> HistoryWindow:
+        """
+        Select the messages to send
+
+        Args:
+            messages (list): Conversation as message dicts (or strings for user messages), oldest first
+            tokens (list): Token estimate per message, if the caller keeps them
+                (session turns store theirs when they are appended)
+            reserved (int): Tokens of context sent alongside the history (e.g. a prompt)
+            key: Identity of an append-only conversation (e.g. a session id); lets
+                its summary be extended instead of rebuilt when the window moves
+
+        Returns:
+            HistoryWindow: Messages to send, estimated tokens sent (including
+                reserved), tokens available and how many turns were summarized
+        """
+        messages = [as_message(m) for m in messages]
+        if tokens is None:
+            tokens = [message_tokens(m.get("content", "")) for m in messages]
+
+        pinned = {i for i, m in enumerate(messages) if m.get("role") == "system"}
+        if reserved + sum(tokens) <= self.budget:
+            return HistoryWindow(messages, reserved + sum(tokens), self.budget, 0)
+        used = reserved + sum(tokens[i] for i in pinned)
+
+        # Newest first: the latest turns always go, older ones while the budget
+        # (minus room for the summary) lasts
+        limit = self.budget - self.summary_tokens
+        boundary = len(messages)
+        kept = 0
+        for i in range(len(messages) - 1, -1, -1):
+            if i in pinned:
+                continue
+            if kept >= self.keep_recent and used + tokens[i] > limit:
+                break
+            used += tokens[i]
+            kept += 1
+            boundary = i
+
+        older = [m for i, m in enumerate(messages[:boundary]) if i not in pinned]
+        if not older:
+            return HistoryWindow(messages, used, self.budget, 0)
+
+        summary = self._summary(older, key)
+        used += message_tokens(summary)
+        window = [messages[i] for i in sorted(pinned)]
+        window.append({"role": "user", "content": summary})
+        window.extend(m for i, m in enumerate(messages[boundary:], boundary) if i not in pinned)
+        return HistoryWindow(window, used, self.budget, len(older))
+
+    def _summary(self, older: list, key) -> str:
+        with self._lock:
+            cached_key = key if key is not None else hash(tuple(m.get("content", "") for m in older))
+            cached = self._summaries.get(cached_key)
+            if cached is not None and key is not None and cached[0] > len(older):
+                # The window moved back or the conversation was replaced
+                cached = None
+
+            if cached is not None and cached[0] == len(older):
+                self._summaries.move_to_end(cached_key)
+                return cached[2]
+
+            # Extend the cached lines with the turns that just left the window
+            lines = list(cached[1]) if cached is not None else []
+            lines.extend(_excerpt(m) for m in older[len(lines):])
+            text = self._render(lines)
+
+            self._summaries[cached_key] = (len(older), lines, text)
+            self._summaries.move_to_end(cached_key)
+            while len(self._summaries) > self.max_summaries:
+                self._summaries.popitem(last=False)
+            return text
+
+    def _render(self, lines: list) -> str:
+        # Keep the most recent lines that fit the summary budget
+        budget_chars = self.summary_tokens * CHARS_PER_TOKEN
+        picked, size = [], len(SUMMARY_HEADER)
+        for line in reversed(lines):
+            if size + len(line) + 1 > budget_chars:
+                break
+            picked.append(line)
+            size += len(line) + 1
+        return "\n".join([SUMMARY_HEADER] + picked[::-1])
@@ -0,0 +1,164 @@
+import re
+from typing import NamedTuple
+
+# Label for messages that match no keyword
+GENERAL = "general"
+
+# Keywords per query type, in priority order: when a message matches several
+# types, the first one listed here is the primary label. Keywords of four or
+# more letters also match longer words starting with them ("airbag" matches
+# "airbags", "trouble" matches "troubleshoot"); shorter ones ("vs", "hi",
+# "oil", "fix") only match as whole words.
+INTENT_KEYWORDS = {
+    "safety": ["safety", "secure", "protection", "airbag", "ncap"],
+    "maintenance": ["maintenance", "service", "servicing", "schedule", "oil"],
+    "engine": ["engine", "performance", "power", "specification", "petrol", "diesel"],
+    "features": ["feature", "technology", "technologies", "infotainment"],
+    "troubleshooting": ["problem", "issue", "trouble", "fix"],
+    "comparison": ["compare", "comparison", "vs", "versus", "difference", "better"],
+    "greeting": ["hello", "hi", "help", "start"],
+}
+
+# Whole-word matching applies to keywords shorter than this
+_PREFIX_MATCH_MIN_LENGTH = 4
+
+
+class IntentMatch(NamedTuple):
+    label: str
+    scores: dict
+
+
+def _trie_pattern(words) -> str:
+    """
+    Regex alternation for a set of words, factored into a prefix trie so the
+    regex engine follows one branch per character instead of trying every word
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A word ends here: the longer continuations are optional (tried first)
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class IntentClassifier:
+    def __init__(self, keywords: dict = None):
+        """
+        Keyword intent classifier that scans a message once with one combined regex
+
+        Args:
+            keywords (dict): Label -> keyword list, in priority order
+                (defaults to INTENT_KEYWORDS)
+        """
+        self.keywords = keywords or INTENT_KEYWORDS
+        self.labels = list(self.keywords)
+
+        # Keyword -> priority of its label (index into self.labels)
+        self._priority = {}
+        for priority, words in enumerate(self.keywords.values()):
+            for word in words:
+                self._priority.setdefault(word.lower(), priority)
+
+        prefixes = [w for w in self._priority if len(w) >= _PREFIX_MATCH_MIN_LENGTH]
+        whole_words = [w for w in self._priority if len(w) < _PREFIX_MATCH_MIN_LENGTH]
+        alternatives = []
+        if prefixes:
+            alternatives.append(_trie_pattern(prefixes))
+        if whole_words:
+            alternatives.append(f"(?:{_trie_pattern(whole_words)})\\b")
+        self._findall = re.compile(r"\b(?:" + "|".join(alternatives) + ")").findall
+
+    def _priorities(self, message: str) -> list:
+        """Label priority of every keyword hit in the message"""
+        return list(map(self._priority.__getitem__, self._findall(message.lower())))
+
+    def _match(self, priorities: list) -> IntentMatch:
+        if not priorities:
+            return IntentMatch(GENERAL, {})
+        counts = {}
+        for priority in priorities:
+            counts[priority] = counts.get(priority, 0) + 1
+        total = len(priorities)
+        scores = {
+            self.labels[priority]: round(count / total, 4)
+            for priority, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        }
+        return IntentMatch(self.labels[min(counts)], scores)
+
+    def detect(self, message: str) -> str:
+        """
+        Primary label of a message
+
+        Args:
+            message (str): User message
+
+        Returns:
+            str: Highest-priority matching label, or GENERAL
+        """
+        priorities = self._priorities(message)
+        return self.labels[min(priorities)] if priorities else GENERAL
+
+    def classify(self, message: str) -> IntentMatch:
+        """
+        Classify a message into all matching labels
+
+        Args:
+            message (str): User message
+
+        Returns:
+            IntentMatch: Primary label and the share of keyword hits per label
+        """
+        return self._match(self._priorities(message))
+
+    def classify_batch(self, messages: list) -> list:
+        """
+        Classify many messages at once
+
+        Args:
+            messages (list): User messages
+
+        Returns:
+            list: IntentMatch per message, in input order
+        """
+        findall = self._findall
+        lookup = self._priority.__getitem__
+        match = self._match
+        return [match(list(map(lookup, findall(message.lower())))) for message in messages]
+
+    def detect_batch(self, messages: list) -> list:
+        """
+        Primary label of many messages at once
+
+        Args:
+            messages (list): User messages
+
+        Returns:
+            list: Label per message, in input order
+        """
+        findall = self._findall
+        lookup = self._priority.__getitem__
+        labels = self.labels
+        result = []
+        for message in messages:
+            hits = findall(message.lower())
+            result.append(labels[min(map(lookup, hits))] if hits else GENERAL)
+        return result
+
+
+# Shared classifier used by both assistant implementations
+default_classifier = IntentClassifier()
+
+
+def detect_intent(message: str) -> str:
+    """Primary intent label of a message using the shared classifier"""
+    return default_classifier.detect(message)
@@ -0,0 +1,520 @@
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+import uuid
+import zlib
+from collections import Counter, OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+from chunks import ContentChunk, MessageEndChunk, MessageStartChunk
+from file_index import reserved
+from history import as_message
+from intents import detect_intent
+
+# Words per passage, and words repeated at the start of the next passage
+DEFAULT_CHUNK_WORDS = 120
+DEFAULT_CHUNK_OVERLAP = 30
+
+# Dimensions of the hashed character n-gram embedding
+DEFAULT_EMBEDDING_DIM = 512
+
+# Tokens whose hashed features are kept for reuse, least recently used dropped first (~300 bytes each)
+DEFAULT_FEATURE_CACHE_SIZE = 20000
+
+# Passages quoted in an answer
+DEFAULT_TOP_K = 3
+
+# Share of the score that comes from BM25; the rest is embedding similarity
+DEFAULT_BM25_WEIGHT = 0.7
+
+# Passages scoring below this are not quoted
+DEFAULT_MIN_SCORE = 0.15
+
+MODEL_NAME = "local-rag"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Files read as plain text; PDFs need pypdf
+TEXT_EXTENSIONS = frozenset({".txt", ".md", ".csv", ".json", ".log"})
+HTML_EXTENSIONS = frozenset({".html", ".htm"})
+
+_WORDS = re.compile(r"\S+")
+_TERMS = re.compile(r"[a-z0-9]+")
+_SCRIPTS = re.compile(r"<(script|style)\b.*?</\1>", re.IGNORECASE | re.DOTALL)
+_TAGS = re.compile(r"<[^>]+>")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its me my of on or "
+    "should that the their there this to was what when where which who why will with you your".split()
+)
+
+NO_DOCUMENTS = (
+    "No documents have been indexed yet. Upload the TATA Nexon owner's manual or other documents "
+    "and I'll answer from them."
+)
+NO_MATCH = "I couldn't find anything about that in the uploaded documents. Try rephrasing the question."
+
+
+def _stem(term: str) -> str:
+    """Fold plurals onto the singular ("brakes" -> "brake"), leaving words like "glass" alone"""
+    if len(term) > 3 and term[-1] == "s" and term[-2] not in "su":
+        return term[:-1]
+    return term
+
+
+def tokenize(text: str) -> list:
+    """Lowercase, plural-folded search terms of a text, without stopwords"""
+    return [_stem(term) for term in _TERMS.findall(text.lower()) if term not in _STOPWORDS]
+
+
+def extract_pages(file_path: str) -> list:
+    """
+    Text of a document, one string per page
+
+    Plain text files are split into pages at form feeds; HTML has its tags
+    stripped; PDFs are read with pypdf when it is installed.
+
+    Raises:
+        ValueError: The file type can't be read
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".pdf":
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            raise ValueError("Indexing PDF files needs pypdf (pip install pypdf)")
+        return [page.extract_text() or "" for page in PdfReader(file_path).pages]
+
+    with open(file_path, "rb") as f:
+        data = f.read()
+    if extension not in TEXT_EXTENSIONS and extension not in HTML_EXTENSIONS and b"\0" in data[:4096]:
+        raise ValueError(f"Can't extract text from {os.path.basename(file_path)}")
+    text = data.decode("utf-8", errors="replace")
+    if extension in HTML_EXTENSIONS:
+        text = _TAGS.sub(" ", _SCRIPTS.sub(" ", text))
+    return text.split("\f")
+
+
+def chunk_pages(pages: list, chunk_words: int = DEFAULT_CHUNK_WORDS,
+                overlap: int = DEFAULT_CHUNK_OVERLAP) -> list:
+    """
+    Split pages into overlapping passages of about chunk_words words
+
+    Returns:
+        list: (page number starting at 1, passage text) pairs
+    """
+    step = max(1, chunk_words - overlap)
+    chunks = []
+    for number, page in enumerate(pages, start=1):
+        words = _WORDS.findall(page)
+        for start in range(0, max(len(words) - overlap, 1), step):
+            text = " ".join(words[start:start + chunk_words])
+            if text:
+                chunks.append((number, text))
+    return chunks
+
+
+class Passage(NamedTuple):
+    doc_id: str
+    source: str
+    page: int
+    text: str
+
+
+class SearchHit(NamedTuple):
+    passage: Passage
+    score: float
+
+
+class LocalIndex:
+    def __init__(self, dim: int = DEFAULT_EMBEDDING_DIM, bm25_weight: float = DEFAULT_BM25_WEIGHT,
+                 feature_cache_size: int = DEFAULT_FEATURE_CACHE_SIZE):
+        """
+        In-memory hybrid search index over document passages
+
+        Each passage is scored with BM25 over its terms and with the cosine
+        similarity of hashed character-trigram embeddings, which still matches
+        plurals, inflections and typos that BM25 misses. Postings, passage
+        lengths and embeddings live in NumPy arrays, so a query is a handful
+        of vectorized operations per query term plus one matrix-vector
+        product. Documents are added and removed one at a time; removed
+        passages are masked out and compacted away once they are the majority.
+        The trigram features of recently seen tokens are cached, up to
+        feature_cache_size tokens, since queries bring arbitrary new ones.
+
+        Args:
+            dim (int): Embedding dimensions
+            bm25_weight (float): Share of the combined score taken by BM25
+            feature_cache_size (int): Tokens whose features are cached
+        """
+        self.dim = dim
+        self.bm25_weight = bm25_weight
+        self.feature_cache_size = feature_cache_size
+        self._lock = threading.Lock()
+        self._feature_cache = OrderedDict()
+        self._feature_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._passages = []
+        self._docs = {}
+        self._postings = {}
+        self._posting_arrays = {}
+        self._df = Counter()
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._live_passages = 0
+        self._live_length = 0
+
+    def __len__(self):
+        return self._live_passages
+
+    @property
+    def documents(self) -> list:
+        return list(self._docs)
+
+    def _token_features(self, token: str) -> tuple:
+        """Hashed feature indices and signs of a token's character trigrams"""
+        with self._feature_lock:
+            features = self._feature_cache.get(token)
+            if features is not None:
+                self._feature_cache.move_to_end(token)
+                return features
+
+        padded = f"<{token}>"
+        grams = [padded[i:i + 3] for i in range(len(padded) - 2)] + [padded]
+        hashes = [zlib.crc32(gram.encode()) for gram in grams]
+        features = (
+            np.array([h % self.dim for h in hashes], dtype=np.intp),
+            np.array([1.0 if h & 0x80000000 else -1.0 for h in hashes], dtype=np.float32),
+        )
+        with self._feature_lock:
+            self._feature_cache[token] = features
+            while len(self._feature_cache) > self.feature_cache_size:
+                self._feature_cache.popitem(last=False)
+        return features
+
+    def embed(self, terms) -> np.ndarray:
+        """L2-normalized hashed embedding of a bag of terms"""
+        counts = Counter(terms)
+        if not counts:
+            return np.zeros(self.dim, dtype=np.float32)
+        features = [self._token_features(term) for term in counts]
+        indices = np.concatenate([idx for idx, _ in features])
+        weights = np.concatenate([signs * count for (_, signs), count in zip(features, counts.values())])
+        vector = np.bincount(indices, weights=weights, minlength=self.dim).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _grow(self, extra: int):
+        needed = len(self._passages) + extra
+        capacity = len(self._lengths)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 256)
+        lengths = np.zeros(capacity, dtype=np.float32)
+        lengths[:len(self._passages)] = self._lengths[:len(self._passages)]
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:len(self._passages)] = self._vectors[:len(self._passages)]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._passages)] = self._alive[:len(self._passages)]
+        self._lengths, self._vectors, self._alive = lengths, vectors, alive
+
+    def add_document(self, doc_id: str, source: str, chunks: list) -> int:
+        """
+        Index a document's passages, replacing an earlier version with the same id
+
+        Args:
+            doc_id (str): Document id
+            source (str): Name shown with quoted passages
+            chunks (list): (page, text) pairs from chunk_pages()
+
+        Returns:
+            int: Number of passages indexed
+        """
+        # Tokenizing and embedding don't touch shared state, so they run outside the lock
+        prepared = []
+        for page, text in chunks:
+            terms = tokenize(text)
+            if terms:
+                prepared.append((Passage(doc_id, source, page, text), Counter(terms), self.embed(terms)))
+
+        with self._lock:
+            self._remove(doc_id)
+            self._insert(doc_id, prepared)
+        return len(prepared)
+
+    def _insert(self, doc_id: str, prepared: list):
+        self._grow(len(prepared))
+        doc_terms = Counter()
+        positions = []
+        for passage, counts, vector in prepared:
+            position = len(self._passages)
+            self._passages.append(passage)
+            length = sum(counts.values())
+            self._lengths[position] = length
+            self._vectors[position] = vector
+            self._alive[position] = True
+            for term, tf in counts.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = ([], [])
+                postings[0].append(position)
+                postings[1].append(tf)
+                self._posting_arrays.pop(term, None)
+            doc_terms.update(counts.keys())
+            self._live_length += length
+            positions.append(position)
+        self._df.update(doc_terms)
+        self._live_passages += len(positions)
+        self._docs[doc_id] = (positions, doc_terms)
+
+    def remove_document(self, doc_id: str) -> bool:
+        """Drop a document from the index; returns whether it was indexed"""
+        with self._lock:
+            return self._remove(doc_id)
+
+    def _remove(self, doc_id: str) -> bool:
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return False
+        positions, doc_terms = entry
+        self._alive[positions] = False
+        self._live_passages -= len(positions)
+        self._live_length -= int(self._lengths[positions].sum())
+        self._df.subtract(doc_terms)
+        if len(self._passages) - self._live_passages > max(self._live_passages, 256):
+            self._compact()
+        return True
+
+    def _compact(self):
+        """Rebuild postings and arrays without the removed passages, reusing their embeddings"""
+        documents = [
+            (doc_id, [(self._passages[p], Counter(tokenize(self._passages[p].text)), self._vectors[p].copy())
+                      for p in positions])
+            for doc_id, (positions, _) in self._docs.items()
+        ]
+        self._reset()
+        for doc_id, prepared in documents:
+            self._insert(doc_id, prepared)
+
+    def _postings_for(self, term: str):
+        arrays = self._posting_arrays.get(term)
+        if arrays is None:
+            positions, tfs = self._postings[term]
+            arrays = self._posting_arrays[term] = (
+                np.array(positions, dtype=np.intp), np.array(tfs, dtype=np.float32)
+            )
+        return arrays
+
+    def search(self, query: str, top_k: int = DEFAULT_TOP_K, min_score: float = DEFAULT_MIN_SCORE) -> list:
+        """
+        Best passages for a query
+
+        Args:
+            query (str): Question text
+            top_k (int): Most passages to return
+            min_score (float): Combined score (0..1) a passage needs to be returned
+
+        Returns:
+            list: SearchHit entries, best first
+        """
+        terms = tokenize(query)
+        query_vector = self.embed(terms)
+        with self._lock:
+            count = len(self._passages)
+            if not terms or not self._live_passages:
+                return []
+            lengths = self._lengths[:count]
+            avg_length = self._live_length / self._live_passages
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_length)
+
+            bm25 = np.zeros(count, dtype=np.float32)
+            for term in set(terms):
+                df = self._df.get(term, 0)
+                if df <= 0:
+                    continue
+                positions, tfs = self._postings_for(term)
+                idf = math.log(1 + (self._live_passages - df + 0.5) / (df + 0.5))
+                bm25[positions] += idf * tfs * (BM25_K1 + 1) / (tfs + norm[positions])
+
+            similarity = self._vectors[:count] @ query_vector
+            alive = self._alive[:count]
+            top_bm25 = bm25[alive].max(initial=0.0)
+            if top_bm25 > 0:
+                bm25 /= top_bm25
+            # With no exact term match anywhere, similarity alone decides
+            weight = self.bm25_weight if top_bm25 > 0 else 0.0
+            scores = weight * bm25 + (1 - weight) * np.clip(similarity, 0, None)
+            scores[~alive] = -1.0
+
+            k = min(top_k, count)
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return [
+                SearchHit(self._passages[i], round(float(scores[i]), 4))
+                for i in best if scores[i] >= min_score
+            ]
+
+
+class LocalAssistant:
+    def __init__(self, assistant_name: str = "manulassistan", upload_dir: str = None,
+                 top_k: int = DEFAULT_TOP_K, index: LocalIndex = None):
+        """
+        Offline assistant that answers with the best matching passages of the uploaded documents
+
+        Implements the same interface as main.PineconeAssistant, so app.py can
+        use it in its place (ASSISTANT_BACKEND=local) without network access.
+
+        Args:
+            assistant_name (str): Name of the assistant
+            upload_dir (str): Directory whose documents are indexed by warm_up() (UPLOAD_DIR by default)
+            top_k (int): Passages quoted per answer
+            index (LocalIndex): Index to use (a new one by default)
+        """
+        self.assistant_name = assistant_name
+        self.upload_dir = upload_dir if upload_dir is not None else os.getenv("UPLOAD_DIR", "uploads")
+        self.top_k = top_k
+        self.index = index if index is not None else LocalIndex()
+        self.logger = logging.getLogger(__name__)
+
+    def warm_up(self):
+        """Index the documents already in the upload directory"""
+        if not os.path.isdir(self.upload_dir):
+            return
+        indexed = 0
+        for name in sorted(os.listdir(self.upload_dir)):
+            path = os.path.join(self.upload_dir, name)
+            if reserved(name) or not os.path.isfile(path):
+                continue
+            try:
+                self._index_file(path)
+                indexed += 1
+            except Exception as e:
+                self.logger.warning("Skipping %s: %s", name, e)
+        self.logger.info("Local assistant '%s' indexed %d documents, %d passages", self.assistant_name, indexed,
+                         len(self.index), extra={"assistant": self.assistant_name, "documents": indexed,
+                                                 "passages": len(self.index)})
+
+    def ping(self):
+        """Health probe; there is no upstream to reach"""
+
+    def _index_file(self, file_path: str) -> tuple:
+        # Documents are keyed by content, like the upload manifest, so a file
+        # overwritten with new content gets a new id and duplicates share one
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        doc_id = digest.hexdigest()[:16]
+        passages = self.index.add_document(doc_id, os.path.basename(file_path), chunk_pages(extract_pages(file_path)))
+        return doc_id, passages
+
+    def upload_file(self, file_path: str, timeout: int = None):
+        """
+        Extract, chunk and index a document
+
+        Args:
+            file_path (str): Path to the file to index
+            timeout (int): Unused, kept for interface compatibility
+
+        Returns:
+            dict: Document id (derived from the content), file name and passage count
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        doc_id, passages = self._index_file(file_path)
+        name = os.path.basename(file_path)
+        self.logger.info("Indexed %s as %s: %d passages", name, doc_id, passages,
+                         extra={"doc_id": doc_id, "passages": passages})
+        return {"id": doc_id, "name": name, "status": "Available", "passages": passages}
+
+    def delete_file(self, file_id: str):
+        """Remove an indexed document"""
+        if self.index.remove_document(file_id):
+            self.logger.info("Removed %s from the local index", file_id, extra={"doc_id": file_id})
+
+    def detect_intent(self, user_message: str) -> str:
+        return detect_intent(user_message)
+
+    def _enhance_user_message(self, user_message: str) -> str:
+        """The retrieval query; no prompt is built for a local answer"""
+        return user_message
+
+    def _answer(self, query: str) -> dict:
+        hits = self.index.search(query, self.top_k)
+        if hits:
+            quotes = [f"{i}. {hit.passage.text} ({hit.passage.source}, page {hit.passage.page})"
+                      for i, hit in enumerate(hits, start=1)]
+            content = "From the uploaded documents:\n\n" + "\n\n".join(quotes)
+        else:
+            content = NO_MATCH if len(self.index) else NO_DOCUMENTS
+        return {
+            "message": {"role": "assistant", "content": content},
+            "citations": [
+                {"file": hit.passage.source, "page": hit.passage.page, "score": hit.score} for hit in hits
+            ],
+        }
+
+    @staticmethod
+    def _stream(response: dict):
+        # One content chunk per line, framed like Pinecone's streamed chunks
+        message_id = uuid.uuid4().hex
+        yield MessageStartChunk(message_id, MODEL_NAME)
+        for line in response["message"]["content"].splitlines(keepends=True):
+            yield ContentChunk(message_id, MODEL_NAME, line)
+        yield MessageEndChunk(message_id, MODEL_NAME)
+
+    def chat(self, message: str, stream: bool = False):
+        """
+        Answer a question from the indexed documents
+
+        Args:
+            message (str): Question
+            stream (bool): Whether to return the answer as a chunk generator
+
+        Returns:
+            dict or generator: Response in the same shape as the Pinecone assistant's
+        """
+        response = self._answer(message)
+        return self._stream(response) if stream else response
+
+    def chat_with_history(self, messages: list, stream: bool = False):
+        """
+        Answer the latest user message of a conversation
+
+        Args:
+            messages (list): Message dicts or strings; the last user message is the query
+            stream (bool): Whether to return the answer as a chunk generator
+
+        Returns:
+            dict or generator: Response in the same shape as the Pinecone assistant's
+        """
+        query = ""
+        for message in reversed(messages):
+            message = as_message(message)
+            if message.get("role", "user") == "user":
+                query = message.get("content", "")
+                break
+        return self.chat(query, stream=stream)
+
+    def get_response_content(self, response):
+        """
+        Extract content from response
+
+        Args:
+            response: Response from chat operation
+
+        Returns:
+            str: Content of the response
+        """
+        if isinstance(response, dict) and "message" in response:
+            return response["message"]["content"]
+        return str(response)
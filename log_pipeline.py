@@ -0,0 +1,222 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import zlib
+from logging.handlers import QueueHandler, QueueListener
+
+# Default level, output format ("json" or "text") and share of info/debug records kept
+DEFAULT_LEVEL = "INFO"
+DEFAULT_FORMAT = "json"
+DEFAULT_SAMPLE_RATE = 1.0
+
+# Default records waiting for the writer thread; more are dropped rather than blocking a request
+DEFAULT_QUEUE_SIZE = 10000
+
+# Format of LOG_FORMAT=text, the same as logging.basicConfig
+TEXT_FORMAT = "%(levelname)s:%(name)s:%(message)s"
+
+# Header carrying the request id, taken from the client when it looks sane
+REQUEST_ID_HEADER = b"x-request-id"
+_VALID_REQUEST_ID = re.compile(rb"[\w.:-]{1,64}")
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else came in through extra= and is a structured field
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "request_id", "taskName"
+}
+_traceback_formatter = logging.Formatter()
+
+
+def current_request_id():
+    """Id of the request being handled, or None outside a request"""
+    return _request_id.get()
+
+
+def _sampled(request_id, rate: float) -> bool:
+    # Decided by the request id, so a request keeps all of its records or none
+    if request_id is None:
+        return random.random() < rate
+    return zlib.crc32(request_id.encode()) < rate * 0x100000000
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request id and the record's extra= fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id is not None:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SampledQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue, sample_rate: float = DEFAULT_SAMPLE_RATE):
+        """
+        Hands records to the writer thread without formatting them
+
+        Unlike QueueHandler, the message is left for the writer thread to
+        format, so the arguments of a record must not be changed after the
+        logging call. Info and debug records are kept for sample_rate of
+        the requests; warnings and errors always are. When the queue is full
+        the record is dropped and counted instead of blocking the caller.
+
+        Args:
+            log_queue (queue.Queue): Queue read by the writer thread
+            sample_rate (float): Share of requests whose info and debug records are kept
+        """
+        super().__init__(log_queue)
+        self.sample_rate = sample_rate
+        self.dropped = 0
+        self.sampled_out = 0
+
+    def emit(self, record: logging.LogRecord):
+        request_id = _request_id.get()
+        if record.levelno < logging.WARNING and self.sample_rate < 1 and not _sampled(request_id, self.sample_rate):
+            self.sampled_out += 1
+            return
+        record.request_id = request_id
+        if record.exc_info:
+            # Rendered here, so the writer thread doesn't keep the frames alive
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+
+class _Writer(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room rather than fail when the queue is full at shutdown
+        self.queue.put(self._sentinel)
+
+
+class LogPipeline:
+    def __init__(self, level: str = DEFAULT_LEVEL, log_format: str = DEFAULT_FORMAT,
+                 sample_rate: float = DEFAULT_SAMPLE_RATE, queue_size: int = DEFAULT_QUEUE_SIZE, stream=None):
+        """
+        Logging through a bounded queue to a background writer thread
+
+        Request handlers and upstream workers only put records on the queue;
+        the writer thread formats them and writes to the stream, so a slow
+        stderr never holds up a request.
+
+        Args:
+            level (str): Level of the root logger
+            log_format (str): "json" for one JSON object per line, "text" for plain lines
+            sample_rate (float): Share of requests whose info and debug records are kept
+            queue_size (int): Records waiting to be written before new ones are dropped
+            stream: Where records are written (stderr by default)
+        """
+        self.level = level.upper()
+        self.queue = queue.Queue(queue_size)
+        self.handler = SampledQueueHandler(self.queue, sample_rate)
+        output = logging.StreamHandler(stream if stream is not None else sys.stderr)
+        output.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+        self.writer = _Writer(self.queue, output)
+        self._logger = None
+
+    @classmethod
+    def from_env(cls) -> "LogPipeline":
+        """Settings from LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATE and LOG_QUEUE_SIZE"""
+        return cls(
+            level=os.getenv("LOG_LEVEL", DEFAULT_LEVEL),
+            log_format=os.getenv("LOG_FORMAT", DEFAULT_FORMAT).lower(),
+            sample_rate=float(os.getenv("LOG_SAMPLE_RATE", DEFAULT_SAMPLE_RATE)),
+            queue_size=int(os.getenv("LOG_QUEUE_SIZE", DEFAULT_QUEUE_SIZE))
+        )
+
+    def install(self, logger: logging.Logger = None):
+        """
+        Send a logger's records (the root logger's by default) through the pipeline and start the writer
+
+        The writer is stopped at exit, after the records still queued are written.
+        """
+        self._logger = logger if logger is not None else logging.getLogger()
+        self._logger.addHandler(self.handler)
+        self._logger.setLevel(self.level)
+        self.writer.start()
+        atexit.register(self.close)
+
+    def close(self):
+        """Detach from the logger and write out what is still queued"""
+        if self._logger is None:
+            return
+        self._logger.removeHandler(self.handler)
+        self._logger = None
+        self.writer.stop()
+        atexit.unregister(self.close)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "dropped": self.handler.dropped,
+            "sampled_out": self.handler.sampled_out,
+            "sample_rate": self.handler.sample_rate,
+        }
+
+
+class RequestIdMiddleware:
+    def __init__(self, app):
+        """
+        ASGI middleware giving each request an id for its log records
+
+        The id comes from the request's X-Request-ID header when it has a
+        sane one, so records can be matched with a proxy's logs, and is
+        generated otherwise. It is sent back in the X-Request-ID response
+        header.
+
+        Args:
+            app: ASGI application
+        """
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                if _VALID_REQUEST_ID.fullmatch(value):
+                    request_id = value
+                break
+        if request_id is None:
+            request_id = os.urandom(8).hex().encode()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (REQUEST_ID_HEADER, request_id)]}
+            await send(message)
+
+        token = _request_id.set(request_id.decode("latin-1"))
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request_id.reset(token)
@@ -1,11 +1,32 @@
 import os
+import threading
+import time
 from dotenv import load_dotenv
-from pinecone import Pinecone
 import logging
+from prompts import INTENT_CONTEXTS, PromptCompiler, build_system_prompt
+from intents import GENERAL, detect_intent
+from history import as_message, message_tokens
+from tracing import span
 
 # Load environment variables
 load_dotenv()
 
+# One Pinecone client per API key, shared by every assistant so they reuse its
+# keep-alive connection pool
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def shared_client(api_key: str):
+    """Pinecone client for an API key, created once per process"""
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            # The SDK is imported with the first client, not when the module loads
+            from pinecone import Pinecone
+            client = _clients[api_key] = Pinecone(api_key=api_key)
+        return client
+
 class PineconeAssistant:
     def __init__(self, assistant_name: str = "manulassistan"):
         """
@@ -20,111 +41,34 @@ class PineconeAssistant:
         if not self.api_key:
             raise ValueError("PINECONE_API_KEY not found in environment variables")
         
-        # Initialize Pinecone client
-        self.pc = Pinecone(api_key=self.api_key)
+        # Initialize Pinecone client (shared between assistants)
+        self.pc = shared_client(self.api_key)
         
         # Initialize assistant
         self.assistant_name = assistant_name
         self.assistant = self.pc.assistant.Assistant(assistant_name=assistant_name)
         
-        # Set up logging
-        logging.basicConfig(level=logging.INFO)
+        # Handlers and levels are set up by the application (see log_pipeline.py)
         self.logger = logging.getLogger(__name__)
         
-        # Enhanced prompt system
+        # Enhanced prompt system, with per-intent templates compiled once
         self.system_prompt = self._create_system_prompt()
+        self.prompts = PromptCompiler(prune=os.getenv("PROMPT_PRUNING", "true").lower() != "false")
         
-        self.logger.info(f"Pinecone Assistant '{assistant_name}' initialized successfully")
-
-    def _create_system_prompt(self):
-        """Create comprehensive system prompt for TATA Nexon expertise"""
-        return """You are TATA Nexon Expert Assistant, a specialized AI assistant with comprehensive knowledge about the TATA Nexon compact SUV. Your role is to provide detailed, accurate, and helpful information about all aspects of the TATA Nexon vehicle.
-
-## Your Expertise Areas:
-
-### 1. SAFETY FEATURES & SYSTEMS
-- 5-Star Global NCAP safety rating details
-- Advanced safety technologies (ESC, ABS, EBD, Hill Hold, etc.)
-- Airbag systems and passive safety features
-- Child safety systems (ISOFIX, child locks)
-- Structural safety and build quality
-- Safety certifications and awards
-
-### 2. ENGINE & PERFORMANCE
-- Petrol Engine: 1.2L Turbo Revotron (120 PS, 170 Nm)
-- Diesel Engine: 1.5L Revotorq (110 PS, 260 Nm)
-- Transmission options (Manual, AMT)
-- Performance metrics, acceleration, top speed
-- Fuel efficiency ratings (ARAI certified)
-- Engine technologies and innovations
-
-### 3. MAINTENANCE & SERVICE
-- Detailed service schedules and intervals
-- Preventive maintenance guidelines
-- Cost-effective maintenance tips
-- Seasonal maintenance requirements
-- Troubleshooting common issues
-- Warranty information and coverage
-
-### 4. FEATURES & TECHNOLOGY
-- Infotainment system with 7-inch touchscreen
-- ConnectNext by TATA Motors features
-- Smartphone connectivity (Android Auto, Apple CarPlay)
-- Audio system and entertainment options
-- Climate control systems
-- Interior and exterior features
-
-### 5. VARIANTS & SPECIFICATIONS
-- Different variant comparisons (XE, XM, XT, XZ, XZ+)
-- Feature differences across variants
-- Pricing and value propositions
-- Color options and customization
-- Accessory options
-
-### 6. DRIVING EXPERIENCE
-- Handling characteristics and driving dynamics
-- Comfort features for city and highway driving
-- Ground clearance and off-road capabilities
-- Interior space and ergonomics
-- Boot space and practicality
-
-## Response Guidelines:
-
-### Structure Your Responses:
-1. **Quick Summary**: Provide immediate answer in 2-3 lines
-2. **Detailed Explanation**: Comprehensive information with bullet points
-3. **Practical Tips**: Real-world advice and recommendations
-4. **Additional Context**: Related information that might be helpful
+        self.logger.info("Pinecone Assistant '%s' initialized successfully", assistant_name)
 
-### Language Style:
-- Use clear, non-technical language for general users
-- Provide technical details when specifically requested
-- Use bullet points for better readability
-- Include specific numbers, measurements, and certifications
-- Be conversational yet professional
+    def warm_up(self):
+        """Make one cheap request so the connection is open before the first user question"""
+        self.ping()
+        self.logger.info("Assistant '%s' warmed up", self.assistant_name)
 
-### When Users Ask About:
+    def ping(self):
+        """Cheap request to the Pinecone API, used as a health probe"""
+        self.pc.assistant.describe_assistant(assistant_name=self.assistant_name)
 
-**Safety**: Always mention the 5-Star NCAP rating first, then detail specific safety systems
-**Maintenance**: Provide both scheduled maintenance and preventive care tips
-**Performance**: Include both technical specifications and real-world driving experience
-**Features**: Explain both what the feature does and how it benefits the user
-**Problems**: Offer troubleshooting steps and when to consult service center
-**Comparisons**: Provide balanced comparison with key differentiators
-
-### Multilingual Support:
-- Respond primarily in English unless user specifically requests another language
-- Use simple, clear language that's easy to understand
-- Explain technical terms when first mentioned
-
-### Always Remember:
-- You represent TATA Motors' commitment to customer service
-- Prioritize customer safety and satisfaction
-- Encourage users to consult authorized service centers for complex issues
-- Provide accurate, up-to-date information based on official TATA documentation
-- Be helpful, friendly, and solution-oriented
-
-If you don't have specific information about a query, acknowledge it honestly and suggest contacting TATA Motors customer service or authorized dealers for the most current information."""
+    def _create_system_prompt(self):
+        """Create comprehensive system prompt for TATA Nexon expertise"""
+        return build_system_prompt()
 
     def upload_file(self, file_path: str, timeout: int = None):
         """
@@ -141,18 +85,38 @@ If you don't have specific information about a query, acknowledge it honestly an
             if not os.path.exists(file_path):
                 raise FileNotFoundError(f"File not found: {file_path}")
             
-            self.logger.info(f"Uploading file: {file_path}")
+            size = os.path.getsize(file_path)
+            self.logger.info("Uploading file: %s", file_path, extra={"file_bytes": size})
             
+            start = time.perf_counter()
             response = self.assistant.upload_file(
                 file_path=file_path,
                 timeout=timeout
             )
             
-            self.logger.info("File uploaded successfully")
+            self.logger.info("File uploaded successfully", extra={
+                "file_bytes": size, "latency_ms": round((time.perf_counter() - start) * 1000, 1)
+            })
             return response
             
         except Exception as e:
-            self.logger.error(f"Error uploading file: {str(e)}")
+            self.logger.error("Error uploading file: %s", e)
+            raise
+
+    def delete_file(self, file_id: str):
+        """
+        Delete a file from the assistant
+        
+        Args:
+            file_id (str): Id of the uploaded file
+        """
+        try:
+            self.logger.info("Deleting file: %s", file_id)
+            self.assistant.delete_file(file_id=file_id)
+            self.logger.info("File deleted successfully")
+            
+        except Exception as e:
+            self.logger.error("Error deleting file: %s", e)
             raise
 
     def chat(self, message: str, stream: bool = False):
@@ -168,22 +132,58 @@ If you don't have specific information about a query, acknowledge it honestly an
         """
         try:
             # Enhanced message with context and prompting
-            enhanced_message = self._enhance_user_message(message)
-            msg = {"role": "user", "content": enhanced_message}
+            with span("prompt"):
+                prompt = self.render_prompt(message)
+            msg = {"role": "user", "content": prompt.text}
+            fields = {"intent": prompt.intent, "prompt_chars": prompt.chars, "prompt_tokens": prompt.tokens,
+                      "stream": stream}
+            self.logger.debug("Sending message: %.50s...", message)
             
             if stream:
-                self.logger.info(f"Sending streaming message: {message[:50]}...")
-                chunks = self.assistant.chat(messages=[msg], stream=True)
+                self.logger.info("Streaming '%s' query: %d chars, ~%d tokens", prompt.intent, prompt.chars,
+                                 prompt.tokens, extra=fields)
+                with span("assistant_call"):
+                    chunks = self.assistant.chat(messages=[msg], stream=True)
                 return chunks
             else:
-                self.logger.info(f"Sending message: {message[:50]}...")
-                resp = self.assistant.chat(messages=[msg])
+                start = time.perf_counter()
+                with span("assistant_call"):
+                    resp = self.assistant.chat(messages=[msg])
+                fields["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                self.logger.info("Answered '%s' query: %d chars, ~%d tokens in %.1fms", prompt.intent, prompt.chars,
+                                 prompt.tokens, fields["latency_ms"], extra=fields)
                 return resp
                 
         except Exception as e:
-            self.logger.error(f"Error in chat: {str(e)}")
+            self.logger.error("Error in chat: %s", e)
             raise
 
+    def detect_intent(self, user_message: str):
+        """
+        Detect the query type that selects the extra prompting context
+        
+        Args:
+            user_message (str): Original user message
+            
+        Returns:
+            str: Query type, one of the INTENT_CONTEXTS keys
+        """
+        intent = detect_intent(user_message)
+        # Labels without their own prompting (e.g. greetings) get the general context
+        return intent if intent in INTENT_CONTEXTS else GENERAL
+
+    def render_prompt(self, user_message: str):
+        """
+        Render the enhanced prompt for a user message from the precompiled templates
+        
+        Args:
+            user_message (str): Original user message
+            
+        Returns:
+            RenderedPrompt: Prompt text, detected intent and input size
+        """
+        return self.prompts.render(user_message, self.detect_intent(user_message))
+
     def _enhance_user_message(self, user_message: str):
         """
         Enhance user message with context and prompting for better responses
@@ -194,85 +194,15 @@ If you don't have specific information about a query, acknowledge it honestly an
         Returns:
             str: Enhanced message with context
         """
-        # Analyze message type for better prompting
-        message_lower = user_message.lower()
-        
-        # System context
-        context = f"{self.system_prompt}\n\n"
-        
-        # Add specific context based on query type
-        if any(word in message_lower for word in ["safety", "secure", "protection", "airbag"]):
-            context += """
-**CONTEXT**: User is asking about safety features. Focus on:
-- 5-Star Global NCAP rating (highlight this first)
-- Specific safety technologies and how they work
-- Real-world safety benefits
-- Comparison with competitors if relevant
-"""
-        
-        elif any(word in message_lower for word in ["maintenance", "service", "schedule"]):
-            context += """
-**CONTEXT**: User is asking about maintenance. Provide:
-- Specific service intervals with km/time periods
-- Detailed maintenance checklist
-- Cost-saving tips and preventive care
-- Seasonal maintenance advice
-"""
-        
-        elif any(word in message_lower for word in ["engine", "performance", "power", "specifications"]):
-            context += """
-**CONTEXT**: User is asking about engine/performance. Include:
-- Detailed technical specifications
-- Real-world performance figures
-- Fuel efficiency data (ARAI certified)
-- Driving experience insights
-"""
-        
-        elif any(word in message_lower for word in ["features", "technology", "infotainment"]):
-            context += """
-**CONTEXT**: User is asking about features/technology. Cover:
-- Detailed feature explanations
-- How to use specific features
-- Benefits and practical applications
-- Connectivity and smart features
-"""
-        
-        elif any(word in message_lower for word in ["problem", "issue", "trouble", "fix"]):
-            context += """
-**CONTEXT**: User has a problem/issue. Provide:
-- Step-by-step troubleshooting guide
-- When to consult service center
-- Preventive measures
-- Safety considerations
-"""
-        
-        elif any(word in message_lower for word in ["compare", "vs", "difference", "better"]):
-            context += """
-**CONTEXT**: User wants comparison. Provide:
-- Balanced comparison with key differentiators
-- Strengths and unique selling points
-- Value proposition analysis
-- Recommendation based on use case
-"""
-        
-        else:
-            context += """
-**CONTEXT**: General query about TATA Nexon. Provide comprehensive information with:
-- Quick summary (2-3 lines)
-- Detailed explanation with bullet points
-- Practical tips and advice
-- Additional helpful context
-"""
-        
-        # Final enhanced message
-        enhanced_message = f"{context}\n\n**USER QUESTION**: {user_message}\n\nPlease provide a detailed, structured response following the guidelines above."
-        
-        return enhanced_message
+        return self.render_prompt(user_message).text
 
     def chat_with_history(self, messages: list, stream: bool = False):
         """
         Chat with the assistant using message history
         
+        The messages are sent as given; the caller fits long conversations
+        into the history budget first (see HistoryCompactor).
+        
         Args:
             messages (list): List of Message objects or strings
             stream (bool): Whether to stream the response
@@ -281,25 +211,28 @@ If you don't have specific information about a query, acknowledge it honestly an
             dict or generator: Response from the assistant
         """
         try:
-            # Convert strings to Message objects if needed
-            message_objects = []
-            for msg in messages:
-                if isinstance(msg, str):
-                    message_objects.append({"role": "user", "content": msg})
-                else:
-                    message_objects.append(msg)
+            # Convert strings to Message objects
+            message_objects = [as_message(message) for message in messages]
+            prompt_tokens = sum(message_tokens(message["content"]) for message in message_objects)
+            fields = {"messages_sent": len(message_objects), "prompt_tokens": prompt_tokens, "stream": stream}
             
             if stream:
-                self.logger.info(f"Sending {len(message_objects)} messages (streaming)")
-                chunks = self.assistant.chat(messages=message_objects, stream=True)
+                self.logger.info("Streaming %d messages, ~%d tokens", len(message_objects), prompt_tokens,
+                                 extra=fields)
+                with span("assistant_call"):
+                    chunks = self.assistant.chat(messages=message_objects, stream=True)
                 return chunks
             else:
-                self.logger.info(f"Sending {len(message_objects)} messages")
-                resp = self.assistant.chat(messages=message_objects)
+                start = time.perf_counter()
+                with span("assistant_call"):
+                    resp = self.assistant.chat(messages=message_objects)
+                fields["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                self.logger.info("Answered %d messages, ~%d tokens in %.1fms", len(message_objects), prompt_tokens,
+                                 fields["latency_ms"], extra=fields)
                 return resp
                 
         except Exception as e:
-            self.logger.error(f"Error in chat with history: {str(e)}")
+            self.logger.error("Error in chat with history: %s", e)
             raise
 
     def get_response_content(self, response):
@@ -319,7 +252,7 @@ If you don't have specific information about a query, acknowledge it honestly an
                 return response.message.content
             return str(response)
         except Exception as e:
-            self.logger.error(f"Error extracting response content: {str(e)}")
+            self.logger.error("Error extracting response content: %s", e)
             return "Error extracting response content"
 
     def print_streaming_response(self, chunks):
@@ -338,7 +271,7 @@ If you don't have specific information about a query, acknowledge it honestly an
                         print(content, end="", flush=True)
             print()  # New line at the end
         except Exception as e:
-            self.logger.error(f"Error printing streaming response: {str(e)}")
+            self.logger.error("Error printing streaming response: %s", e)
 
 
 def main():
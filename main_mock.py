@@ -1,22 +1,104 @@
 import os
+import random
+import re
+import threading
+import time
+import uuid
 from dotenv import load_dotenv
 import logging
-import json
+from typing import NamedTuple
+from chunks import ContentChunk, MessageEndChunk, MessageStartChunk
+from history import as_message
+from intents import detect_intent
+from prompts import estimate_tokens
+from tracing import span
 
 # Load environment variables
 load_dotenv()
 
+# Simulated upstream latency; everything defaults to an instant, error-free answer
+DEFAULT_TTFT_MS = 0.0
+DEFAULT_TTFT_SIGMA = 0.0
+DEFAULT_TOKENS_PER_S = 0.0
+DEFAULT_TOKENS_SIGMA = 0.0
+DEFAULT_ERROR_RATE = 0.0
+DEFAULT_STREAM_ERROR_RATE = 0.0
+DEFAULT_TIMEOUT_RATE = 0.0
+DEFAULT_TIMEOUT_SECONDS = 30.0
+
+MODEL_NAME = "mock"
+
+# Splits an answer into word-sized tokens, each with its leading whitespace
+_TOKENS = re.compile(r"\s*\S+")
+
+
+class UpstreamError(Exception):
+    """Simulated failure of the upstream API"""
+
+
+class LatencyProfile(NamedTuple):
+    """
+    How the simulated upstream behaves
+
+    Time to first token and tokens per second are drawn per request from
+    log-normal distributions: the configured value is the median and sigma
+    the spread (0 for a fixed value). tokens_per_s of 0 streams without delay.
+    """
+    ttft_ms: float = DEFAULT_TTFT_MS
+    ttft_sigma: float = DEFAULT_TTFT_SIGMA
+    tokens_per_s: float = DEFAULT_TOKENS_PER_S
+    tokens_sigma: float = DEFAULT_TOKENS_SIGMA
+    error_rate: float = DEFAULT_ERROR_RATE
+    stream_error_rate: float = DEFAULT_STREAM_ERROR_RATE
+    timeout_rate: float = DEFAULT_TIMEOUT_RATE
+    timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS
+    seed: int = None
+
+    @classmethod
+    def from_env(cls) -> "LatencyProfile":
+        """Profile from the MOCK_* environment variables"""
+        seed = os.getenv("MOCK_SEED")
+        return cls(
+            ttft_ms=float(os.getenv("MOCK_TTFT_MS", DEFAULT_TTFT_MS)),
+            ttft_sigma=float(os.getenv("MOCK_TTFT_SIGMA", DEFAULT_TTFT_SIGMA)),
+            tokens_per_s=float(os.getenv("MOCK_TOKENS_PER_S", DEFAULT_TOKENS_PER_S)),
+            tokens_sigma=float(os.getenv("MOCK_TOKENS_SIGMA", DEFAULT_TOKENS_SIGMA)),
+            error_rate=float(os.getenv("MOCK_ERROR_RATE", DEFAULT_ERROR_RATE)),
+            stream_error_rate=float(os.getenv("MOCK_STREAM_ERROR_RATE", DEFAULT_STREAM_ERROR_RATE)),
+            timeout_rate=float(os.getenv("MOCK_TIMEOUT_RATE", DEFAULT_TIMEOUT_RATE)),
+            timeout_seconds=float(os.getenv("MOCK_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS)),
+            seed=int(seed) if seed else None
+        )
+
+
+class _Plan(NamedTuple):
+    """Outcome of one simulated request, drawn up front"""
+    ttft: float
+    token_interval: float
+    failure: str
+    abort_after: int
+
+
 class PineconeAssistant:
-    def __init__(self, assistant_name: str = "manulassistan"):
+    def __init__(self, assistant_name: str = "manulassistan", profile: LatencyProfile = None):
         """
-        Initialize TATA Nexon Assistant with mock responses for deployment testing
+        Simulated TATA Nexon Assistant with the interface of main.PineconeAssistant
+
+        Answers come from canned responses, delivered with the latency,
+        throughput and failures described by the profile, so the web tier can
+        be load-tested offline. With a seed, the sequence of latencies and
+        failures is reproducible.
         
         Args:
             assistant_name (str): Name of the assistant
+            profile (LatencyProfile): Simulated upstream behaviour (MOCK_* environment variables by default)
         """
         self.assistant_name = assistant_name
+        self.profile = profile if profile is not None else LatencyProfile.from_env()
+        self._rng = random.Random(self.profile.seed)
+        self._rng_lock = threading.Lock()
         self.logger = logging.getLogger(__name__)
-        self.logger.info(f"Mock TATA Nexon Assistant '{assistant_name}' initialized")
+        self.logger.info("Mock TATA Nexon Assistant '%s' initialized", assistant_name)
         
         # Mock responses for testing
         self.mock_responses = [
@@ -37,68 +119,187 @@ class PineconeAssistant:
             "description": "Mock TATA Nexon Expert Assistant for deployment testing"
         }
     
-    def send_message(self, message: str, stream: bool = False):
+    def warm_up(self):
+        """Nothing to connect to in the mock"""
+        self.logger.info("Mock assistant '%s' warmed up", self.assistant_name)
+    
+    def ping(self):
+        """Health probe; waits the median time to first token, without the profile's failures"""
+        if self.profile.ttft_ms:
+            time.sleep(self.profile.ttft_ms / 1000)
+    
+    def upload_file(self, file_path: str, timeout: int = None):
         """
-        Send a message to the mock assistant
+        Pretend to upload a file to the mock assistant
         
         Args:
-            message (str): The user's message
-            stream (bool): Whether to stream the response
+            file_path (str): Path to the file to upload
+            timeout (int): Unused, kept for interface compatibility
             
         Returns:
-            Generator or dict: Streaming response or direct response
+            dict: Mock upload response
         """
-        try:
-            # Enhanced message processing
-            enhanced_message = self._enhance_user_message(message)
-            
-            if stream:
-                self.logger.info(f"Sending streaming message: {message[:50]}...")
-                return self._mock_stream_response(enhanced_message)
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        
+        self.logger.info("Mock upload of file: %s", file_path, extra={"file_bytes": os.path.getsize(file_path)})
+        return {"id": os.path.basename(file_path), "name": os.path.basename(file_path), "status": "Available"}
+    
+    def delete_file(self, file_id: str):
+        """Pretend to delete a file from the mock assistant"""
+        self.logger.info("Mock delete of file: %s", file_id)
+    
+    def _plan(self) -> _Plan:
+        profile = self.profile
+        with self._rng_lock:
+            rng = self._rng
+            ttft = profile.ttft_ms / 1000
+            if ttft and profile.ttft_sigma:
+                ttft *= rng.lognormvariate(0, profile.ttft_sigma)
+            token_interval = 0.0
+            if profile.tokens_per_s:
+                rate = profile.tokens_per_s
+                if profile.tokens_sigma:
+                    rate *= rng.lognormvariate(0, profile.tokens_sigma)
+                token_interval = 1 / rate
+            draw = rng.random()
+            if draw < profile.timeout_rate:
+                failure = "timeout"
+            elif draw < profile.timeout_rate + profile.error_rate:
+                failure = "error"
+            elif rng.random() < profile.stream_error_rate:
+                failure = "abort"
             else:
-                self.logger.info(f"Sending message: {message[:50]}...")
-                response = self._get_mock_response(enhanced_message)
-                return {"content": response}
-                
-        except Exception as e:
-            self.logger.error(f"Error in send_message: {e}")
-            return {"error": str(e)}
+                failure = None
+            abort_after = rng.randrange(1, 16)
+        return _Plan(ttft, token_interval, failure, abort_after)
+    
+    def _wait_first_token(self, plan: _Plan):
+        if plan.failure == "timeout":
+            time.sleep(self.profile.timeout_seconds)
+            raise TimeoutError(f"Simulated upstream timeout after {self.profile.timeout_seconds}s")
+        if plan.ttft:
+            time.sleep(plan.ttft)
+        if plan.failure == "error":
+            raise UpstreamError("Simulated upstream error")
+    
+    def _respond(self, question: str, stream: bool):
+        plan = self._plan()
+        content = self._get_mock_response(question)
+        usage = {
+            "prompt_tokens": estimate_tokens(self._enhance_user_message(question)),
+            "completion_tokens": estimate_tokens(content)
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        if stream:
+            return self._mock_stream_response(plan, content, usage)
+        
+        tokens = _TOKENS.findall(content)
+        with span("assistant_call"):
+            self._wait_first_token(plan)
+            if plan.token_interval:
+                time.sleep(plan.token_interval * (len(tokens) - 1))
+        if plan.failure == "abort" and plan.abort_after < len(tokens):
+            raise UpstreamError("Simulated upstream error during the response")
+        return {
+            "id": uuid.uuid4().hex,
+            "model": MODEL_NAME,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+            "usage": usage,
+            "citations": []
+        }
     
-    def _mock_stream_response(self, message: str):
-        """Generate mock streaming response"""
-        response_text = self._get_mock_response(message)
+    def _mock_stream_response(self, plan: _Plan, content: str, usage: dict):
+        """Stream the answer token by token, paced by the plan"""
+        message_id = uuid.uuid4().hex
+        yield MessageStartChunk(message_id, MODEL_NAME)
+        self._wait_first_token(plan)
         
-        # Simulate streaming by yielding chunks
-        words = response_text.split()
-        for i, word in enumerate(words):
-            if i == 0:
-                chunk_content = word
-            else:
-                chunk_content = " " + word
+        # Pace against the stream's start so sleep overshoot doesn't add up
+        start = time.perf_counter()
+        for i, token in enumerate(_TOKENS.findall(content)):
+            if plan.failure == "abort" and i == plan.abort_after:
+                raise UpstreamError("Simulated upstream error during the response")
+            if plan.token_interval and i:
+                delay = start + i * plan.token_interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            yield ContentChunk(message_id, MODEL_NAME, token)
+        yield MessageEndChunk(message_id, MODEL_NAME, usage=usage)
+    
+    def chat(self, message: str, stream: bool = False):
+        """
+        Chat with the mock assistant
+        
+        Args:
+            message (str): Message to send to the assistant
+            stream (bool): Whether to stream the response
             
-            # Mock the Pinecone streaming format
-            mock_chunk = type('MockChunk', (), {
-                'delta': type('MockDelta', (), {'content': chunk_content})()
-            })()
+        Returns:
+            dict or generator: Response from the assistant
+        """
+        intent = self.detect_intent(message)
+        prompt_tokens = estimate_tokens(message)
+        self.logger.debug("Sending message: %.50s...", message)
+        self.logger.info("%s '%s' query: %d chars, ~%d tokens", "Streaming" if stream else "Sending", intent,
+                         len(message), prompt_tokens,
+                         extra={"intent": intent, "prompt_chars": len(message), "prompt_tokens": prompt_tokens,
+                                "stream": stream})
+        return self._respond(message, stream)
+    
+    def chat_with_history(self, messages: list, stream: bool = False):
+        """
+        Chat with the mock assistant using message history; the answer follows the last user message
+        
+        Args:
+            messages (list): List of Message objects or strings
+            stream (bool): Whether to stream the response
             
-            yield mock_chunk
+        Returns:
+            dict or generator: Response from the assistant
+        """
+        question = "Hello"
+        for message in reversed(messages):
+            message = as_message(message)
+            if message.get("role", "user") == "user":
+                question = message.get("content", question)
+                break
+        self.logger.info("Sending %d messages%s", len(messages), " (streaming)" if stream else "",
+                         extra={"messages_sent": len(messages), "stream": stream})
+        return self._respond(question, stream)
+    
+    def get_response_content(self, response):
+        """
+        Extract content from response
         
-        # End streaming
-        yield type('MockChunk', (), {
-            'delta': type('MockDelta', (), {'content': '[DONE]'})()
-        })()
+        Args:
+            response: Response from chat operation
+            
+        Returns:
+            str: Content of the response
+        """
+        if isinstance(response, dict) and "message" in response:
+            return response["message"]["content"]
+        elif hasattr(response, 'message') and hasattr(response.message, 'content'):
+            return response.message.content
+        return str(response)
+    
+    def detect_intent(self, user_message: str) -> str:
+        """Detect the query type that selects a mock response"""
+        return detect_intent(user_message)
     
     def _get_mock_response(self, message: str) -> str:
         """Get appropriate mock response based on message content"""
-        message_lower = message.lower()
+        intent = self.detect_intent(message)
         
-        if any(word in message_lower for word in ['safety', 'airbag', 'ncap', 'protection']):
+        if intent == "safety":
             return self.mock_responses[1]
-        elif any(word in message_lower for word in ['engine', 'petrol', 'diesel', 'performance', 'power']):
+        elif intent == "engine":
             return self.mock_responses[2]
-        elif any(word in message_lower for word in ['maintenance', 'service', 'schedule', 'oil']):
+        elif intent == "maintenance":
             return self.mock_responses[3]
-        elif any(word in message_lower for word in ['hello', 'hi', 'help', 'start']):
+        elif intent == "greeting":
             return self.mock_responses[0]
         else:
             return f"Thank you for your question about '{message[:50]}...'. As your TATA Nexon expert, I'd be happy to help! This is a mock response for deployment testing. The full AI assistant will provide comprehensive, detailed answers about all aspects of your TATA Nexon SUV including specifications, features, maintenance, troubleshooting, and more."
@@ -106,31 +307,8 @@ class PineconeAssistant:
     def _enhance_user_message(self, user_message: str) -> str:
         """Enhance user message with context (mock version)"""
         return f"TATA Nexon Query: {user_message}"
-    
-    def send_message_with_history(self, messages, stream: bool = False):
-        """
-        Send messages with conversation history (mock version)
-        
-        Args:
-            messages: List of message strings or objects
-            stream (bool): Whether to stream the response
-            
-        Returns:
-            Generator or dict: Streaming response or direct response
-        """
-        try:
-            # Use the last message for response
-            last_message = messages[-1] if messages else "Hello"
-            if isinstance(last_message, dict):
-                last_message = last_message.get('content', 'Hello')
-            
-            return self.send_message(last_message, stream)
-            
-        except Exception as e:
-            self.logger.error(f"Error in send_message_with_history: {e}")
-            return {"error": str(e)}
 
 # For backward compatibility
 def create_assistant(assistant_name: str = "manulassistan"):
     """Create and return a PineconeAssistant instance"""
-    return PineconeAssistant(assistant_name)
\ No newline at end of file
+    return PineconeAssistant(assistant_name)
@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+MANIFEST_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+class UploadManifest:
+    def __init__(self, path: str):
+        """
+        Local manifest mapping uploaded content to the assistant's remote files
+
+        Files are tracked by the SHA-256 of their content. Several local file
+        names can point at the same content, which is uploaded to the assistant
+        once; the remote file is only deleted when the last name goes away.
+
+        Args:
+            path (str): JSON file the manifest is persisted to
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._content = {}
+        self._files = {}
+        self._refs = Counter()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            content, files = data.get("content", {}), data.get("files", {})
+            if not isinstance(content, dict) or not isinstance(files, dict):
+                raise ValueError("unexpected layout")
+        except (ValueError, OSError, AttributeError) as e:
+            # A broken manifest must not keep the app from starting; it is kept for inspection
+            aside = f"{self.path}.corrupt-{int(time.time())}"
+            logger.warning("Upload manifest %s is unreadable (%s); moved to %s, starting empty", self.path, e, aside)
+            try:
+                os.replace(self.path, aside)
+            except OSError as move_error:
+                logger.warning("Could not move the upload manifest aside: %s", move_error)
+            return
+        self._content = content
+        self._files = files
+        self._refs = Counter(self._files.values())
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "content": self._content, "files": self._files}, f)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, digest: str):
+        """Entry ({"remote_id", "size"}) for content already uploaded, or None"""
+        return self._content.get(digest)
+
+    def digest_of(self, filename: str):
+        """Content digest a local file name points at, or None"""
+        return self._files.get(filename)
+
+    def references(self, digest: str) -> int:
+        """Number of local file names pointing at the content"""
+        return self._refs[digest]
+
+    def set_uploaded(self, digest: str, remote_id, size: int):
+        """Record that content has been uploaded to the assistant"""
+        with self._lock:
+            self._content[digest] = {"remote_id": remote_id, "size": size}
+            self._save()
+
+    def link(self, filename: str, digest: str):
+        """
+        Point a local file name at uploaded content
+
+        Args:
+            filename (str): Local file name
+            digest (str): Content digest
+
+        Returns:
+            dict or None: Entry of content that lost its last reference
+                because the name previously pointed elsewhere
+        """
+        with self._lock:
+            previous = self._files.get(filename)
+            if previous == digest:
+                return None
+            self._files[filename] = digest
+            self._refs[digest] += 1
+            orphan = self._release(previous) if previous else None
+            self._save()
+            return orphan
+
+    def unlink(self, filename: str):
+        """
+        Forget a local file name
+
+        Returns:
+            tuple: (whether the name was tracked, entry of content that
+                lost its last reference or None)
+        """
+        with self._lock:
+            digest = self._files.pop(filename, None)
+            if digest is None:
+                return False, None
+            orphan = self._release(digest)
+            self._save()
+            return True, orphan
+
+    def _release(self, digest: str):
+        self._refs[digest] -= 1
+        if self._refs[digest] > 0:
+            return None
+        del self._refs[digest]
+        return self._content.pop(digest, None)
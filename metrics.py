@@ -0,0 +1,288 @@
+import bisect
+import math
+import threading
+import time
+
+# Default histogram buckets for latencies, in seconds
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        """
+        Base class for metrics with optional labels
+
+        Children (one per combination of label values) are created on first
+        use under a lock; recording on an existing child takes no lock, it is
+        plain arithmetic on a slotted object. The app records from the event
+        loop thread, so updates can't interleave; from several threads at once
+        a rare increment could be lost, which metrics can tolerate.
+
+        Args:
+            name (str): Metric name; counters get a "_total" suffix if it's missing
+            documentation (str): Help text
+            labelnames (tuple): Label names, values are given to labels()
+        """
+        if self.type == "counter" and not name.endswith("_total"):
+            name += "_total"
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values):
+        """Child metric for the given label values"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        """(name suffix, label text, value) for every sample of the metric"""
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield "", _label_text(self.labelnames, values), child.value
+
+
+class Gauge(Counter):
+    """Value that can go up and down, e.g. requests in flight"""
+    type = "gauge"
+
+    def dec(self, amount: float = 1):
+        self._default.dec(amount)
+
+    def set(self, value: float):
+        self._default.set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 buckets: tuple = DEFAULT_LATENCY_BUCKETS):
+        """
+        Args:
+            name (str): Metric name
+            documentation (str): Help text
+            labelnames (tuple): Label names
+            buckets (tuple): Ascending upper bounds; +Inf is added implicitly
+        """
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self, *values):
+        """Context manager observing the duration of its block"""
+        return _Timer(self.labels(*values))
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), list(child.counts)):
+                cumulative += count
+                yield "_bucket", _label_text(self.labelnames, values, f'le="{_format_value(bound)}"'), cumulative
+            yield "_count", _label_text(self.labelnames, values), cumulative
+            yield "_sum", _label_text(self.labelnames, values), child.sum
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child: _HistogramValue):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class CollectedMetric(_Metric):
+    """Metric read from a callback when scraped, e.g. counters another object keeps anyway"""
+
+    def __init__(self, name: str, documentation: str, metric_type: str, function, labelnames: tuple = ()):
+        """
+        Args:
+            name (str): Metric name
+            documentation (str): Help text
+            metric_type (str): "counter" or "gauge"
+            function: Called on every scrape; returns the value, or a dict of
+                label values tuple -> value when there are labels
+            labelnames (tuple): Label names
+        """
+        self.type = metric_type
+        self.function = function
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return None
+
+    def samples(self):
+        values = self.function()
+        if not self.labelnames:
+            values = {(): values}
+        for label_values, value in values.items():
+            yield "", _label_text(self.labelnames, label_values), value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """Metrics of the process, rendered in the Prometheus text format by render()"""
+        self._metrics = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def collect(self, name: str, documentation: str, metric_type: str, function,
+                labelnames: tuple = ()) -> CollectedMetric:
+        return self._register(CollectedMetric(name, documentation, metric_type, function, labelnames))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    def __init__(self, app, duration: Histogram, in_flight: Gauge):
+        """
+        ASGI middleware timing every HTTP request
+
+        Requests are labelled with the route template (e.g. /upload/{job_id}),
+        not the raw path, so ids don't create new series; paths that match no
+        route are counted as "unmatched". The time covers the whole response,
+        including the body of streamed responses.
+
+        Args:
+            app: ASGI application
+            duration (Histogram): Labelled with method, route and status
+            in_flight (Gauge): Requests currently being handled
+        """
+        self.app = app
+        self.duration = duration
+        self.in_flight = in_flight
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.in_flight.dec()
+            route = scope.get("route")
+            self.duration.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - start)
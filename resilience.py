@@ -0,0 +1,487 @@
+import asyncio
+import collections
+import logging
+import random
+import time
+
+# Default time budget of one upstream call, retries and hedges included
+DEFAULT_TIMEOUT_SECONDS = 30.0
+
+# Default limit of a single attempt (None: the rest of the call's budget)
+DEFAULT_ATTEMPT_TIMEOUT_SECONDS = None
+
+# Default longest pause between two items of a stream once its content has started
+DEFAULT_STREAM_IDLE_SECONDS = 30.0
+
+# Stream items sent before the model's first token (e.g. Pinecone's message_start);
+# the deadline and retries of a stream run until the first item of another type
+_PREAMBLE_TYPES = frozenset({"message_start"})
+
+# Default retries of a failed idempotent call, and the backoff before the first and longest one
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.2
+DEFAULT_BACKOFF_MAX = 2.0
+
+# Hedging: percentile of recent latencies after which a second attempt is sent, the
+# latencies needed before hedging starts, and the largest share of calls that may be hedged
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_HEDGE_MIN_SAMPLES = 20
+DEFAULT_HEDGE_MAX_RATIO = 0.1
+
+# Latencies kept for the hedging percentile
+DEFAULT_LATENCY_WINDOW = 200
+
+# Consecutive failures that open the circuit, and how long it stays open before a trial call
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_SECONDS = 30.0
+
+# Seconds between health probes of the upstream, and how long one may take
+DEFAULT_PROBE_INTERVAL = 15.0
+DEFAULT_PROBE_TIMEOUT = 5.0
+
+# Errors that say the request was wrong rather than the upstream unwell; never retried
+_CALLER_ERRORS = (ValueError, TypeError, LookupError, AttributeError, FileNotFoundError, PermissionError)
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamTimeout(TimeoutError):
+    """Raised when an upstream call didn't finish within its deadline"""
+
+
+class CircuitOpen(Exception):
+    def __init__(self, retry_after: float):
+        """Raised instead of calling an upstream that has been failing"""
+        super().__init__(f"Upstream unavailable after repeated failures, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def retryable(error: BaseException) -> bool:
+    """
+    Whether a failed call may succeed when repeated
+
+    Timeouts, connection errors, 429 and 5xx responses (errors with a
+    ``status`` or ``status_code``) and unknown upstream errors are retried;
+    errors caused by the request itself are not. Only retryable errors
+    count against the circuit breaker.
+    """
+    if isinstance(error, CircuitOpen):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return not isinstance(error, _CALLER_ERRORS)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: float = DEFAULT_RESET_SECONDS, clock=time.monotonic):
+        """
+        Stops calling an upstream after repeated failures
+
+        After failure_threshold consecutive failures the circuit opens and
+        calls fail at once with CircuitOpen. Once reset_timeout has passed it
+        is half-open: one trial call goes through (others still fail fast),
+        and its outcome closes or reopens the circuit. A trial that never
+        reports back (e.g. its request was cancelled) is replaced by another
+        after reset_timeout.
+
+        Used from the event loop thread only, so it takes no lock.
+
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit
+            reset_timeout (float): Seconds the circuit stays open
+            clock: Monotonic time source
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._opened_at = None
+        self._trial_at = None
+
+    @property
+    def state(self) -> str:
+        """Circuit state: closed, open or half_open"""
+        if self._opened_at is None:
+            return "closed"
+        if self.clock() - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def retry_after(self) -> float:
+        """Seconds until a call may go through again"""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - self.clock())
+
+    def before_call(self):
+        """
+        Let a call through or fail fast
+
+        Raises:
+            CircuitOpen: The circuit is open, or half-open with its trial call running
+        """
+        state = self.state
+        if state == "closed":
+            return
+        now = self.clock()
+        if state == "half_open" and (self._trial_at is None or now - self._trial_at >= self.reset_timeout):
+            self._trial_at = now
+            return
+        self.rejected += 1
+        raise CircuitOpen(self.retry_after() or self.reset_timeout)
+
+    def record_success(self):
+        if self._opened_at is not None:
+            logger.info("Upstream circuit closed")
+        self.failures = 0
+        self._opened_at = self._trial_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_at is not None or (self._opened_at is None and self.failures >= self.failure_threshold):
+            if self._opened_at is None:
+                self.opened += 1
+                logger.warning("Upstream circuit opened after %d consecutive failures", self.failures)
+            self._opened_at = self.clock()
+            self._trial_at = None
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "retry_after_seconds": round(self.retry_after(), 1),
+        }
+
+
+class LatencyWindow:
+    def __init__(self, size: int = DEFAULT_LATENCY_WINDOW):
+        """Latencies of the most recent successful calls of one kind"""
+        self._samples = collections.deque(maxlen=size)
+        self._sorted = None
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+        self._sorted = None
+
+    def percentile(self, pct: float) -> float:
+        """Nearest-rank percentile; the sorted copy is reused until the next sample"""
+        if self._sorted is None:
+            self._sorted = sorted(self._samples)
+        ordered = self._sorted
+        if not ordered:
+            return 0.0
+        return ordered[max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))]
+
+
+class ResilientUpstream:
+    def __init__(self, executor, breaker: CircuitBreaker = None, timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                 attempt_timeout: float = DEFAULT_ATTEMPT_TIMEOUT_SECONDS, retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF,
+                 backoff_max: float = DEFAULT_BACKOFF_MAX, hedge: bool = False,
+                 hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE,
+                 hedge_min_samples: int = DEFAULT_HEDGE_MIN_SAMPLES,
+                 hedge_max_ratio: float = DEFAULT_HEDGE_MAX_RATIO,
+                 stream_idle_timeout: float = DEFAULT_STREAM_IDLE_SECONDS):
+        """
+        Deadlines, retries, hedging and a circuit breaker around upstream calls
+
+        Every call gets a deadline budget shared by all its attempts; with
+        attempt_timeout, an attempt that stalls is given up early so a retry
+        fits in the budget. Failed idempotent calls are retried after a
+        jittered exponential backoff ("full jitter") while the budget lasts. With hedging, an idempotent
+        call still running after the hedge_percentile latency of recent calls
+        gets a second attempt; the first to succeed wins. Hedges are capped at
+        hedge_max_ratio of the calls and stop while the circuit isn't closed,
+        so a slow upstream doesn't get twice the load.
+
+        Attempts that lose a hedge or run out of time are abandoned, not
+        stopped: the worker thread finishes the blocking call and its result
+        is dropped.
+
+        Args:
+            executor (UpstreamExecutor): Runs the blocking calls
+            breaker (CircuitBreaker): Shared by all calls (a new one by default)
+            timeout (float): Default deadline per call in seconds
+            attempt_timeout (float): Longest a single attempt may take (None for the whole deadline)
+            retries (int): Retries of a failed idempotent call
+            backoff (float): Largest delay before the first retry; doubles per retry
+            backoff_max (float): Cap of the backoff
+            hedge (bool): Send hedged attempts for idempotent calls
+            hedge_percentile (float): Latency percentile after which to hedge
+            hedge_min_samples (int): Latencies needed before hedging starts
+            hedge_max_ratio (float): Largest share of calls that may be hedged
+            stream_idle_timeout (float): Longest wait between two items of a stream after its first content
+        """
+        self.executor = executor
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.timeout = timeout
+        self.attempt_timeout = attempt_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_max_ratio = hedge_max_ratio
+        self.stream_idle_timeout = stream_idle_timeout
+        self.latencies = collections.defaultdict(LatencyWindow)
+        self.calls = 0
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    def _hedge_delay(self, name: str):
+        """Seconds after which to hedge an attempt of a call, or None if it shouldn't be hedged"""
+        latencies = self.latencies[name]
+        if (not self.hedge or len(latencies) < self.hedge_min_samples
+                or self.hedged >= self.hedge_max_ratio * self.calls or self.breaker.state != "closed"):
+            return None
+        return latencies.percentile(self.hedge_percentile)
+
+    def _record_failure(self, error: BaseException):
+        if retryable(error):
+            self.breaker.record_failure()
+
+    def _retry_delay(self, error: BaseException, attempt: int, deadline: float):
+        """Backoff before the next attempt, or None if the error should be raised"""
+        if attempt > self.retries or not retryable(error):
+            return None
+        delay = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** (attempt - 1)))
+        if asyncio.get_running_loop().time() + delay >= deadline:
+            return None
+        return delay
+
+    async def _attempt(self, name: str, func, args: tuple, kwargs: dict, deadline: float, hedge_after):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        if self.attempt_timeout:
+            deadline = min(deadline, start + self.attempt_timeout)
+        tasks = {asyncio.ensure_future(self.executor.run(func, *args, **kwargs))}
+        hedge = None
+        error = None
+        try:
+            while tasks:
+                now = loop.time()
+                if now >= deadline:
+                    self.timeouts += 1
+                    raise UpstreamTimeout(f"Upstream call {name} took longer than {deadline - start:.1f}s")
+                wait = deadline - now
+                if hedge_after is not None and hedge is None:
+                    wait = min(wait, max(0.0, start + hedge_after - now))
+                done, tasks = await asyncio.wait(tasks, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.hedge_wins += task is hedge
+                        self.latencies[name].add(loop.time() - start)
+                        return task.result()
+                    error = task.exception()
+                if not done and hedge_after is not None and hedge is None and loop.time() < deadline:
+                    self.hedged += 1
+                    hedge = asyncio.ensure_future(self.executor.run(func, *args, **kwargs))
+                    tasks.add(hedge)
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run(self, func, *args, idempotent: bool = True, timeout: float = None, **kwargs):
+        """
+        Call a blocking upstream function within a deadline
+
+        Args:
+            func: Blocking callable, run on the executor
+            *args, **kwargs: Arguments for the callable
+            idempotent (bool): Whether the call may be repeated (retries and hedges)
+            timeout (float): Deadline for this call (the default one if omitted)
+
+        Returns:
+            Whatever the callable returns
+
+        Raises:
+            CircuitOpen: The upstream has been failing; it wasn't called
+            UpstreamTimeout: No attempt finished within the deadline
+        """
+        self.breaker.before_call()
+        self.calls += 1
+        name = getattr(func, "__name__", "call")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = await self._attempt(name, func, args, kwargs, deadline,
+                                             self._hedge_delay(name) if idempotent else None)
+            except Exception as e:
+                self._record_failure(e)
+                delay = self._retry_delay(e, attempt, deadline) if idempotent else None
+                if delay is None:
+                    raise
+                logger.warning("Retrying %s in %.2fs after: %s", name, delay, e, extra={"attempt": attempt + 1})
+                self.retried += 1
+                await asyncio.sleep(delay)
+                self.breaker.before_call()
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def iterate(self, executor, func, *args, timeout: float = None, **kwargs):
+        """
+        Stream from executor.iterate() behind the circuit breaker
+
+        The deadline covers the wait for the first content: items that only
+        open the stream (message_start) are held back with it, and failures
+        before it are retried like run() does, since nothing was passed on
+        yet. Once content flows, a pause longer than stream_idle_timeout or an
+        error ends the stream and counts against the breaker. Streams aren't
+        hedged, and their latency doesn't feed the hedging percentile of
+        whole answers.
+
+        Args:
+            executor (UpstreamExecutor): Executor whose iterate() drains the stream
+            func: Blocking callable returning an iterator
+            *args, **kwargs: Arguments for the callable
+            timeout (float): Deadline for the first content (the default one if omitted)
+
+        Yields:
+            Items of the upstream iterator
+        """
+        self.breaker.before_call()
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        attempt = 0
+        while True:
+            attempt += 1
+            started = loop.time()
+            attempt_deadline = deadline
+            if self.attempt_timeout:
+                attempt_deadline = min(deadline, started + self.attempt_timeout)
+            items = executor.iterate(func, *args, **kwargs)
+            held = []
+            try:
+                while not held or getattr(held[-1], "type", None) in _PREAMBLE_TYPES:
+                    held.append(await asyncio.wait_for(items.__anext__(), max(0.0, attempt_deadline - loop.time())))
+                break
+            except StopAsyncIteration:
+                self.breaker.record_success()
+                for item in held:
+                    yield item
+                return
+            except Exception as e:
+                await items.aclose()
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts += 1
+                    e = UpstreamTimeout(f"No answer from the upstream within {attempt_deadline - started:.1f}s")
+                self._record_failure(e)
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise e
+                logger.warning("Retrying stream in %.2fs after: %s", delay, e, extra={"attempt": attempt + 1})
+                self.retried += 1
+                await asyncio.sleep(delay)
+                self.breaker.before_call()
+
+        try:
+            for item in held:
+                yield item
+            while True:
+                try:
+                    item = await asyncio.wait_for(items.__anext__(), self.stream_idle_timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    raise UpstreamTimeout(f"Upstream stream stalled for {self.stream_idle_timeout:.1f}s")
+                yield item
+        except Exception as e:
+            self._record_failure(e)
+            raise
+        else:
+            self.breaker.record_success()
+        finally:
+            await items.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retried,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "timeouts": self.timeouts,
+            "hedge_after_ms": {
+                name: round(latencies.percentile(self.hedge_percentile) * 1000, 1)
+                for name, latencies in list(self.latencies.items()) if len(latencies) >= self.hedge_min_samples
+            } if self.hedge else None,
+            "circuit": self.breaker.stats(),
+        }
+
+
+class HealthProbe:
+    def __init__(self, check, interval: float = DEFAULT_PROBE_INTERVAL, timeout: float = DEFAULT_PROBE_TIMEOUT):
+        """
+        Checks the upstream in the background so health checks only read the last result
+
+        Args:
+            check: Coroutine function; returning means healthy, raising unhealthy,
+                and returning False that there was nothing to check yet
+            interval (float): Seconds between checks
+            timeout (float): Longest a check may take before it counts as failed
+        """
+        self.check = check
+        self.interval = interval
+        self.timeout = timeout
+        self.ok = None
+        self.error = None
+        self.latency = None
+        self.checked_at = None
+        self._task = None
+
+    async def probe(self):
+        """Run one check and keep its result"""
+        start = time.perf_counter()
+        try:
+            checked = await asyncio.wait_for(self.check(), self.timeout)
+        except asyncio.TimeoutError:
+            self.ok, self.error = False, f"Probe timed out after {self.timeout:.1f}s"
+        except Exception as e:
+            self.ok, self.error = False, str(e)
+        else:
+            if checked is False:
+                return
+            self.ok, self.error = True, None
+        self.latency = time.perf_counter() - start
+        self.checked_at = time.monotonic()
+
+    async def _run(self):
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None or self._task.done() or self._task.get_loop() is not asyncio.get_running_loop():
+            self._task = asyncio.ensure_future(self._run())
+
+    def close(self):
+        task = self._task
+        if task is not None and not task.done() and not task.get_loop().is_closed():
+            task.cancel()
+
+    def status(self) -> dict:
+        return {
+            "ok": self.ok,
+            "error": self.error,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "age_seconds": round(time.monotonic() - self.checked_at, 1) if self.checked_at else None,
+        }
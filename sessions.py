@@ -0,0 +1,196 @@
+import asyncio
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from history import message_tokens
+
+# Default bounds of the session store
+DEFAULT_MEMORY_MB = 64
+DEFAULT_IDLE_SECONDS = 3600.0
+
+# One shared string object per role, so turns don't each carry their own copy
+ROLES = {role: sys.intern(role) for role in ("system", "user", "assistant")}
+
+
+class Turn:
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role: str, content: str):
+        self.role = ROLES[role]
+        self.content = content
+        # Estimated once, reused every time the history is compacted
+        self.tokens = message_tokens(content)
+
+    def to_message(self) -> dict:
+        """Message dict in the format the assistant expects"""
+        return {"role": self.role, "content": self.content}
+
+
+# Memory of a turn besides its text: the slotted object and its list slot
+_TURN_OVERHEAD = sys.getsizeof(Turn("user", "")) + 8
+
+
+def turn_bytes(content: str) -> int:
+    """Approximate memory held by one stored turn"""
+    return _TURN_OVERHEAD + sys.getsizeof(content)
+
+
+class Session:
+    __slots__ = ("id", "turns", "bytes", "created_at", "last_active", "_lock")
+
+    def __init__(self, session_id: str, now: float):
+        self.id = session_id
+        self.turns = []
+        self.bytes = 0
+        self.created_at = now
+        self.last_active = now
+        self._lock = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """Serializes turns of one session; only created once a session is used"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def messages(self) -> list:
+        """Whole conversation as assistant message dicts"""
+        return [turn.to_message() for turn in self.turns]
+
+    def token_counts(self) -> list:
+        """Token estimate of every turn"""
+        return [turn.tokens for turn in self.turns]
+
+    def to_dict(self) -> dict:
+        return {
+            "session_id": self.id,
+            "turns": [turn.to_message() for turn in self.turns],
+            "bytes": self.bytes,
+            "created_at": self.created_at,
+            "last_active": self.last_active,
+        }
+
+
+# Memory of an empty session: the slotted object, its id, its timestamps, its
+# turn list, and its entry in the store's OrderedDict (about 100 bytes)
+SESSION_OVERHEAD = (sys.getsizeof(Session(uuid.uuid4().hex, 0.0)) + sys.getsizeof(uuid.uuid4().hex)
+                    + 2 * sys.getsizeof(0.0) + sys.getsizeof([]) + 100)
+
+
+class SessionStore:
+    def __init__(self, max_bytes: int = DEFAULT_MEMORY_MB * 1024 * 1024, idle_ttl: float = DEFAULT_IDLE_SECONDS,
+                 clock=time.monotonic):
+        """
+        In-process store of conversations with append-only turns
+
+        Sessions idle for longer than idle_ttl are dropped. When all sessions
+        together, empty ones included, exceed max_bytes, the least recently
+        active sessions are evicted until the store fits again.
+
+        Args:
+            max_bytes (int): Memory budget for all stored sessions and turns
+            idle_ttl (float): Seconds a session may stay unused
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self._clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+
+        self.evictions = 0
+        self.expirations = 0
+
+    def create(self) -> Session:
+        """Start a new, empty session, evicting idle sessions if over budget"""
+        with self._lock:
+            session = Session(uuid.uuid4().hex, self._clock())
+            session.bytes = SESSION_OVERHEAD
+            self._sessions[session.id] = session
+            self.bytes += SESSION_OVERHEAD
+            self._evict(keep=session)
+            return session
+
+    def get(self, session_id: str):
+        """
+        Look up a session and mark it active
+
+        Returns:
+            Session or None: The session, or None if unknown, expired or evicted
+        """
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_active = self._clock()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def append(self, session: Session, role: str, content: str):
+        """
+        Add a turn to a session, evicting other idle sessions if over budget
+
+        Returns:
+            Turn: The stored turn
+        """
+        turn = Turn(role, content)
+        size = turn_bytes(content)
+        with self._lock:
+            session.turns.append(turn)
+            session.bytes += size
+            session.last_active = self._clock()
+            if self._sessions.get(session.id) is session:
+                self.bytes += size
+                self._sessions.move_to_end(session.id)
+                self._evict(keep=session)
+        return turn
+
+    def delete(self, session_id: str) -> bool:
+        """Drop a session; returns whether it existed"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return False
+            self.bytes -= session.bytes
+            return True
+
+    def _expire(self):
+        # Sessions are kept in last-active order, so expired ones are at the front
+        cutoff = self._clock() - self.idle_ttl
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_active > cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self.bytes -= session.bytes
+            self.expirations += 1
+
+    def _evict(self, keep: Session):
+        self._expire()
+        while self.bytes > self.max_bytes and len(self._sessions) > 1:
+            session_id, session = next(iter(self._sessions.items()))
+            if session is keep:
+                break
+            del self._sessions[session_id]
+            self.bytes -= session.bytes
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Session counts and memory use"""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "turns": sum(len(s.turns) for s in self._sessions.values()),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "idle_ttl": self.idle_ttl,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import re
+import time
+
+# Default coalescing window: deltas arriving within it share one frame
+DEFAULT_FLUSH_INTERVAL = 0.05
+
+# Default amount of buffered text (characters) that is sent without waiting for the window
+DEFAULT_FLUSH_BYTES = 1024
+
+# Media type of the streams
+MEDIA_TYPE = "text/event-stream"
+
+# Line breaks as defined by the event stream format
+_LINE_BREAKS = re.compile(r"\r\n|\r|\n")
+
+class StreamEnd:
+    __slots__ = ("usage", "finish_reason")
+
+    def __init__(self, usage: dict = None, finish_reason: str = None):
+        """End of an upstream answer; passed among the text pieces to carry its usage to the done event"""
+        self.usage = usage
+        self.finish_reason = finish_reason
+
+
+def usage_dict(usage):
+    """Token usage of an end chunk as a plain dict (the Pinecone SDK uses objects)"""
+    if usage is None or isinstance(usage, dict):
+        return usage
+    if hasattr(usage, "to_dict"):
+        return usage.to_dict()
+    return {name: getattr(usage, name) for name in ("prompt_tokens", "completion_tokens", "total_tokens")
+            if hasattr(usage, name)}
+
+
+class EventStream:
+    def __init__(self, pieces, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 flush_bytes: int = DEFAULT_FLUSH_BYTES, started: float = None, cached: bool = False):
+        """
+        Encodes an answer as a text/event-stream, coalescing deltas into frames
+
+        Text goes out as unnamed events whose data is the raw text (one
+        ``data:`` line per line of text), so there's no JSON per delta. The
+        first delta is sent right away; later ones are buffered until
+        flush_interval passed since the oldest buffered delta or flush_bytes
+        characters are waiting. A task reads the upstream while frames are
+        sent, so waiting for the window costs one timer per frame rather than
+        work per delta; once flush_bytes are waiting it stops reading until the
+        client took them. The stream ends with a ``done`` event whose
+        JSON data has usage and timing, or an ``error`` event if the upstream
+        failed. Every event has an increasing ``id``.
+
+        Iterating the object yields the frames; afterwards its attributes
+        describe the stream (chunks, frames, bytes, first_chunk_at,
+        encode_seconds).
+
+        Args:
+            pieces: Async iterator of text deltas, optionally followed by a StreamEnd
+            flush_interval (float): Coalescing window in seconds (0 sends every delta as its own frame)
+            flush_bytes (int): Buffered characters that trigger an immediate frame
+            started (float): perf_counter() at the start of the request, for the timing in the done event
+            cached (bool): Whether the answer comes from the response cache
+        """
+        self.pieces = pieces
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.started = time.perf_counter() if started is None else started
+        self.cached = cached
+        self.end = None
+        self.chunks = 0
+        self.frames = 0
+        self.bytes = 0
+        self.first_chunk_at = None
+        self.encode_seconds = 0.0
+
+    def _event(self, data: str, event: str = None) -> str:
+        start = time.perf_counter()
+        self.frames += 1
+        head = f"id: {self.frames}\n" if event is None else f"id: {self.frames}\nevent: {event}\n"
+        frame = head + "data: " + "\ndata: ".join(_LINE_BREAKS.split(data)) + "\n\n"
+        self.bytes += len(frame)
+        self.encode_seconds += time.perf_counter() - start
+        return frame
+
+    def _done(self) -> str:
+        end = self.end or StreamEnd()
+        now = time.perf_counter()
+        return self._event(json.dumps({
+            "finish_reason": end.finish_reason or "stop",
+            "usage": end.usage,
+            "cached": self.cached,
+            "chunks": self.chunks,
+            "frames": self.frames + 1,
+            "first_chunk_ms": round((self.first_chunk_at - self.started) * 1000, 1) if self.first_chunk_at else None,
+            "total_ms": round((now - self.started) * 1000, 1),
+        }), "done")
+
+    async def _pump(self, iterator, buffer: list, wake: asyncio.Event, drained: asyncio.Event):
+        """Move deltas from the upstream into buffer, waking the encoder when a frame may be due"""
+        loop = asyncio.get_running_loop()
+        buffered = 0
+        try:
+            async for piece in iterator:
+                if isinstance(piece, StreamEnd):
+                    self.end = piece
+                    continue
+                if not piece:
+                    continue
+                self.chunks += 1
+                if not buffer:
+                    buffered = 0
+                    if self.first_chunk_at is None or not self.flush_interval:
+                        wake.set()
+                    else:
+                        self._timer = loop.call_at(loop.time() + self.flush_interval, wake.set)
+                buffer.append(piece)
+                buffered += len(piece)
+                if buffered >= self.flush_bytes:
+                    # Hold the upstream until the encoder took the text, so a slow client gets backpressure
+                    drained.clear()
+                    wake.set()
+                    await drained.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            self._finished = True
+            wake.set()
+            if hasattr(iterator, "aclose"):
+                await iterator.aclose()
+
+    async def __aiter__(self):
+        buffer = []
+        wake, drained = asyncio.Event(), asyncio.Event()
+        self._timer, self._error, self._finished = None, None, False
+        pump = asyncio.ensure_future(self._pump(self.pieces.__aiter__(), buffer, wake, drained))
+        try:
+            while True:
+                await wake.wait()
+                wake.clear()
+                if buffer:
+                    if self._timer is not None:
+                        self._timer.cancel()
+                        self._timer = None
+                    if self.first_chunk_at is None:
+                        self.first_chunk_at = time.perf_counter()
+                    text = "".join(buffer)
+                    buffer.clear()
+                    drained.set()
+                    yield self._event(text)
+                if self._finished and not buffer:
+                    break
+        finally:
+            if self._timer is not None:
+                self._timer.cancel()
+            if not pump.done():
+                pump.cancel()
+                await asyncio.gather(pump, return_exceptions=True)
+
+        if self._error is not None:
+            yield self._event(json.dumps({"error": str(self._error)}), "error")
+            return
+        yield self._done()
+
+
+def parse_events(text: str) -> list:
+    """
+    Parse a text/event-stream body (for clients and tests)
+
+    Returns:
+        list: (event, id, data) per event; event is "message" for text deltas
+    """
+    events = []
+    for block in text.split("\n\n"):
+        event, event_id, data = "message", None, []
+        for line in block.split("\n"):
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "event":
+                event = value
+            elif field == "id":
+                event_id = value
+            elif field == "data":
+                data.append(value)
+        if data:
+            events.append((event, event_id, "\n".join(data)))
+    return events
@@ -164,34 +164,54 @@ class ChatAssistant {
         
         const reader = response.body.getReader();
         const decoder = new TextDecoder();
+        let buffer = '';
+        let text = '';
+        
+        // Server-sent events: blocks separated by a blank line, with optional
+        // "event:" and "id:" fields and one "data:" line per line of text
+        const handleEvent = (block) => {
+            let event = 'message';
+            const data = [];
+            for (const line of block.split('\n')) {
+                const colon = line.indexOf(':');
+                const field = colon === -1 ? line : line.slice(0, colon);
+                let value = colon === -1 ? '' : line.slice(colon + 1);
+                if (value.startsWith(' ')) value = value.slice(1);
+                if (field === 'event') event = value;
+                else if (field === 'data') data.push(value);
+            }
+            if (!data.length) return true;
+            
+            if (event === 'done') {
+                return false;
+            }
+            if (event === 'error') {
+                this.showError(JSON.parse(data.join('\n')).error || 'Streaming failed');
+                return false;
+            }
+            
+            // Update content with proper HTML formatting
+            text += data.join('\n');
+            messageElement.innerHTML = this.formatMessage(text);
+            
+            // Smooth scroll to bottom during streaming
+            this.scrollToBottomSmooth();
+            return true;
+        };
         
         while (true) {
             const { value, done } = await reader.read();
             if (done) break;
             
-            const chunk = decoder.decode(value);
-            const lines = chunk.split('\n');
+            // Events may be split across reads; keep the incomplete tail
+            buffer += decoder.decode(value, { stream: true });
+            const blocks = buffer.split('\n\n');
+            buffer = blocks.pop();
             
-            for (const line of lines) {
-                if (line.startsWith('data: ')) {
-                    const data = line.slice(6);
-                    if (data.trim()) {
-                        try {
-                            const parsed = JSON.parse(data);
-                            if (parsed.content === '[DONE]') {
-                                break;
-                            }
-                            
-                            // Update content with proper HTML formatting
-                            const currentContent = messageElement.innerHTML;
-                            messageElement.innerHTML = this.formatMessage(currentContent + parsed.content);
-                            
-                            // Smooth scroll to bottom during streaming
-                            this.scrollToBottomSmooth();
-                        } catch (e) {
-                            console.error('Error parsing streaming data:', e);
-                        }
-                    }
+            for (const block of blocks) {
+                if (!handleEvent(block)) {
+                    reader.cancel();
+                    return;
                 }
             }
         }
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import mimetypes
+import os
+
+from starlette.responses import Response
+
+# Fingerprinted assets never change under their URL; pages are revalidated with their ETag
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Precompressed variants written by build_static.py, by preference, with their file suffix
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# URL prefix of the fingerprinted copies of static/
+ASSETS_URL = "/assets/"
+
+# Written by build_static.py into the build directory
+MANIFEST = "manifest.json"
+
+
+def digest(data: bytes) -> str:
+    """Content hash used for fingerprints and ETags"""
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def read_manifest(directory: str) -> dict:
+    """
+    The build manifest: fingerprinted names of the files under static/ and digests of the pages
+
+    Returns:
+        dict: {"assets": {source: fingerprinted}, "pages": {name: digest}}, empty without a build
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {}
+    return {"assets": manifest.get("assets", {}), "pages": manifest.get("pages", {})}
+
+
+def accepted_encodings(header: str) -> set:
+    """
+    Content codings a client accepts, from its Accept-Encoding header
+
+    Codings listed with q=0 are refused; "*" stands for both precompressed codings.
+    """
+    accepted = set()
+    for part in header.lower().split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q <= 0:
+            continue
+        if coding == "*":
+            accepted.update(encoding for encoding, _ in ENCODINGS)
+        elif coding:
+            accepted.add(coding)
+    return accepted
+
+
+def fingerprinted_name(source: str, data: bytes) -> str:
+    """css/style.css -> css/style.<digest>.css"""
+    stem, ext = os.path.splitext(source)
+    return f"{stem}.{digest(data)}{ext}"
+
+
+def digest_from_name(fingerprinted: str) -> str:
+    return os.path.splitext(os.path.splitext(fingerprinted)[0])[1][1:]
+
+
+class StaticAsset:
+    __slots__ = ("media_type", "tag", "variants")
+
+    def __init__(self, media_type: str, variants: dict):
+        """
+        A file kept in memory with its precompressed variants
+
+        Args:
+            media_type (str): Content-Type of the file
+            variants (dict): Body by content coding; "identity" is the file itself
+        """
+        self.media_type = media_type
+        self.variants = variants
+        self.tag = digest(variants["identity"])
+
+    @classmethod
+    def load(cls, path: str, media_type: str = None, expected: str = None):
+        """
+        Read a file and the .br/.gz variants next to it
+
+        The variants are only used when the file still has the digest they
+        were built from, so a file changed after the build isn't shadowed by
+        stale compressed copies.
+
+        Args:
+            path (str): File to read
+            media_type (str): Content-Type, guessed from the name if omitted
+            expected (str): Digest of the file at build time
+
+        Returns:
+            StaticAsset: The file, or None if it doesn't exist
+        """
+        try:
+            with open(path, "rb") as f:
+                variants = {"identity": f.read()}
+        except FileNotFoundError:
+            return None
+        if expected is not None and digest(variants["identity"]) == expected:
+            for encoding, suffix in ENCODINGS:
+                try:
+                    with open(path + suffix, "rb") as f:
+                        variants[encoding] = f.read()
+                except FileNotFoundError:
+                    pass
+        if media_type is None:
+            media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            if media_type.startswith("text/") or media_type == "application/javascript":
+                media_type += "; charset=utf-8"
+        return cls(media_type, variants)
+
+    def etag(self, encoding: str) -> str:
+        # Each coding is its own representation, so each gets its own validator
+        return f'"{self.tag}"' if encoding == "identity" else f'"{self.tag}-{encoding}"'
+
+    def not_modified(self, if_none_match: str) -> bool:
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return any(self.etag(encoding) in tags for encoding in self.variants)
+
+    def response(self, headers, cache_control: str) -> Response:
+        """
+        Response for a request with the given headers
+
+        Picks the preferred variant the client accepts, and answers 304 when
+        the client already holds the file.
+
+        Args:
+            headers: Request headers
+            cache_control (str): Cache-Control of the response
+        """
+        accepted = accepted_encodings(headers.get("accept-encoding", ""))
+        encoding = next((encoding for encoding, _ in ENCODINGS if encoding in accepted and encoding in self.variants),
+                        "identity")
+        response_headers = {"ETag": self.etag(encoding), "Cache-Control": cache_control}
+        if len(self.variants) > 1:
+            response_headers["Vary"] = "Accept-Encoding"
+        if self.not_modified(headers.get("if-none-match", "")):
+            return Response(status_code=304, headers=response_headers)
+        if encoding != "identity":
+            response_headers["Content-Encoding"] = encoding
+        return Response(self.variants[encoding], media_type=self.media_type, headers=response_headers)
+
+
+class AssetStore:
+    def __init__(self, directory: str):
+        """
+        Output of build_static.py, held in memory
+
+        The manifest maps each file under static/ to its fingerprinted copy
+        in the build's static/ directory, e.g. css/style.css ->
+        css/style.3f2a9c1e5b7d0a4f.css, served under /assets/. Without a
+        build the store is empty and pages keep their /static/ URLs.
+
+        Args:
+            directory (str): The build directory
+        """
+        self.directory = directory
+        self.manifest = read_manifest(directory)
+        self.assets = {}
+        for fingerprinted in self.manifest["assets"].values():
+            path = os.path.join(directory, "static", fingerprinted)
+            asset = StaticAsset.load(path, expected=digest_from_name(fingerprinted))
+            if asset is not None:
+                self.assets[fingerprinted] = asset
+
+    def __len__(self):
+        return len(self.assets)
+
+    def get(self, path: str):
+        return self.assets.get(path)
+
+    def page(self, name: str):
+        """A page pre-rendered at build time, or None"""
+        return StaticAsset.load(os.path.join(self.directory, name), "text/html; charset=utf-8",
+                                expected=self.manifest["pages"].get(name))
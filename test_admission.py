@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from admission import ConcurrencyLimiter, RateLimiter, Rejected
+from main_mock import LatencyProfile, PineconeAssistant
+from test_metrics import sample
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_buckets_per_client():
+    """Each client gets its burst, then tokens at the configured rate; idle clients are forgotten"""
+    clock = FakeClock()
+    limiter = RateLimiter(rate_per_minute=60, burst=3, max_clients=2, clock=clock)
+    assert [limiter.take("a") for _ in range(3)] == [0, 0, 0]
+    assert limiter.take("a") == pytest.approx(1.0)
+    assert limiter.take("b") == 0
+
+    clock.now = 0.5
+    assert limiter.take("a") == pytest.approx(0.5)
+    clock.now = 1.0
+    assert limiter.take("a") == 0
+
+    limiter.take("c")
+    assert len(limiter) == 2
+    assert limiter.take("b") == 0 and limiter.take("b") == 0
+
+
+def test_concurrency_limit_queues_then_sheds():
+    """Waiters get freed slots in order; a full queue or a long wait is rejected with 503"""
+    async def run():
+        limiter = ConcurrencyLimiter(limit=1, queue_size=1, queue_timeout=0.2)
+        assert await limiter.acquire() == 0
+
+        second = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as raised:
+            await limiter.acquire()
+        assert (raised.value.status, raised.value.reason) == (503, "queue_full")
+
+        limiter.release(held=0.05)
+        assert await second > 0
+        assert (limiter.active, limiter.queued) == (1, 0)
+
+        with pytest.raises(Rejected) as raised:
+            await limiter.acquire()
+        assert raised.value.reason == "queue_timeout"
+
+        # A waiter that goes away leaves neither a queue entry nor a leaked slot
+        gone = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        gone.cancel()
+        await asyncio.gather(gone, return_exceptions=True)
+        limiter.release()
+        assert (limiter.active, limiter.queued) == (0, 0)
+
+    asyncio.run(run())
+
+
+def test_rate_limited_client_gets_429(monkeypatch):
+    """Over its rate a client gets 429 with Retry-After; other endpoints aren't limited"""
+    monkeypatch.setattr(app_module.admission, "rate_limiter", RateLimiter(rate_per_minute=6, burst=2))
+    with TestClient(app_module.app) as client:
+        app_module.set_assistant(PineconeAssistant(profile=LatencyProfile()))
+        before = client.get("/metrics").text
+        statuses = [client.post("/chat", json={"message": f"Rate limit {i}?"}).status_code for i in range(2)]
+        limited = client.post("/chat", json={"message": "One too many?"})
+        assert client.get("/health").status_code == 200
+        text = client.get("/metrics").text
+
+    assert statuses == [200, 200]
+    assert limited.status_code == 429
+    assert limited.headers["retry-after"] == "10"
+    assert limited.json() == {"detail": "Too many requests"}
+    assert sample(text, "admission_rejected_total", reason="rate_limited") - (
+        sample(before, "admission_rejected_total", reason="rate_limited")) == 1
+    assert sample(text, "http_request_duration_seconds_count", method="POST", route="/chat", status="429") >= 1
+
+
+def test_session_messages_are_admitted(monkeypatch):
+    """Session chats count against the rate limit like /chat; the rest of the session API isn't limited"""
+    monkeypatch.setattr(app_module.admission, "rate_limiter", RateLimiter(rate_per_minute=6, burst=2))
+    with TestClient(app_module.app) as client:
+        app_module.set_assistant(PineconeAssistant(profile=LatencyProfile()))
+        session_id = client.post("/sessions").json()["session_id"]
+        path = f"/sessions/{session_id}/messages"
+        statuses = [client.post(path, json={"message": f"Session limit {i}?"}).status_code for i in range(3)]
+        text = client.get("/metrics").text
+        assert client.get(f"/sessions/{session_id}").status_code == 200
+
+    assert statuses == [200, 200, 429]
+    assert sample(text, "http_request_duration_seconds_count", method="POST",
+                  route="/sessions/{session_id}/messages", status="429") >= 1
+
+
+def test_burst_beyond_capacity_is_shed_fast(monkeypatch):
+    """With one slot and one queue place, a burst of slow chats gets fast 503s with Retry-After"""
+    monkeypatch.setattr(app_module.admission, "limiter", ConcurrencyLimiter(limit=1, queue_size=1, queue_timeout=0.2))
+    app_module.set_assistant(PineconeAssistant(profile=LatencyProfile(ttft_ms=400)))
+    app_module.response_cache.invalidate()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def chat(i):
+                await asyncio.sleep(i * 0.02)
+                start = time.perf_counter()
+                response = await client.post("/chat", json={"message": f"Shedding question {i}?"})
+                return response, time.perf_counter() - start
+
+            results = await asyncio.gather(*(chat(i) for i in range(4)))
+            stats = (await client.get("/admission/stats")).json()
+        return results, stats
+
+    results, stats = asyncio.run(run())
+    assert [response.status_code for response, _ in results] == [200, 503, 503, 503]
+    assert results[0][0].json()["success"]
+    assert all(int(response.headers["retry-after"]) >= 1 for response, _ in results[1:])
+    assert 0.15 < results[1][1] < 0.35
+    assert max(seconds for _, seconds in results[2:]) < 0.1
+    assert stats["rejected"]["queue_timeout"] >= 1 and stats["rejected"]["queue_full"] >= 2
+    assert (stats["active"], stats["queued"]) == (0, 0)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
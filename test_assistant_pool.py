@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from assistant_pool import AssistantPool, AssistantUnavailable, UnknownAssistant
+from cache import ResponseCache
+from concurrency import UpstreamExecutor
+
+
+class NamedAssistant:
+    """Stand-in assistant that answers with its own name"""
+
+    def __init__(self, name):
+        self.name = name
+        self.warmed = False
+
+    def warm_up(self):
+        self.warmed = True
+
+    def detect_intent(self, message):
+        return "general"
+
+    def _enhance_user_message(self, message):
+        return f"Question: {message}"
+
+    def chat(self, message, stream=False):
+        return {"content": f"{self.name} answers {message}"}
+
+    def get_response_content(self, response):
+        return response["content"]
+
+
+def test_assistants_are_created_lazily_and_warmed_up():
+    """Nothing is created until first use; instances are warmed up and reused"""
+    created = []
+
+    def factory(name):
+        created.append(name)
+        return NamedAssistant(name)
+
+    async def scenario():
+        pool = AssistantPool(factory, ["nexon", "harrier"], UpstreamExecutor(2))
+        assert created == [] and pool.peek() is None
+
+        first, second = await asyncio.gather(pool.get(), pool.get())
+        assert first is second and first.warmed
+        assert created == ["nexon"]
+
+        assert (await pool.get("harrier")).name == "harrier"
+        assert pool.status()["harrier"]["ready"]
+        with pytest.raises(UnknownAssistant):
+            await pool.get("safari")
+
+    asyncio.run(scenario())
+
+
+def test_failed_initialization_is_retried_in_background():
+    """A failing first attempt answers 'unavailable' quickly, then recovers without a restart"""
+    attempts = 0
+
+    def factory(name):
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise ConnectionError("Pinecone unreachable")
+        return NamedAssistant(name)
+
+    async def scenario():
+        pool = AssistantPool(factory, ["nexon"], UpstreamExecutor(2), retry_initial=0.01, retry_max=0.02)
+        with pytest.raises(AssistantUnavailable, match="unreachable"):
+            await pool.get()
+
+        for _ in range(100):
+            if pool.peek() is not None:
+                break
+            await asyncio.sleep(0.01)
+        assert (await pool.get()).name == "nexon"
+        assert pool.status()["nexon"]["attempts"] == 3
+
+    asyncio.run(scenario())
+
+
+def test_endpoints_take_an_assistant_name(monkeypatch):
+    """?assistant= picks the assistant; answers are cached per assistant"""
+    monkeypatch.setattr(app_module, "response_cache", ResponseCache())
+    with TestClient(app_module.app) as client:
+        app_module.set_assistant(NamedAssistant("nexon"))
+        app_module.set_assistant(NamedAssistant("harrier"), "harrier")
+
+        default = client.post("/chat", json={"message": "Airbags?"}).json()
+        named = client.post("/chat", params={"assistant": "harrier"}, json={"message": "Airbags?"}).json()
+        assert default["response"] == "nexon answers Airbags?"
+        assert named["response"] == "harrier answers Airbags?" and not named["cached"]
+
+        assert client.post("/chat", params={"assistant": "safari"}, json={"message": "Hi"}).status_code == 404
+        assert client.get("/health").json()["assistants"]["harrier"]["ready"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
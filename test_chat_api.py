@@ -53,24 +53,27 @@ def test_chat_functionality():
             print(f"   📡 Response chunks:")
             
             chunk_count = 0
-            for line in response.iter_lines():
-                if line:
-                    line_text = line.decode('utf-8')
-                    if line_text.startswith('data: '):
-                        try:
-                            data = json.loads(line_text[6:])
-                            content = data.get('content', '')
-                            if content == '[DONE]':
-                                print(f"\n   🏁 Stream completed ({chunk_count} chunks)")
-                                break
-                            elif content:
-                                print(content, end='', flush=True)
-                                chunk_count += 1
-                                if chunk_count > 50:  # Limit output for testing
-                                    print("... (truncated)")
-                                    break
-                        except json.JSONDecodeError:
-                            pass
+            event, data = "message", []
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith('event: '):
+                    event = line[7:]
+                elif line.startswith('data:'):
+                    data.append(line[6:] if line.startswith('data: ') else line[5:])
+                elif not line and data:
+                    # A blank line ends the event
+                    text = "\n".join(data)
+                    if event == 'done':
+                        print(f"\n   🏁 Stream completed ({chunk_count} events): {json.loads(text)}")
+                        break
+                    elif event == 'error':
+                        print(f"\n   ❌ Stream failed: {json.loads(text)['error']}")
+                        break
+                    print(text, end='', flush=True)
+                    chunk_count += 1
+                    if chunk_count > 50:  # Limit output for testing
+                        print("... (truncated)")
+                        break
+                    event, data = "message", []
         else:
             print(f"   ❌ Streaming failed: {response.status_code}")
     except Exception as e:
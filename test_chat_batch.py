@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import json
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from cache import ResponseCache
+
+
+class SlowAssistant:
+    """Stand-in assistant that answers slowly and tracks concurrent calls"""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.calls = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def detect_intent(self, message):
+        return "general"
+
+    def _enhance_user_message(self, message):
+        return f"Question: {message}"
+
+    def chat(self, message, stream=False):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        # Later questions finish first, so completion order differs from input order
+        time.sleep(self.latency / (1 + len(message) % 3))
+        with self._lock:
+            self.in_flight -= 1
+        if "fail" in message:
+            raise RuntimeError("upstream error")
+        return {"message": {"content": f"Answer to {message}"}}
+
+    def get_response_content(self, response):
+        return response["message"]["content"]
+
+
+def test_batch_answers_in_input_order_under_cap(monkeypatch):
+    """Results keep input order, carry latency, and never exceed the concurrency cap"""
+    monkeypatch.setattr(app_module, "response_cache", ResponseCache())
+    monkeypatch.setattr(app_module, "CHAT_BATCH_CONCURRENCY", 3)
+    with TestClient(app_module.app) as client:
+        fake = SlowAssistant()
+        app_module.set_assistant(fake)
+        questions = [f"Question {i}" + "?" * i for i in range(12)] + ["please fail"]
+
+        body = client.post("/chat/batch", json={"questions": questions, "concurrency": 10}).json()
+        assert body["concurrency"] == 3
+        assert [item["index"] for item in body["results"]] == list(range(13))
+        assert body["results"][0]["response"] == "Answer to Question 0"
+        assert all(item["latency_ms"] > 0 for item in body["results"])
+        assert body["results"][-1]["success"] is False and body["success"] is False
+        assert fake.peak_in_flight == 3
+
+        # The response cache in front of /chat is shared with batches
+        again = client.post("/chat/batch", json={"questions": questions[:2]}).json()
+        assert all(item["cached"] for item in again["results"])
+
+
+def test_batch_streams_ndjson(monkeypatch):
+    """stream=true sends one JSON line per finished question, then a summary line"""
+    monkeypatch.setattr(app_module, "response_cache", ResponseCache())
+    with TestClient(app_module.app) as client:
+        app_module.set_assistant(SlowAssistant())
+        with client.stream("POST", "/chat/batch", json={"questions": ["a", "bb", "ccc"], "stream": True}) as resp:
+            assert resp.headers["content-type"].startswith("application/x-ndjson")
+            lines = [json.loads(line) for line in resp.iter_lines() if line]
+
+        assert sorted(line["index"] for line in lines[:-1]) == [0, 1, 2]
+        assert lines[-1]["done"] is True and lines[-1]["failed"] == 0
+
+
+def test_batch_size_limit(monkeypatch):
+    """Batches above MAX_BATCH_QUESTIONS are rejected with 413"""
+    monkeypatch.setattr(app_module, "MAX_BATCH_QUESTIONS", 2)
+    with TestClient(app_module.app) as client:
+        app_module.set_assistant(SlowAssistant())
+        assert client.post("/chat/batch", json={"questions": ["a", "b", "c"]}).status_code == 413
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
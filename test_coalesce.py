@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import app as app_module
+from cache import ResponseCache
+from coalesce import SharedStreams, SingleFlight
+from sse import parse_events
+
+
+def test_single_flight_shares_one_call():
+    """Concurrent calls with the same key run the function once"""
+    async def scenario():
+        flights = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "Five star rating."
+
+        results = await asyncio.gather(*[flights.do("same", fetch) for _ in range(10)])
+        assert results == ["Five star rating."] * 10
+        assert calls == 1
+        assert flights.stats()["coalescing_ratio"] == 0.9
+        assert flights.stats()["in_flight"] == 0
+
+        # Once finished, the next call goes upstream again
+        await flights.do("same", fetch)
+        assert calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_shared_stream_replays_prefix_to_late_joiners():
+    """A subscriber joining mid-stream gets the emitted prefix, then the live pieces"""
+    async def scenario():
+        streams = SharedStreams()
+        started = 0
+
+        async def source():
+            nonlocal started
+            started += 1
+            for piece in ["Five ", "star ", "NCAP ", "rating."]:
+                await asyncio.sleep(0.02)
+                yield piece
+
+        async def collect(delay):
+            await asyncio.sleep(delay)
+            return [piece async for piece in streams.subscribe("q", source)]
+
+        first, late = await asyncio.gather(collect(0), collect(0.05))
+        assert first == late == ["Five ", "star ", "NCAP ", "rating."]
+        assert started == 1
+        assert streams.stats()["coalesced"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_stream_is_cancelled_when_last_subscriber_leaves():
+    """Upstream stops once nobody is listening"""
+    async def scenario():
+        streams = SharedStreams()
+        closed = asyncio.Event()
+
+        async def source():
+            try:
+                while True:
+                    await asyncio.sleep(0.01)
+                    yield "piece "
+            finally:
+                closed.set()
+
+        pieces = streams.subscribe("q", source)
+        await pieces.__anext__()
+        await pieces.aclose()
+        await asyncio.wait_for(closed.wait(), timeout=1)
+        assert streams.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+class SlowAssistant:
+    """Stand-in assistant that counts upstream calls"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def detect_intent(self, message):
+        return "general"
+
+    def _enhance_user_message(self, message):
+        return f"Question: {message}"
+
+    def chat(self, message, stream=False):
+        self.calls += 1
+        if stream:
+            return self._stream()
+        time.sleep(0.1)
+        return {"message": {"content": "Five star rating."}}
+
+    def _stream(self):
+        for word in ["Five ", "star ", "rating."]:
+            time.sleep(0.03)
+            yield type("Chunk", (), {"delta": type("Delta", (), {"content": word})()})()
+
+    def get_response_content(self, response):
+        return response["message"]["content"]
+
+
+@pytest.mark.parametrize("path", ["/chat", "/chat/stream"])
+def test_identical_requests_share_one_upstream_call(monkeypatch, path):
+    """A burst of identical questions makes one upstream call"""
+    monkeypatch.setattr(app_module, "response_cache", ResponseCache(max_entries=0))
+    monkeypatch.setattr(app_module, "chat_flights", SingleFlight())
+    monkeypatch.setattr(app_module, "stream_flights", SharedStreams())
+    fake = SlowAssistant()
+    app_module.set_assistant(fake)
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*[
+                client.post(path, json={"message": "What is the NCAP rating?"}) for _ in range(20)
+            ])
+            stats = (await client.get("/coalescing/stats")).json()
+        return responses, stats
+
+    responses, stats = asyncio.run(burst())
+    assert all(resp.status_code == 200 for resp in responses)
+    if path == "/chat":
+        assert all(resp.json()["response"] == "Five star rating." for resp in responses)
+    else:
+        for resp in responses:
+            events = parse_events(resp.text)
+            assert "".join(data for event, _, data in events if event == "message") == "Five star rating."
+            assert events[-1][0] == "done"
+    assert fake.calls == 1
+    assert stats["coalescing_ratio"] == 0.95
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
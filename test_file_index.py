@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+from file_index import FileIndex
+
+
+def write(directory, name, size):
+    with open(os.path.join(directory, name), "wb") as f:
+        f.write(b"x" * size)
+
+
+def test_pagination_sorting_and_prefix():
+    """Pages, sort orders and prefix filters come from the in-memory index"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, size in enumerate([30, 10, 20]):
+            write(tmp, f"manual-{i}.pdf", size)
+        write(tmp, "bulletin.pdf", 5)
+        write(tmp, ".manifest.json", 1)
+        write(tmp, "partial.pdf.part", 1)
+
+        index = FileIndex(tmp)
+        index.rescan()
+        assert len(index) == 4
+
+        files, total = index.page(limit=2)
+        assert total == 4
+        assert [f["name"] for f in files] == ["bulletin.pdf", "manual-0.pdf"]
+        files, _ = index.page(offset=2, limit=2)
+        assert [f["name"] for f in files] == ["manual-1.pdf", "manual-2.pdf"]
+
+        files, _ = index.page(sort="size", descending=True)
+        assert [f["size"] for f in files] == [30, 20, 10, 5]
+
+        files, total = index.page(prefix="manual-", sort="size")
+        assert total == 3 and files[0]["name"] == "manual-1.pdf"
+
+
+def test_tracks_app_writes_and_out_of_band_changes():
+    """record/remove keep the index current; directory changes trigger a rescan"""
+    with tempfile.TemporaryDirectory() as tmp:
+        index = FileIndex(tmp)
+        index.rescan()
+
+        write(tmp, "a.pdf", 1)
+        index.record("a.pdf")
+        version = index.version
+        index.refresh()
+        assert index.version == version
+        assert len(index) == 1
+
+        # Someone drops a file in the directory directly
+        write(tmp, "b.pdf", 2)
+        os.utime(tmp, ns=(0, 0))
+        index.refresh()
+        assert [f["name"] for f in index.page()[0]] == ["a.pdf", "b.pdf"]
+
+        os.remove(os.path.join(tmp, "a.pdf"))
+        index.remove("a.pdf")
+        assert [f["name"] for f in index.page()[0]] == ["b.pdf"]
+
+
+def test_files_endpoint_etag(monkeypatch):
+    """GET /files answers 304 while the listing is unchanged"""
+    with tempfile.TemporaryDirectory() as tmp:
+        write(tmp, "owner-manual.pdf", 10)
+        monkeypatch.setattr(app_module, "file_index", FileIndex(tmp))
+        with TestClient(app_module.app) as client:
+            resp = client.get("/files", params={"sort": "size", "limit": 10})
+            assert resp.status_code == 200
+            assert resp.json()["total"] == 1
+            etag = resp.headers["etag"]
+
+            cached = client.get("/files", params={"sort": "size", "limit": 10}, headers={"If-None-Match": etag})
+            assert cached.status_code == 304
+
+            other_query = client.get("/files", params={"sort": "name"}, headers={"If-None-Match": etag})
+            assert other_query.status_code == 200
+
+            write(tmp, "service-manual.pdf", 20)
+            os.utime(tmp, ns=(0, 0))
+            changed = client.get("/files", params={"sort": "size", "limit": 10}, headers={"If-None-Match": etag})
+            assert changed.status_code == 200
+            assert changed.json()["total"] == 2
+
+            assert client.get("/files", params={"sort": "owner"}).status_code == 422
+
+
+if __name__ == "__main__":
+    test_pagination_sorting_and_prefix()
+    test_tracks_app_writes_and_out_of_band_changes()
+    print("✅ File index tests passed")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+import main
+from history import SUMMARY_HEADER, HistoryCompactor, message_tokens
+
+
+def conversation(turns, words=40):
+    messages = []
+    for i in range(turns):
+        role = "user" if i % 2 == 0 else "assistant"
+        messages.append({"role": role, "content": f"Turn {i} first sentence. " + "detail " * words})
+    return messages
+
+
+def test_short_history_is_sent_unchanged():
+    """Conversations under budget go out as they are"""
+    compactor = HistoryCompactor(budget=1000)
+    window = compactor.compact(["Hello", "What is the service interval?"])
+    assert window.messages == [
+        {"role": "user", "content": "Hello"},
+        {"role": "user", "content": "What is the service interval?"},
+    ]
+    assert window.summarized == 0
+    assert window.tokens_sent == message_tokens("Hello") + message_tokens("What is the service interval?")
+    assert window.tokens_available == 1000
+
+
+def test_long_history_keeps_system_and_latest_turns_within_budget():
+    """Older turns collapse into a summary; system context and latest turns always stay"""
+    compactor = HistoryCompactor(budget=400, keep_recent=2, summary_tokens=100)
+    messages = [{"role": "system", "content": "You are a TATA Nexon expert."}] + conversation(20)
+    window = compactor.compact(messages)
+
+    assert window.messages[0]["role"] == "system"
+    assert window.messages[1]["content"].startswith(SUMMARY_HEADER)
+    assert window.messages[-2:] == messages[-2:]
+    assert window.summarized + len(window.messages) - 2 == 20
+    assert window.tokens_sent <= window.tokens_available
+    # The summary keeps the most recent dropped turns
+    assert f"Turn {window.summarized - 1} first sentence." in window.messages[1]["content"]
+    assert "detail" not in window.messages[1]["content"]
+
+
+def test_summary_is_reused_until_the_window_moves():
+    """The summary is only rebuilt when turns leave the window"""
+    compactor = HistoryCompactor(budget=400, keep_recent=2, summary_tokens=100)
+    messages = conversation(20)
+
+    first = compactor.compact(messages, key="session-1")
+    again = compactor.compact(messages, key="session-1")
+    assert again.messages[0]["content"] is first.messages[0]["content"]
+
+    moved = compactor.compact(messages + conversation(2), key="session-1")
+    assert moved.summarized > first.summarized
+    assert moved.messages[0]["content"] is not first.messages[0]["content"]
+
+
+def test_chat_history_reports_token_usage(monkeypatch):
+    """POST /chat/history answers with tokens sent vs tokens available"""
+    class Echo:
+        def chat_with_history(self, messages, stream=False):
+            self.sent = messages
+            return {"content": "ok"}
+
+        def get_response_content(self, response):
+            return response["content"]
+
+    monkeypatch.setattr(app_module, "history_compactor", HistoryCompactor(budget=300, summary_tokens=80))
+    with TestClient(app_module.app) as client:
+        fake = Echo()
+        app_module.set_assistant(fake)
+        body = client.post("/chat/history", json={"messages": [m["content"] for m in conversation(30)]}).json()
+        assert body["success"]
+        assert body["tokens_available"] == 300
+        assert 0 < body["tokens_sent"] <= 300
+        assert fake.sent[0]["content"].startswith(SUMMARY_HEADER)
+
+
+def test_pinecone_assistant_sends_the_window_as_given(monkeypatch):
+    """The app compacts once; the assistant doesn't cut the window down a second time"""
+    class Upstream:
+        def chat(self, messages, stream=False):
+            self.sent = messages
+            return {"message": {"content": "ok"}}
+
+    upstream = Upstream()
+
+    class Client:
+        class assistant:
+            @staticmethod
+            def Assistant(assistant_name):
+                return upstream
+
+    monkeypatch.setenv("PINECONE_API_KEY", "test-history-key")
+    monkeypatch.setitem(main._clients, "test-history-key", Client())
+    monkeypatch.setenv("HISTORY_TOKEN_BUDGET", "100")
+    window = HistoryCompactor(budget=2000).compact(conversation(20))
+    main.PineconeAssistant().chat_with_history(window.messages)
+    assert upstream.sent == window.messages
+
+
+if __name__ == "__main__":
+    test_short_history_is_sent_unchanged()
+    test_long_history_keeps_system_and_latest_turns_within_budget()
+    test_summary_is_reused_until_the_window_moves()
+    print("✅ History compaction tests passed")
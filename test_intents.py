@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+from intents import GENERAL, IntentClassifier, detect_intent
+
+
+def test_quick_questions():
+    """The quick-question buttons in index.html land on the expected intents"""
+    assert detect_intent("What makes TATA Nexon's 5-Star safety rating special and what safety features does it include?") == "safety"
+    assert detect_intent("Give me the complete maintenance schedule for TATA Nexon with service intervals and what's included") == "maintenance"
+    assert detect_intent("Compare TATA Nexon petrol vs diesel engine specifications, performance and which one should I choose?") == "engine"
+    assert detect_intent("How do I use the infotainment system, connect my phone, and access all the smart features?") == "features"
+
+
+def test_word_boundaries():
+    """Short keywords only match whole words, longer ones also match inflections"""
+    assert detect_intent("Which colour looks best?") == GENERAL
+    assert detect_intent("It is obvs a good pick") == GENERAL
+    assert detect_intent("Nexon vs Brezza") == "comparison"
+    assert detect_intent("How many AIRBAGS are there?") == "safety"
+    assert detect_intent("Steps to troubleshoot the AC") == "troubleshooting"
+    assert detect_intent("Hi there") == "greeting"
+
+
+def test_multi_label_scores():
+    """classify() reports every matching label with its share of keyword hits"""
+    result = IntentClassifier().classify("Compare the airbag safety of petrol vs diesel")
+    assert result.label == "safety"
+    assert set(result.scores) == {"safety", "engine", "comparison"}
+    assert result.scores["safety"] == 0.3333
+    assert abs(sum(result.scores.values()) - 1) < 1e-3
+
+
+def test_batch_matches_single():
+    """classify_batch() gives the same answers as classifying one message at a time"""
+    classifier = IntentClassifier()
+    messages = ["engine oil change", "", "hello", "is it secure vs others?", "nothing here", "fix\x00it"]
+    assert classifier.classify_batch(messages) == [classifier.classify(m) for m in messages]
+
+
+if __name__ == "__main__":
+    test_quick_questions()
+    test_word_boundaries()
+    test_multi_label_scores()
+    test_batch_matches_single()
+    print("✅ Intent classifier tests passed")
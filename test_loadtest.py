@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+import pytest
+
+import app as app_module
+from benchmarks.loadtest import SCENARIOS, compare, run_suite
+from main_mock import LatencyProfile
+
+
+def test_suite_drives_every_endpoint():
+    """Each scenario completes without errors; streams report time to first token and token rate"""
+    upload_dir = app_module.UPLOAD_DIR
+    results = run_suite(list(SCENARIOS), concurrency=4, requests=12,
+                        profile=LatencyProfile(ttft_ms=20, tokens_per_s=1000, seed=1), warmup=2)
+
+    assert list(results) == list(SCENARIOS)
+    for name, result in results.items():
+        assert result["requests"] == 12 and result["errors"] == 0, name
+        assert result["throughput_rps"] > 0 and result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+    assert results["chat_stream"]["ttft_p50_ms"] >= 20
+    assert results["chat_stream"]["tokens_per_s_p50"] > 0
+    assert "ttft_p50_ms" not in results["chat"]
+    # Uploads went to a temporary directory
+    assert app_module.UPLOAD_DIR == upload_dir
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    """Slower latency, lower throughput and new errors are regressions; small changes are not"""
+    baseline = {"chat": {"throughput_rps": 100, "p50_ms": 10, "p95_ms": 20, "errors": 0},
+                "files": {"throughput_rps": 500, "p50_ms": 2, "p95_ms": 4, "errors": 0}}
+    current = {"chat": {"throughput_rps": 70, "p50_ms": 11, "p95_ms": 30, "errors": 1},
+               "files": {"throughput_rps": 520, "p50_ms": 1.5, "p95_ms": 4.5, "errors": 0},
+               "upload": {"throughput_rps": 50, "p50_ms": 5, "p95_ms": 9, "errors": 0}}
+
+    regressions = compare(current, baseline, tolerance=0.2)
+    assert [(name, metric) for name, metric, *_ in regressions] == [
+        ("chat", "throughput_rps"), ("chat", "p95_ms"), ("chat", "errors")
+    ]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from local_rag import NO_DOCUMENTS, NO_MATCH, LocalAssistant, LocalIndex, chunk_pages, extract_pages
+from manifest import UploadManifest
+
+BRAKES = "Brake fluid should be replaced every two years. Check the brake pads at every service."
+TYRES = "Recommended tyre pressure is 30 psi front and rear, measured when the tyres are cold."
+ENGINE = "The 1.2L Revotron petrol engine delivers 120 PS and 170 Nm of torque."
+
+
+def write(directory, name, text):
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        f.write(text)
+    return path
+
+
+def test_extract_and_chunk_keep_page_numbers(tmp_path):
+    """Pages split at form feeds; long pages become overlapping passages"""
+    path = write(tmp_path, "manual.txt", f"{BRAKES}\f{TYRES}")
+    assert [page for page, _ in chunk_pages(extract_pages(path))] == [1, 2]
+
+    html = write(tmp_path, "guide.html", f"<html><style>p {{}}</style><p>{ENGINE}</p></html>")
+    assert extract_pages(html)[0].split() == ENGINE.split()
+
+    words = [f"w{i}" for i in range(250)]
+    chunks = chunk_pages([" ".join(words)], chunk_words=100, overlap=20)
+    assert [len(text.split()) for _, text in chunks] == [100, 100, 90]
+    assert chunks[1][1].split()[0] == "w80"
+
+    with open(tmp_path / "image.bin", "wb") as f:
+        f.write(b"\x89PNG\0\0\0")
+    with pytest.raises(ValueError):
+        extract_pages(str(tmp_path / "image.bin"))
+
+
+def test_hybrid_search_is_incremental():
+    """Documents are searchable as soon as they're added and gone once removed"""
+    index = LocalIndex()
+    index.add_document("brakes", "brakes.txt", [(1, BRAKES), (2, TYRES)])
+    index.add_document("engine", "engine.txt", [(1, ENGINE)])
+
+    assert index.search("tyre pressure")[0].passage.page == 2
+    assert index.search("engine torque")[0].passage.doc_id == "engine"
+    # Plurals and typos still find the passage
+    assert index.search("how often replace brakes")[0].passage.doc_id == "brakes"
+    assert index.search("brkae fluid")[0].passage.doc_id == "brakes"
+    assert index.search("sunroof") == []
+
+    index.add_document("engine", "engine.txt", [(1, "The diesel engine delivers 110 PS.")])
+    assert "diesel" in index.search("engine")[0].passage.text
+    assert index.remove_document("brakes")
+    assert index.search("brake fluid") == []
+    assert len(index) == 1 and index.documents == ["engine"]
+
+
+def test_removed_passages_are_compacted():
+    """Re-indexing the same document many times doesn't grow the index"""
+    index = LocalIndex()
+    for version in range(600):
+        index.add_document("manual", "manual.txt", [(1, f"{ENGINE} Revision {version}.")])
+    assert len(index) == 1
+    assert len(index._passages) < 600
+    assert "Revision 599" in index.search("revision 599")[0].passage.text
+
+
+def test_feature_cache_is_bounded():
+    """Queries with ever new words don't grow the token feature cache past its size"""
+    index = LocalIndex(feature_cache_size=50)
+    index.add_document("engine", "engine.txt", [(1, ENGINE)])
+    for i in range(500):
+        index.search(f"engine query{i} word{i}")
+    assert len(index._feature_cache) == 50
+    assert index.search("engine torque")[0].passage.doc_id == "engine"
+
+
+def test_assistant_interface(tmp_path):
+    """Same methods and response shapes as the Pinecone assistant"""
+    assistant = LocalAssistant(upload_dir=str(tmp_path))
+    assert assistant.get_response_content(assistant.chat("brakes")) == NO_DOCUMENTS
+
+    write(tmp_path, "manual.txt", f"{BRAKES}\f{TYRES}")
+    # Partial uploads, temporary files and dotfiles are skipped, as in the file listing
+    for name in ("engine.txt.part", "engine.txt.tmp", ".engine.txt"):
+        write(tmp_path, name, ENGINE)
+    assistant.warm_up()
+    assert len(assistant.index.documents) == 1
+    response = assistant.chat("What tyre pressure should I use?")
+    content = assistant.get_response_content(response)
+    assert TYRES in content and "(manual.txt, page 2)" in content
+    assert response["citations"][0] == {"file": "manual.txt", "page": 2, "score": response["citations"][0]["score"]}
+
+    chunks = list(assistant.chat("What tyre pressure should I use?", stream=True))
+    assert [chunks[0].type, chunks[-1].type] == ["message_start", "message_end"]
+    streamed = "".join(chunk.delta.content for chunk in chunks[1:-1])
+    assert streamed == content
+
+    history = ["Tell me about tyres", {"role": "assistant", "content": TYRES}, "And the brake fluid?"]
+    assert BRAKES in assistant.get_response_content(assistant.chat_with_history(history))
+    assert assistant.get_response_content(assistant.chat("sunroof")) == NO_MATCH
+
+    result = assistant.upload_file(write(tmp_path, "engine.txt", ENGINE))
+    assert result["name"] == "engine.txt" and result["passages"] == 1
+    assert ENGINE in assistant.get_response_content(assistant.chat("engine torque"))
+    assistant.delete_file(result["id"])
+    assert ENGINE not in assistant.get_response_content(assistant.chat("engine torque"))
+
+
+def test_app_answers_from_uploaded_documents(monkeypatch, tmp_path):
+    """With the local backend an upload becomes searchable by /chat"""
+    monkeypatch.setattr(app_module, "upload_manifest", UploadManifest(str(tmp_path / "manifest.json")))
+    with TestClient(app_module.app) as client:
+        app_module.set_assistant(LocalAssistant(upload_dir=str(tmp_path)))
+        job_id = client.post("/upload", files={"file": ("rag-test.txt", TYRES.encode())}).json()["job_id"]
+        deadline = time.monotonic() + 10
+        while client.get(f"/upload/{job_id}").json()["status"] != "completed":
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+
+        body = client.post("/chat", json={"message": "tyre pressure for rag-test"}).json()
+        assert body["success"] and TYRES in body["response"]
+        client.delete("/files/rag-test.txt")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
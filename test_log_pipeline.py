@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+import io
+import json
+import logging
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+import log_pipeline
+from log_pipeline import LogPipeline
+
+
+class BlockingStream(io.StringIO):
+    """Stream whose writes wait until released, like a stalled stderr"""
+
+    def __init__(self):
+        super().__init__()
+        self.released = threading.Event()
+
+    def write(self, text):
+        self.released.wait()
+        return super().write(text)
+
+
+class Recorded:
+    """Log argument remembering the thread that formatted it"""
+
+    def __init__(self):
+        self.formatted_in = None
+
+    def __str__(self):
+        self.formatted_in = threading.current_thread().name
+        return "recorded"
+
+
+@pytest.fixture
+def pipeline_logger(request):
+    logger = logging.getLogger(f"test_log_pipeline.{request.node.name}")
+    logger.propagate = False
+    yield logger
+    logger.handlers.clear()
+
+
+def lines(stream) -> list:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def run_as_request(request_id: str, func):
+    """Run func with the request id set, like RequestIdMiddleware does"""
+    token = log_pipeline._request_id.set(request_id)
+    try:
+        func()
+    finally:
+        log_pipeline._request_id.reset(token)
+
+
+def test_json_records_formatted_on_the_writer_thread(pipeline_logger):
+    """Records carry the request id and extra= fields; messages are formatted by the writer thread"""
+    stream = io.StringIO()
+    pipeline = LogPipeline(stream=stream)
+    pipeline.install(pipeline_logger)
+    argument = Recorded()
+    run_as_request("req-1", lambda: pipeline_logger.info(
+        "Answered %s in %.1fms", argument, 12.34, extra={"intent": "safety", "latency_ms": 12.3}))
+    try:
+        raise ValueError("bad upstream answer")
+    except ValueError:
+        pipeline_logger.exception("Error in chat")
+    pipeline.close()
+
+    answered, failed = lines(stream)
+    assert argument.formatted_in not in (None, threading.current_thread().name)
+    assert answered["msg"] == "Answered recorded in 12.3ms"
+    assert (answered["level"], answered["request_id"], answered["intent"], answered["latency_ms"]) == (
+        "INFO", "req-1", "safety", 12.3)
+    assert "request_id" not in failed
+    assert "ValueError: bad upstream answer" in failed["exc"]
+
+
+def test_sampling_keeps_whole_requests_and_all_warnings(pipeline_logger):
+    """With sampling, a request keeps all of its info records or none; warnings are always written"""
+    stream = io.StringIO()
+    pipeline = LogPipeline(sample_rate=0.25, stream=stream)
+    pipeline.install(pipeline_logger)
+
+    def handle():
+        pipeline_logger.info("received")
+        pipeline_logger.info("answered")
+        pipeline_logger.warning("slow")
+
+    for i in range(400):
+        run_as_request(f"request-{i}", handle)
+    pipeline.close()
+
+    infos, warnings = {}, 0
+    for record in lines(stream):
+        if record["level"] == "INFO":
+            infos[record["request_id"]] = infos.get(record["request_id"], 0) + 1
+        else:
+            warnings += 1
+    assert warnings == 400
+    assert set(infos.values()) == {2}
+    assert 60 <= len(infos) <= 140
+    assert pipeline.stats()["sampled_out"] == 2 * (400 - len(infos))
+
+
+def test_stalled_output_drops_records_instead_of_blocking(pipeline_logger):
+    """With the writer stuck, logging calls stay fast and records past the queue size are counted as dropped"""
+    stream = BlockingStream()
+    pipeline = LogPipeline(queue_size=10, stream=stream)
+    pipeline.install(pipeline_logger)
+
+    start = time.perf_counter()
+    for i in range(100):
+        pipeline_logger.info("record %d", i)
+    elapsed = time.perf_counter() - start
+    dropped = pipeline.stats()["dropped"]
+
+    stream.released.set()
+    pipeline.close()
+    assert elapsed < 0.1
+    assert 80 <= dropped <= 90
+    assert len(lines(stream)) == 100 - dropped
+
+
+def test_request_id_header():
+    """A sane X-Request-ID is kept, anything else replaced by a generated id"""
+    with TestClient(app_module.app) as client:
+        kept = client.get("/health", headers={"X-Request-ID": "lb-7f3a.42"})
+        replaced = client.get("/health", headers={"X-Request-ID": "spaces are not allowed"})
+        generated = client.get("/health")
+        metrics = client.get("/metrics").text
+
+    assert kept.headers["x-request-id"] == "lb-7f3a.42"
+    assert len(replaced.headers["x-request-id"]) == 16
+    assert generated.headers["x-request-id"] != replaced.headers["x-request-id"]
+    assert 'log_records_dropped_total{reason="queue_full"}' in metrics
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
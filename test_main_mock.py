@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+import inspect
+import json
+import logging
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+import main
+from main_mock import LatencyProfile, PineconeAssistant, UpstreamError
+from sse import parse_events
+
+QUESTION = "What are the safety features?"
+
+
+def content_of(chunks) -> str:
+    return "".join(chunk.delta.content for chunk in chunks if hasattr(chunk, "delta"))
+
+
+def test_mirrors_the_real_interface():
+    """Every method app.py calls on the real assistant exists with the same parameters"""
+    for name in ("upload_file", "delete_file", "chat", "chat_with_history", "get_response_content",
+                 "detect_intent", "warm_up", "_enhance_user_message"):
+        real = list(inspect.signature(getattr(main.PineconeAssistant, name)).parameters)
+        mock = list(inspect.signature(getattr(PineconeAssistant, name)).parameters)
+        assert mock == real, name
+
+
+def test_stream_chunks_match_the_answer():
+    """Streams frame __slots__ content chunks between start and end chunks, without a [DONE] marker"""
+    assistant = PineconeAssistant(profile=LatencyProfile())
+    answer = assistant.get_response_content(assistant.chat(QUESTION))
+
+    chunks = list(assistant.chat(QUESTION, stream=True))
+    assert [chunks[0].type, chunks[-1].type] == ["message_start", "message_end"]
+    assert all(not hasattr(chunk, "__dict__") for chunk in chunks)
+    assert content_of(chunks) == answer
+    assert "[DONE]" not in answer
+    assert chunks[-1].usage["completion_tokens"] > 0
+
+    history = ["Hi", {"role": "assistant", "content": "Hello!"}, QUESTION]
+    assert assistant.get_response_content(assistant.chat_with_history(history)) == answer
+
+
+def test_question_text_only_logged_at_debug(caplog):
+    """Like the real assistant, info records carry the intent and sizes; the question itself is debug only"""
+    caplog.set_level(logging.DEBUG, logger="main_mock")
+    PineconeAssistant(profile=LatencyProfile()).chat(QUESTION)
+
+    sent = [record for record in caplog.records if record.name == "main_mock" and QUESTION[:20] in record.getMessage()]
+    assert [record.levelname for record in sent] == ["DEBUG"]
+    info = next(record for record in caplog.records if record.levelname == "INFO" and hasattr(record, "intent"))
+    assert (info.intent, info.prompt_chars) == ("safety", len(QUESTION))
+
+
+def test_time_to_first_token_and_token_rate():
+    """Streams wait ttft_ms before the first token and then pace tokens at tokens_per_s"""
+    assistant = PineconeAssistant(profile=LatencyProfile(ttft_ms=80, tokens_per_s=400))
+    start = time.perf_counter()
+    chunks = assistant.chat(QUESTION, stream=True)
+    next(chunks)
+    next(chunks)
+    first_token = time.perf_counter() - start
+    tokens = 1 + sum(1 for chunk in chunks if hasattr(chunk, "delta"))
+    total = time.perf_counter() - start
+
+    assert 0.08 <= first_token < 0.15
+    expected = 0.08 + (tokens - 1) / 400
+    assert expected <= total < expected + 0.1
+
+    start = time.perf_counter()
+    assistant.chat(QUESTION)
+    assert expected <= time.perf_counter() - start < expected + 0.1
+
+
+def test_seeded_latencies_are_reproducible():
+    """The same seed draws the same latencies and failures"""
+    profile = LatencyProfile(ttft_ms=100, ttft_sigma=0.5, tokens_per_s=50, tokens_sigma=0.3,
+                             error_rate=0.2, stream_error_rate=0.2, seed=42)
+    runs = [[assistant._plan() for _ in range(50)] for assistant in (
+        PineconeAssistant(profile=profile), PineconeAssistant(profile=profile)
+    )]
+    assert runs[0] == runs[1]
+    assert len({plan.ttft for plan in runs[0]}) > 1
+    assert {plan.failure for plan in runs[0]} >= {None, "error", "abort"}
+
+
+def test_error_and_timeout_injection():
+    """Injected errors fail before the first token, timeouts after timeout_seconds, aborts mid-stream"""
+    failing = PineconeAssistant(profile=LatencyProfile(error_rate=1.0))
+    with pytest.raises(UpstreamError):
+        failing.chat(QUESTION)
+    with pytest.raises(UpstreamError):
+        list(failing.chat(QUESTION, stream=True))
+
+    hanging = PineconeAssistant(profile=LatencyProfile(timeout_rate=1.0, timeout_seconds=0.05))
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        hanging.chat(QUESTION)
+    assert time.perf_counter() - start >= 0.05
+
+    aborting = PineconeAssistant(profile=LatencyProfile(stream_error_rate=1.0))
+    received = []
+    with pytest.raises(UpstreamError):
+        for chunk in aborting.chat(QUESTION, stream=True):
+            received.append(chunk)
+    assert any(hasattr(chunk, "delta") for chunk in received)
+
+
+def test_app_serves_the_simulated_upstream():
+    """The web tier answers and streams through the mock, and reports injected failures"""
+    with TestClient(app_module.app) as client:
+        app_module.set_assistant(PineconeAssistant(profile=LatencyProfile(ttft_ms=5, tokens_per_s=2000)))
+        app_module.response_cache.invalidate()
+        body = client.post("/chat", json={"message": "Tell me about the engine"}).json()
+        assert body["success"] and "Revotron" in body["response"]
+
+        events = parse_events(client.post("/chat/stream", json={"message": "How often should I service it?"}).text)
+        assert "service every 10,000 km" in "".join(data for event, _, data in events if event == "message")
+        assert events[-1][0] == "done" and json.loads(events[-1][2])["usage"]["completion_tokens"] > 0
+
+        app_module.set_assistant(PineconeAssistant(profile=LatencyProfile(error_rate=1.0)))
+        body = client.post("/chat", json={"message": "Any recalls for the sunroof?"}).json()
+        assert not body["success"] and "Simulated upstream error" in body["error"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from cache import ResponseCache
+from file_index import FileIndex
+from main_mock import LatencyProfile, PineconeAssistant
+from manifest import UploadManifest
+from metrics import MetricsRegistry
+
+
+def sample(text: str, name: str, **labels):
+    """Value of one sample in a Prometheus text exposition, or None if it's missing"""
+    label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = re.escape(name + (f"{{{label_text}}}" if labels else "")) + r" (\S+)"
+    match = re.search(r"^" + pattern + r"$", text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def increase(before: str, after: str, name: str, **labels) -> float:
+    """How much a sample grew between two scrapes"""
+    return sample(after, name, **labels) - (sample(before, name, **labels) or 0)
+
+
+def test_registry_renders_prometheus_text():
+    """Counters get a _total suffix, histograms cumulative buckets with +Inf, sum and count"""
+    registry = MetricsRegistry()
+    requests = registry.counter("requests", "Requests", ("route",))
+    in_flight = registry.gauge("in_flight", "In flight")
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    registry.collect("cache_entries", "Entries", "gauge", lambda: 7)
+
+    requests.labels('/a"b').inc()
+    requests.labels('/a"b').inc(2)
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert sample(text, "requests_total", route='/a\\"b') == 3
+    assert sample(text, "in_flight") == 1
+    assert [sample(text, "latency_seconds_bucket", le=le) for le in ("0.1", "1", "+Inf")] == [2, 3, 4]
+    assert sample(text, "latency_seconds_count") == 4
+    assert sample(text, "latency_seconds_sum") == pytest.approx(3.65)
+    assert sample(text, "cache_entries") == 7
+
+    with pytest.raises(ValueError):
+        registry.counter("requests", "Again")
+    with pytest.raises(ValueError):
+        requests.labels("/a", "extra")
+
+
+def test_metrics_endpoint_covers_requests_upstream_streams_and_cache():
+    """Routes are labelled by template; upstream calls, streams, uploads and cache lookups are recorded"""
+    with TestClient(app_module.app) as client:
+        app_module.set_assistant(PineconeAssistant(profile=LatencyProfile(ttft_ms=10, tokens_per_s=5000)))
+        app_module.response_cache = ResponseCache()
+        before = client.get("/metrics").text
+
+        for _ in range(2):
+            assert client.post("/chat", json={"message": "Tell me about the metrics engine"}).json()["success"]
+        client.post("/chat/stream", json={"message": "How often should metrics be serviced?"}).read()
+        client.get("/upload/not-a-job")
+        client.get("/no-such-page")
+
+        response = client.get("/metrics")
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+
+    def delta(name, **labels):
+        return increase(before, text, name, **labels)
+
+    assert delta("http_request_duration_seconds_count", method="POST", route="/chat", status="200") == 2
+    assert delta("http_request_duration_seconds_count", method="GET", route="/upload/{job_id}", status="404") == 1
+    assert delta("http_request_duration_seconds_count", method="GET", route="unmatched", status="404") == 1
+    assert delta("upstream_call_duration_seconds_count", call="chat") == 1
+    assert delta("upstream_call_duration_seconds_sum", call="chat") >= 0.01
+    assert delta("stream_time_to_first_chunk_seconds_count", source="upstream") == 1
+    assert delta("stream_chunks_sum", source="upstream") > 1
+    assert delta("response_cache_lookups_total", result="hit") == 1
+    assert delta("response_cache_lookups_total", result="miss") == 2
+    assert sample(text, "http_requests_in_flight") == 1
+
+
+def test_upload_bytes_and_ingestion_duration(monkeypatch, tmp_path):
+    """Uploaded bytes are counted and each ingestion's duration recorded"""
+    monkeypatch.setattr(app_module, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(app_module, "file_index", FileIndex(str(tmp_path)))
+    monkeypatch.setattr(app_module, "upload_manifest", UploadManifest(str(tmp_path / "manifest.json")))
+    with TestClient(app_module.app) as client:
+        app_module.set_assistant(PineconeAssistant(profile=LatencyProfile()))
+        before = client.get("/metrics").text
+        job_id = client.post("/upload", files={"file": ("metrics.txt", b"x" * 1000)}).json()["job_id"]
+        while client.get(f"/upload/{job_id}").json()["status"] != "completed":
+            pass
+        text = client.get("/metrics").text
+
+    assert increase(before, text, "upload_bytes_total") == 1000
+    assert increase(before, text, "ingestion_duration_seconds_count", status="completed") == 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+
+import asyncio
+import itertools
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from concurrency import UpstreamExecutor
+from chunks import MessageStartChunk
+from main_mock import LatencyProfile, PineconeAssistant
+from sse import parse_events
+from resilience import CircuitBreaker, CircuitOpen, HealthProbe, ResilientUpstream, UpstreamTimeout
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Flaky:
+    """Blocking upstream stand-in failing its first `failures` calls"""
+
+    def __init__(self, failures: int, error=ConnectionError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, value):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("upstream hiccup")
+        return value
+
+
+class Straggler:
+    """Answers in `fast` seconds, except every `every`-th call which takes `slow`"""
+
+    def __init__(self, fast: float, slow: float, every: int):
+        self.fast, self.slow, self.every = fast, slow, every
+        self._count = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            n = next(self._count)
+        time.sleep(self.slow if n % self.every == 0 else self.fast)
+        return n
+
+
+def p99(samples) -> float:
+    ordered = sorted(samples)
+    return ordered[int(len(ordered) * 0.99) - 1]
+
+
+def test_breaker_opens_half_opens_and_closes():
+    """Consecutive failures open the circuit; after the reset time one trial decides"""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=clock)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen) as raised:
+        breaker.before_call()
+    assert raised.value.retry_after == 10
+
+    clock.now = 10
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.opened == 1
+
+    clock.now = 20
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.stats()["rejected"] == 2
+
+
+def test_retries_only_idempotent_calls_and_upstream_errors():
+    """Upstream errors are retried within the budget; writes and caller errors are not"""
+    executor = UpstreamExecutor(4)
+
+    async def run():
+        resilient = ResilientUpstream(executor, CircuitBreaker(failure_threshold=10), retries=2, backoff=0.01)
+        flaky = Flaky(2)
+        assert await resilient.run(flaky, "answer") == "answer"
+        assert flaky.calls == 3 and resilient.retried == 2
+        assert resilient.breaker.failures == 0
+
+        write = Flaky(1)
+        with pytest.raises(ConnectionError):
+            await resilient.run(write, "upload", idempotent=False)
+        assert write.calls == 1
+
+        bad_request = Flaky(1, error=ValueError)
+        with pytest.raises(ValueError):
+            await resilient.run(bad_request, "question")
+        assert bad_request.calls == 1
+        assert resilient.breaker.failures == 1
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()
+
+
+def test_deadline_bounds_a_stalled_call():
+    """A call stuck upstream fails at its deadline, counts as a failure and opens the circuit"""
+    executor = UpstreamExecutor(4)
+
+    async def run():
+        resilient = ResilientUpstream(executor, CircuitBreaker(failure_threshold=1), timeout=0.1)
+        start = time.perf_counter()
+        with pytest.raises(UpstreamTimeout):
+            await resilient.run(time.sleep, 1.0)
+        assert time.perf_counter() - start < 0.3
+        with pytest.raises(CircuitOpen):
+            await resilient.run(time.sleep, 0)
+        assert resilient.stats()["timeouts"] == 1
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown(wait=False)
+
+
+def test_hedging_cuts_tail_latency_under_injected_slowness():
+    """One call in 25 stalls for 400 ms; hedging after the p95 latency removes that from the p99"""
+    executor = UpstreamExecutor(64)
+
+    async def measure(resilient) -> list:
+        upstream = Straggler(fast=0.01, slow=0.4, every=25)
+        for _ in range(40):
+            await resilient.run(upstream)
+        limit = asyncio.Semaphore(16)
+
+        async def one():
+            async with limit:
+                start = time.perf_counter()
+                await resilient.run(upstream)
+                return time.perf_counter() - start
+
+        return await asyncio.gather(*(one() for _ in range(200)))
+
+    try:
+        plain = asyncio.run(measure(ResilientUpstream(executor)))
+        hedging = ResilientUpstream(executor, hedge=True, hedge_max_ratio=0.2)
+        hedged = asyncio.run(measure(hedging))
+    finally:
+        executor.shutdown(wait=False)
+
+    assert p99(plain) >= 0.4
+    assert p99(hedged) < 0.2
+    assert 0 < hedging.hedge_wins <= hedging.hedged <= 0.2 * hedging.calls
+
+
+def test_stream_retried_until_its_first_chunk():
+    """A stream failing before its first chunk is retried; one failing later is not"""
+    executor = UpstreamExecutor(4)
+    attempts = []
+
+    def chunks(fail_first: bool, fail_midway: bool):
+        attempts.append(1)
+        if fail_first and len(attempts) == 1:
+            raise ConnectionError("refused")
+        yield "a"
+        if fail_midway:
+            raise ConnectionError("reset")
+        yield "b"
+
+    async def run():
+        resilient = ResilientUpstream(executor, retries=2, backoff=0.01)
+        assert [item async for item in resilient.iterate(executor, chunks, True, False)] == ["a", "b"]
+        assert len(attempts) == 2 and resilient.retried == 1
+
+        received = []
+        with pytest.raises(ConnectionError):
+            async for item in resilient.iterate(executor, chunks, False, True):
+                received.append(item)
+        assert received == ["a"] and len(attempts) == 3
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()
+
+
+def test_stream_deadline_and_retries_cover_the_first_content():
+    """A message_start chunk doesn't end the deadline or the retries; a stall after content is cut off"""
+    executor = UpstreamExecutor(4)
+    attempts = []
+
+    def chunks(fail_first: bool, stall: float):
+        attempts.append(1)
+        yield MessageStartChunk("m", "test")
+        if fail_first and len(attempts) == 1:
+            raise ConnectionError("reset before the first token")
+        time.sleep(stall)
+        yield "a"
+        time.sleep(stall)
+        yield "b"
+
+    async def run():
+        resilient = ResilientUpstream(executor, retries=2, backoff=0.01, stream_idle_timeout=0.2)
+        received = [item async for item in resilient.iterate(executor, chunks, True, 0)]
+        assert [getattr(item, "type", item) for item in received] == ["message_start", "a", "b"]
+        assert len(attempts) == 2 and resilient.retried == 1
+
+        start = time.perf_counter()
+        with pytest.raises(UpstreamTimeout):
+            async for _ in resilient.iterate(executor, chunks, False, 1.0, timeout=0.3):
+                pass
+        assert time.perf_counter() - start < 0.6
+
+        received = []
+        with pytest.raises(UpstreamTimeout):
+            async for item in resilient.iterate(executor, chunks, False, 0.5, timeout=1.0):
+                received.append(item)
+        assert [getattr(item, "type", item) for item in received] == ["message_start", "a"]
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()
+
+
+def test_health_probe_keeps_the_last_result():
+    """Failed and timed-out checks mark the upstream unhealthy; "nothing to check" keeps the old result"""
+    async def failing():
+        raise ConnectionError("no route to upstream")
+
+    async def nothing_yet():
+        return False
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def run():
+        probe = HealthProbe(nothing_yet)
+        await probe.probe()
+        assert probe.status()["ok"] is None
+
+        probe = HealthProbe(failing)
+        await probe.probe()
+        assert probe.status()["ok"] is False and "no route" in probe.status()["error"]
+
+        probe = HealthProbe(slow, timeout=0.05)
+        await probe.probe()
+        assert probe.status()["ok"] is False and "timed out" in probe.status()["error"]
+
+    asyncio.run(run())
+
+
+def test_failing_upstream_trips_the_circuit_and_health(monkeypatch):
+    """After repeated upstream errors /chat fails fast and /health reports degraded"""
+    monkeypatch.setattr(app_module, "resilient", ResilientUpstream(
+        app_module.upstream, CircuitBreaker(failure_threshold=3, reset_timeout=60), retries=0))
+    with TestClient(app_module.app) as client:
+        app_module.set_assistant(PineconeAssistant(profile=LatencyProfile(error_rate=1.0)))
+        app_module.response_cache.invalidate()
+        assert client.get("/health").json()["status"] == "healthy"
+
+        for i in range(3):
+            assert not client.post("/chat", json={"message": f"Is the breaker test {i} fine?"}).json()["success"]
+
+        health = client.get("/health").json()
+        assert health["status"] == "degraded"
+        assert health["upstream"]["circuit"] == "open"
+
+        answer = client.post("/chat", json={"message": "Is anyone there?"}).json()
+        assert "Upstream unavailable" in answer["error"]
+        assert client.get("/upstream/stats").json()["circuit"]["rejected"] == 1
+        assert "upstream_circuit_state{state=\"open\"} 1" in client.get("/metrics").text
+
+
+def test_chat_latency_bounded_when_upstream_stalls(monkeypatch):
+    """With a third of upstream calls hanging for 2 s, /chat gives up on them early and retries"""
+    monkeypatch.setattr(app_module, "resilient", ResilientUpstream(
+        app_module.upstream, CircuitBreaker(failure_threshold=100), timeout=1.5, attempt_timeout=0.3, retries=2,
+        backoff=0.01))
+    with TestClient(app_module.app) as client:
+        app_module.set_assistant(PineconeAssistant(
+            profile=LatencyProfile(ttft_ms=10, timeout_rate=0.3, timeout_seconds=2.0, seed=7)))
+        app_module.response_cache.invalidate()
+
+        latencies, answered = [], 0
+        for i in range(10):
+            start = time.perf_counter()
+            answered += client.post("/chat", json={"message": f"Stall test question {i}?"}).json()["success"]
+            latencies.append(time.perf_counter() - start)
+
+    assert max(latencies) < 1.2
+    assert answered >= 8
+
+
+def test_stream_latency_bounded_when_upstream_stalls(monkeypatch):
+    """/chat/stream gives up on a stalled upstream at the deadline, retries errors, and cuts off stalls midway"""
+    monkeypatch.setattr(app_module, "resilient", ResilientUpstream(
+        app_module.upstream, CircuitBreaker(failure_threshold=100), timeout=0.3, retries=2, backoff=0.01,
+        stream_idle_timeout=0.2))
+    with TestClient(app_module.app) as client:
+        app_module.response_cache.invalidate()
+        app_module.set_assistant(PineconeAssistant(profile=LatencyProfile(timeout_rate=1.0, timeout_seconds=3.0)))
+        start = time.perf_counter()
+        events = parse_events(client.post("/chat/stream", json={"message": "Stalled stream question?"}).text)
+        assert time.perf_counter() - start < 1.0
+        assert events[-1][0] == "error" and "within 0.3s" in events[-1][2]
+
+        app_module.set_assistant(PineconeAssistant(profile=LatencyProfile(error_rate=1.0)))
+        events = parse_events(client.post("/chat/stream", json={"message": "Failing stream question?"}).text)
+        assert events[-1][0] == "error" and app_module.resilient.retried == 2
+
+        app_module.set_assistant(PineconeAssistant(profile=LatencyProfile(tokens_per_s=2)))
+        start = time.perf_counter()
+        events = parse_events(client.post("/chat/stream", json={"message": "Slow stream question?"}).text)
+        assert time.perf_counter() - start < 1.5
+        assert [event for event, _, _ in events] == ["message", "error"]
+        assert "stalled" in events[-1][2]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
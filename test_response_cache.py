@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from cache import ResponseCache
+from file_index import FileIndex
+from manifest import UploadManifest
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingAssistant:
+    """Stand-in assistant that counts upstream calls"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def detect_intent(self, message):
+        return "safety" if "safety" in message.lower() else "general"
+
+    def _enhance_user_message(self, message):
+        return f"Question: {message}"
+
+    def chat(self, message, stream=False):
+        self.calls += 1
+        if stream:
+            return iter([type("Chunk", (), {"delta": type("Delta", (), {"content": text})()})()
+                         for text in ["Five ", "star ", "rating."]])
+        return {"message": {"content": "Five star rating."}}
+
+    def get_response_content(self, response):
+        return response["message"]["content"]
+
+
+def test_key_normalization():
+    """Case, whitespace and trailing punctuation don't split cache entries"""
+    cache = ResponseCache()
+    assert cache.make_key("  What are the SAFETY   features? ", "safety") == \
+        cache.make_key("what are the safety features", "safety")
+    assert cache.make_key("safety features", "safety") != cache.make_key("safety features", "general")
+
+
+def test_lru_and_ttl():
+    """Entries are evicted least-recently-used first and expire after the TTL"""
+    clock = FakeClock()
+    cache = ResponseCache(max_entries=2, ttl=10, clock=clock)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"
+    cache.set("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+
+    clock.now = 11
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["expirations"] == 1
+    assert stats["hits"] == 2
+
+
+def test_invalidation_drops_in_flight_answers():
+    """An answer computed before an invalidation is not stored afterwards"""
+    cache = ResponseCache()
+    generation = cache.generation
+    cache.invalidate()
+    cache.set("a", "A", generation)
+    assert cache.get("a") is None
+
+
+def test_chat_and_stream_use_cache(monkeypatch, tmp_path):
+    """Repeated questions skip the upstream, including over /chat/stream"""
+    # The deleted document lives in a temporary upload directory, not the real one
+    upload_dir = str(tmp_path / "uploads")
+    os.makedirs(upload_dir)
+    monkeypatch.setattr(app_module, "UPLOAD_DIR", upload_dir)
+    monkeypatch.setattr(app_module, "DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(app_module, "file_index", FileIndex(upload_dir))
+    monkeypatch.setattr(app_module, "upload_manifest", UploadManifest(str(tmp_path / "data" / "upload_manifest.json")))
+    with TestClient(app_module.app) as client:
+        fake = CountingAssistant()
+        app_module.set_assistant(fake)
+        app_module.response_cache.invalidate()
+
+        first = client.post("/chat", json={"message": "Safety features?"}).json()
+        second = client.post("/chat", json={"message": "safety features"}).json()
+        assert first["cached"] is False
+        assert second["cached"] is True
+        assert second["response"] == "Five star rating."
+        assert fake.calls == 1
+
+        stream = client.post("/chat/stream", json={"message": "SAFETY FEATURES"})
+        assert fake.calls == 1
+        assert "rating." in stream.text
+
+        # Deleting a document invalidates every cached answer
+        with open(os.path.join(app_module.UPLOAD_DIR, "cache-test.txt"), "w") as f:
+            f.write("manual")
+        assert client.delete("/files/cache-test.txt").json()["success"]
+        client.post("/chat", json={"message": "Safety features?"})
+        assert fake.calls == 2
+        assert client.get("/cache/stats").json()["hits"] >= 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+from sessions import SESSION_OVERHEAD, SessionStore, turn_bytes
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class HistoryAssistant:
+    """Stand-in assistant that records the history it was sent"""
+
+    def __init__(self):
+        self.sent = []
+
+    def chat_with_history(self, messages, stream=False):
+        self.sent.append(messages)
+        return {"content": f"Answer {len(self.sent)}"}
+
+    def get_response_content(self, response):
+        return response["content"]
+
+
+def test_turns_share_interned_roles():
+    """Role tags are one shared string, not one copy per turn"""
+    store = SessionStore()
+    session = store.create()
+    store.append(session, "user", "How often should I service my Nexon?")
+    store.append(session, "assistant", "Every 10,000 km or 12 months.")
+    other = store.create()
+    store.append(other, "user", "Tyre pressure?")
+    assert session.turns[0].role is other.turns[0].role
+    assert not hasattr(session.turns[0], "__dict__")
+    assert store.bytes == 2 * SESSION_OVERHEAD + sum(turn_bytes(t.content) for s in (session, other) for t in s.turns)
+
+
+def test_idle_sessions_expire_and_budget_evicts_least_recent():
+    """Idle sessions time out; over budget, the least recently active go first"""
+    clock = FakeClock()
+    store = SessionStore(max_bytes=2 * SESSION_OVERHEAD + 3 * turn_bytes("x" * 100), idle_ttl=60, clock=clock)
+
+    first, second = store.create(), store.create()
+    store.append(first, "user", "x" * 100)
+    clock.now = 1
+    store.append(second, "user", "x" * 100)
+    clock.now = 2
+    assert store.get(first.id) is first
+
+    # Pushes the store over budget: second is now the least recently active
+    store.append(first, "assistant", "x" * 100)
+    store.append(first, "user", "x" * 100)
+    assert store.get(second.id) is None
+    assert store.get(first.id) is first
+    assert store.evictions == 1
+
+    clock.now = 100
+    assert store.get(first.id) is None
+    assert store.expirations == 1
+    assert store.bytes == 0
+
+
+def test_empty_sessions_count_against_the_budget():
+    """Creating sessions without ever using them can't grow the store past its budget"""
+    store = SessionStore(max_bytes=100 * SESSION_OVERHEAD)
+    for _ in range(10000):
+        store.create()
+    assert len(store) == 100
+    assert store.bytes == 100 * SESSION_OVERHEAD <= store.max_bytes
+    assert store.evictions == 9900
+
+
+def test_session_endpoint_sends_whole_conversation():
+    """Each turn sends only the new message; the assistant sees both sides of the conversation"""
+    with TestClient(app_module.app) as client:
+        fake = HistoryAssistant()
+        app_module.set_assistant(fake)
+
+        session_id = client.post("/sessions").json()["session_id"]
+        first = client.post(f"/sessions/{session_id}/messages", json={"message": "Hello"}).json()
+        assert first["success"] and first["turns"] == 2
+
+        second = client.post(f"/sessions/{session_id}/messages", json={"message": "Airbags?"}).json()
+        assert second["response"] == "Answer 2"
+        assert fake.sent[-1] == [
+            {"role": "user", "content": "Hello"},
+            {"role": "assistant", "content": "Answer 1"},
+            {"role": "user", "content": "Airbags?"},
+        ]
+
+        assert len(client.get(f"/sessions/{session_id}").json()["turns"]) == 4
+        assert client.delete(f"/sessions/{session_id}").json()["success"]
+        assert client.post(f"/sessions/{session_id}/messages", json={"message": "Hi"}).status_code == 404
+
+
+if __name__ == "__main__":
+    test_turns_share_interned_roles()
+    test_idle_sessions_expire_and_budget_evicts_least_recent()
+    test_empty_sessions_count_against_the_budget()
+    test_session_endpoint_sends_whole_conversation()
+    print("✅ Session tests passed")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from main_mock import LatencyProfile, PineconeAssistant
+from sse import EventStream, StreamEnd, parse_events
+
+
+async def paced(pieces, gap: float = 0.0):
+    """Yield pieces (text or StreamEnd) with a pause before each one"""
+    for piece in pieces:
+        await asyncio.sleep(gap)
+        if isinstance(piece, Exception):
+            raise piece
+        yield piece
+
+
+def encode(pieces, gap: float = 0.0, **kwargs):
+    """Run an EventStream to the end; returns the stream and its parsed events"""
+    async def run():
+        stream = EventStream(paced(pieces, gap), **kwargs)
+        return stream, "".join([frame async for frame in stream])
+
+    stream, body = asyncio.run(run())
+    assert stream.bytes == len(body)
+    return stream, parse_events(body)
+
+
+def test_first_delta_is_immediate_and_the_rest_coalesced():
+    """Deltas arriving within the window share a frame; ids increase and the done event counts both"""
+    pieces = ["Hello", " wor", "ld", ", how", " are", " you?", StreamEnd({"total_tokens": 6}, "stop")]
+    stream, events = encode(pieces, gap=0.001, flush_interval=1.0)
+
+    assert [event for event, _, _ in events] == ["message", "message", "done"]
+    assert events[0][2] == "Hello"
+    assert events[1][2] == " world, how are you?"
+    assert [event_id for _, event_id, _ in events] == ["1", "2", "3"]
+
+    done = json.loads(events[-1][2])
+    assert done["usage"] == {"total_tokens": 6}
+    assert done["finish_reason"] == "stop"
+    assert (done["chunks"], done["frames"]) == (6, 3)
+    assert (stream.chunks, stream.frames) == (6, 3)
+
+
+def test_byte_threshold_and_zero_window():
+    """flush_bytes sends a frame before the window closes; a zero window sends every delta"""
+    _, events = encode(["a", "bb", "cc", "dd", "ee"], flush_interval=10.0, flush_bytes=4)
+    assert [data for event, _, data in events if event == "message"] == ["a", "bbcc", "ddee"]
+
+    _, events = encode(["a", "b", "c"], flush_interval=0)
+    assert [data for event, _, data in events if event == "message"] == ["a", "b", "c"]
+
+
+def test_window_flushes_during_a_stall():
+    """Buffered text goes out when the window closes, not only when the next delta arrives"""
+    async def stalling():
+        yield "first"
+        await asyncio.sleep(0.005)
+        yield " second"
+        await asyncio.sleep(0.3)
+        yield " third"
+
+    async def run():
+        arrivals = []
+        start = asyncio.get_running_loop().time()
+        async for frame in EventStream(stalling(), flush_interval=0.02):
+            arrivals.append((asyncio.get_running_loop().time() - start, parse_events(frame)[0]))
+        return arrivals
+
+    arrivals = asyncio.run(run())
+    messages = [(at, data) for at, (event, _, data) in arrivals if event == "message"]
+    assert [data for _, data in messages] == ["first", " second", " third"]
+    assert messages[1][0] < 0.2
+
+
+def test_text_round_trips_through_the_framing():
+    """Line breaks of any kind and leading spaces survive one data line per line of text"""
+    text = " leading space\nsecond line\r\nthird\rfourth\n\nafter a blank line"
+    _, events = encode([text], flush_interval=0)
+    assert events[0] == ("message", "1", text.replace("\r\n", "\n").replace("\r", "\n"))
+
+
+def test_upstream_failure_ends_with_an_error_event():
+    """Text buffered before the failure is sent, then an error event instead of done"""
+    _, events = encode(["partial", " answer", RuntimeError("upstream went away")], flush_interval=10.0)
+    assert [event for event, _, _ in events] == ["message", "message", "error"]
+    assert events[1][2] == " answer"
+    assert json.loads(events[2][2]) == {"error": "upstream went away"}
+
+
+def test_chat_stream_endpoint_speaks_event_stream():
+    """/chat/stream is a text/event-stream with coalesced frames and the upstream usage in done"""
+    with TestClient(app_module.app) as client:
+        app_module.set_assistant(PineconeAssistant(profile=LatencyProfile(ttft_ms=5, tokens_per_s=2000)))
+        app_module.response_cache.invalidate()
+        response = client.post("/chat/stream", json={"message": "How is the event stream framed?"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    events = parse_events(response.text)
+    done = json.loads(events[-1][2])
+    assert events[-1][0] == "done"
+    assert done["usage"]["completion_tokens"] > 0
+    assert done["frames"] == len(events) < done["chunks"]
+    assert done["cached"] is False
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
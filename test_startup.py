@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+import build_static
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_heavy_dependencies_are_deferred():
+    """Importing the app doesn't load Jinja2, aiofiles, the assistant backends, the Pinecone SDK or NumPy"""
+    deferred = ["jinja2", "aiofiles", "main", "main_mock", "local_rag", "pinecone", "numpy"]
+    probe = f"import sys, app; print(','.join(m for m in {deferred!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
+
+
+def test_dotenv_settings_reach_the_app_config(tmp_path):
+    """Settings in .env are loaded before app.py reads its configuration"""
+    env_file = tmp_path / ".env"
+    env_file.write_text("UPSTREAM_WORKERS=3\nASSISTANT_BACKEND=local\nDATA_DIR=dotenv-data\n")
+    # The probe points load_dotenv at the temporary .env instead of the repo's
+    probe = (
+        "import dotenv; load = dotenv.load_dotenv; "
+        f"dotenv.load_dotenv = lambda *args, **kwargs: load({str(env_file)!r}, **kwargs); "
+        "import app; print(app.upstream.max_workers, app.ASSISTANT_BACKEND, app.DATA_DIR)"
+    )
+    env = {k: v for k, v in os.environ.items() if k not in ("UPSTREAM_WORKERS", "ASSISTANT_BACKEND", "DATA_DIR")}
+    out = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, env=env, capture_output=True, text=True,
+                         check=True)
+    assert out.stdout.split() == ["3", "local", "dotenv-data"]
+
+
+def test_index_served_prerendered_or_rendered(monkeypatch):
+    """GET / serves build/index.html when it exists and renders the template otherwise"""
+    with open(os.path.join(ROOT, "templates", "index.html"), "rb") as f:
+        template = f.read()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.setattr(app_module, "BUILD_DIR", tmp)
+        app_module._static_assets.cache_clear()
+        app_module._prerendered_index.cache_clear()
+        with TestClient(app_module.app) as client:
+            rendered = client.get("/")
+            assert rendered.status_code == 200
+            assert rendered.content == template
+
+            monkeypatch.setattr(build_static, "BUILD_DIR", tmp)
+            page = os.path.join(tmp, "index.html")
+            assert build_static.render_pages() == [page]
+            with open(page, "rb") as f:
+                assert f.read() == template
+
+            with open(page, "wb") as f:
+                f.write(b"<p>prebuilt</p>")
+            app_module._prerendered_index.cache_clear()
+            prerendered = client.get("/")
+            assert prerendered.status_code == 200
+            assert prerendered.content == b"<p>prebuilt</p>"
+    app_module._static_assets.cache_clear()
+    app_module._prerendered_index.cache_clear()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import gzip
+import os
+import re
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+import build_static
+from static_assets import accepted_encodings
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def built(monkeypatch):
+    """A full build_static.py build in a temporary BUILD_DIR, served by the app"""
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.setattr(app_module, "BUILD_DIR", tmp)
+        monkeypatch.setattr(build_static, "BUILD_DIR", tmp)
+        assets = build_static.build_assets()
+        build_static.write_manifest(assets, build_static.render_pages(assets))
+        app_module._static_assets.cache_clear()
+        app_module._prerendered_index.cache_clear()
+        with TestClient(app_module.app) as client:
+            yield client, tmp, assets
+    app_module._static_assets.cache_clear()
+    app_module._prerendered_index.cache_clear()
+
+
+def test_accept_encoding_negotiation():
+    """q=0 refuses a coding and * accepts both precompressed ones"""
+    assert accepted_encodings("gzip, deflate, br") == {"gzip", "deflate", "br"}
+    assert accepted_encodings("br;q=0, gzip;q=0.5") == {"gzip"}
+    assert accepted_encodings("*;q=0.1, identity") == {"br", "gzip", "identity"}
+    assert accepted_encodings("") == set()
+
+
+def test_index_links_fingerprinted_precompressed_assets(built):
+    """The built page points at /assets/ copies, each served compressed with an immutable Cache-Control"""
+    client, tmp, assets = built
+    with open(os.path.join(tmp, "index.html"), "rb") as f:
+        html = f.read()
+    urls = re.findall(r'"(/assets/[^"]+)"', html.decode())
+    assert sorted(urls) == sorted("/assets/" + name for name in assets.values())
+    assert b'"/static/' not in html
+
+    page = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert page.status_code == 200
+    assert page.headers["content-encoding"] == "gzip"
+    assert page.headers["cache-control"] == "no-cache"
+    assert page.headers["vary"] == "Accept-Encoding"
+    assert page.content == html
+
+    for source, fingerprinted in assets.items():
+        with open(os.path.join(ROOT, "static", source), "rb") as f:
+            original = f.read()
+        response = client.get("/assets/" + fingerprinted, headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+        assert response.headers["content-encoding"] == "gzip"
+        assert int(response.headers["content-length"]) < len(original)
+        assert response.content == original
+
+        plain = client.get("/assets/" + fingerprinted, headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in plain.headers and plain.content == original
+
+    assert client.get("/assets/css/style.0000000000000000.css").status_code == 404
+
+
+def test_brotli_preferred_when_built(built):
+    """With the brotli package at build time, clients accepting br get the brotli variant"""
+    pytest.importorskip("brotli")
+    client, _, assets = built
+    response = client.get("/assets/" + assets["js/app.js"], headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert client.get("/", headers={"Accept-Encoding": "br;q=0, gzip"}).headers["content-encoding"] == "gzip"
+
+
+def test_etag_revalidation_returns_304(built):
+    """A matching If-None-Match gets an empty 304, whichever coding the client held"""
+    client, _, assets = built
+    url = "/assets/" + assets["css/style.css"]
+    first = client.get(url, headers={"Accept-Encoding": "gzip"})
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert first.headers["etag"] != plain.headers["etag"]
+
+    for etag in (first.headers["etag"], plain.headers["etag"], "W/" + first.headers["etag"]):
+        again = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.content == b""
+        assert again.headers["etag"] == first.headers["etag"]
+
+    page = client.get("/")
+    assert client.get("/", headers={"If-None-Match": page.headers["etag"]}).status_code == 304
+    assert client.get("/", headers={"If-None-Match": '"something-else"'}).status_code == 200
+
+
+def test_page_edited_after_build_ignores_stale_variants(built):
+    """Precompressed copies of a page changed since the build aren't served"""
+    client, tmp, _ = built
+    page = os.path.join(tmp, "index.html")
+    with open(page + ".gz", "rb") as f:
+        assert gzip.decompress(f.read()) != b"<p>hotfix</p>"
+    with open(page, "wb") as f:
+        f.write(b"<p>hotfix</p>")
+    app_module._prerendered_index.cache_clear()
+
+    response = client.get("/", headers={"Accept-Encoding": "gzip, br"})
+    assert "content-encoding" not in response.headers
+    assert response.content == b"<p>hotfix</p>"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import logging
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app as app_module
+from main_mock import LatencyProfile, PineconeAssistant
+from tracing import ProfileStore, Trace, TracingMiddleware, current_trace, span
+
+
+def timings(header: str) -> dict:
+    """Server-Timing header as {phase: milliseconds}"""
+    return {name: float(dur[len("dur="):]) for name, dur in (part.split(";") for part in header.split(", "))}
+
+
+def test_spans_accumulate_only_inside_a_trace():
+    """Outside a request span() is a shared no-op; inside, repeated phases add up"""
+    assert current_trace() is None
+    assert span("a") is span("b")
+
+    trace = Trace()
+    trace.add("upstream", 0.010)
+    trace.add("upstream", 0.005)
+    phases = timings(trace.server_timing())
+    assert phases["upstream"] == 15.0
+    assert list(phases) == ["upstream", "total"]
+
+
+def test_chat_phases_in_server_timing_and_log(caplog):
+    """/chat reports its phases in Server-Timing; streamed phases only reach the log"""
+    with TestClient(app_module.app) as client:
+        app_module.set_assistant(PineconeAssistant(profile=LatencyProfile(ttft_ms=20, tokens_per_s=2000)))
+        app_module.response_cache.invalidate()
+
+        response = client.post("/chat", json={"message": "What does the tracing engine weigh?"})
+        phases = timings(response.headers["server-timing"])
+        assert {"cache", "enhance", "upstream", "assistant_call", "total"} <= set(phases)
+        assert 20 <= phases["assistant_call"] <= phases["upstream"] <= phases["total"]
+
+        with caplog.at_level(logging.INFO, logger="tracing"):
+            response = client.post("/chat/stream", json={"message": "Which tracing features are standard?"})
+            response.read()
+        assert "cache" in timings(response.headers["server-timing"])
+        record = next(record for record in caplog.records
+                      if record.getMessage().startswith("POST /chat/stream 200"))
+        assert {"first_chunk", "stream", "serialize"} <= set(record.phases_ms)
+        assert record.latency_ms >= record.phases_ms["stream"]
+        assert record.response_bytes > 0
+
+
+def make_profiled_app(profiles: ProfileStore):
+    app = FastAPI()
+
+    @app.get("/work")
+    def work():
+        with span("busy"):
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+        return {"ok": True}
+
+    app.add_middleware(TracingMiddleware, admin_token="secret", profiles=profiles, sample_interval=0.002)
+    return app
+
+
+def busy_loop_in(profile) -> bool:
+    return any("work (test_tracing.py" in stack for stack in profile.stacks)
+
+
+def test_profiles_need_the_admin_token():
+    """Only requests with X-Profile and the right token are profiled; the stacks show the request's code"""
+    profiles = ProfileStore(max_profiles=1)
+    with TestClient(make_profiled_app(profiles)) as client:
+        assert "x-profile-id" not in client.get("/work", headers={"X-Profile": "1"}).headers
+        assert "x-profile-id" not in client.get(
+            "/work", headers={"X-Profile": "1", "X-Admin-Token": "wrong"}).headers
+
+        response = client.get("/work", headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+        assert "busy;dur=" in response.headers["server-timing"]
+        profile = profiles.get(response.headers["x-profile-id"])
+
+    assert profile.samples >= 5 and busy_loop_in(profile)
+    assert profile.folded().startswith("# GET /work: ")
+
+
+def test_profile_download(monkeypatch):
+    """GET /debug/profiles/{id} serves the folded stacks to admins only"""
+    profiler = app_module.profiles.start("GET /test")
+    profile = app_module.profiles.finish(profiler)
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+
+    with TestClient(app_module.app) as client:
+        url = f"/debug/profiles/{profile.id}"
+        assert client.get(url).status_code == 403
+        assert client.get(url, headers={"X-Admin-Token": "wrong"}).status_code == 403
+        assert client.get("/debug/profiles/missing", headers={"X-Admin-Token": "secret"}).status_code == 404
+
+        response = client.get(url, headers={"X-Admin-Token": "secret"})
+        assert response.status_code == 200
+        assert "attachment" in response.headers["content-disposition"]
+        assert response.text.startswith("# GET /test: ")
+
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "")
+    with TestClient(app_module.app) as client:
+        assert client.get(url, headers={"X-Admin-Token": ""}).status_code == 403
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
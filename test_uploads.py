@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from benchmarks.harness import free_port
+from file_index import FileIndex
+from manifest import UploadManifest
+from uploads import IngestionJobs
+
+# Size of the file used by the memory test (override with UPLOAD_TEST_MB)
+LARGE_UPLOAD_MB = int(os.getenv("UPLOAD_TEST_MB", "300"))
+
+
+class RecordingAssistant:
+    """Stand-in assistant that records uploaded and deleted files"""
+
+    def __init__(self):
+        self.uploaded = []
+        self.deleted = []
+
+    def upload_file(self, file_path, timeout=None):
+        self.uploaded.append(file_path)
+        return {"id": f"remote-{len(self.uploaded)}"}
+
+    def delete_file(self, file_id):
+        self.deleted.append(file_id)
+
+
+@pytest.fixture(autouse=True)
+def isolated_uploads(monkeypatch, tmp_path):
+    """Keep the tests' files and content hashes out of the real upload directory and manifest"""
+    upload_dir = str(tmp_path / "uploads")
+    monkeypatch.setattr(app_module, "UPLOAD_DIR", upload_dir)
+    monkeypatch.setattr(app_module, "DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(app_module, "file_index", FileIndex(upload_dir))
+    monkeypatch.setattr(app_module, "upload_manifest", UploadManifest(str(tmp_path / "data" / "upload_manifest.json")))
+
+
+def wait_for_job(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f"/upload/{job_id}").json()
+        if status["status"] in ("completed", "failed"):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"Upload job {job_id} did not finish")
+
+
+def test_upload_returns_job_and_ingests_in_background():
+    """POST /upload answers with a job id; GET /upload/{job_id} reports the outcome"""
+    with TestClient(app_module.app) as client:
+        fake = RecordingAssistant()
+        app_module.set_assistant(fake)
+
+        resp = client.post("/upload", files={"file": ("job-test.txt", b"owner's manual" * 1000)})
+        body = resp.json()
+        assert body["success"] and body["job_id"]
+
+        status = wait_for_job(client, body["job_id"])
+        assert status["status"] == "completed"
+        assert status["size"] == 14000
+        assert fake.uploaded == [os.path.join(app_module.UPLOAD_DIR, "job-test.txt")]
+
+        assert client.get("/upload/unknown").status_code == 404
+        client.delete("/files/job-test.txt")
+
+
+def test_duplicate_content_is_uploaded_once():
+    """Re-uploading identical content under another name skips the assistant; deletes are ref-counted"""
+    with TestClient(app_module.app) as client:
+        fake = RecordingAssistant()
+        app_module.set_assistant(fake)
+        content = b"%PDF-1.4 identical manual" * 100
+
+        first = client.post("/upload", files={"file": ("manual-a.pdf", content)}).json()
+        assert wait_for_job(client, first["job_id"])["deduplicated"] is False
+
+        second = client.post("/upload", files={"file": ("manual-b.pdf", content)}).json()
+        status = wait_for_job(client, second["job_id"])
+        assert status["status"] == "completed"
+        assert status["deduplicated"] is True
+        assert second["message"] == "Identical file already processed"
+        assert len(fake.uploaded) == 1
+
+        client.delete("/files/manual-a.pdf")
+        assert fake.deleted == []
+        client.delete("/files/manual-b.pdf")
+        assert fake.deleted == ["remote-1"]
+
+
+class SlowRecordingAssistant(RecordingAssistant):
+    """Records the most uploads that were in flight at once"""
+
+    def __init__(self, latency=0.1):
+        super().__init__()
+        self.latency = latency
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def upload_file(self, file_path, timeout=None):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        return super().upload_file(file_path, timeout)
+
+
+def test_batch_upload_respects_concurrency_limit(monkeypatch):
+    """POST /upload/batch ingests files in parallel, never more than the limit at once"""
+    monkeypatch.setattr(app_module, "ingestion_jobs", IngestionJobs(max_concurrent=2))
+    with TestClient(app_module.app) as client:
+        fake = SlowRecordingAssistant()
+        app_module.set_assistant(fake)
+        names = [f"batch-{i}.txt" for i in range(6)]
+        files = [("files", (name, f"manual part {name}".encode() * 100)) for name in names]
+        files.append(("files", ("batch-0.txt", b"same name again")))
+
+        body = client.post("/upload/batch", files=files).json()
+        assert body["success"] and body["batch_id"]
+        assert [f["status"] for f in body["files"]][-1] == "rejected"
+
+        deadline = time.monotonic() + 30
+        while not (status := client.get(f"/upload/batch/{body['batch_id']}").json())["finished"]:
+            assert time.monotonic() < deadline, "batch did not finish"
+            time.sleep(0.05)
+
+        assert status["completed"] == 6 and status["rejected"] == 1 and status["total"] == 7
+        assert status["files_per_s"] > 0 and status["mb_per_s"] > 0
+        assert len(fake.uploaded) == 6
+        assert fake.peak_in_flight == 2
+        assert client.get("/upload/batch/unknown").status_code == 404
+
+        for name in names:
+            client.delete(f"/files/{name}")
+
+
+def test_batch_upload_file_limit(monkeypatch):
+    """Batches with more files than MAX_BATCH_FILES are rejected with 413"""
+    monkeypatch.setattr(app_module, "MAX_BATCH_FILES", 2)
+    with TestClient(app_module.app) as client:
+        app_module.set_assistant(RecordingAssistant())
+        files = [("files", (f"limit-{i}.txt", b"x")) for i in range(3)]
+        assert client.post("/upload/batch", files=files).status_code == 413
+
+
+def test_upload_size_limit(monkeypatch):
+    """Oversized uploads are rejected with 413 and leave nothing behind"""
+    monkeypatch.setattr(app_module, "MAX_UPLOAD_BYTES", 1024)
+    with TestClient(app_module.app) as client:
+        app_module.set_assistant(RecordingAssistant())
+        resp = client.post("/upload", files={"file": ("too-big.txt", b"x" * 4096)})
+        assert resp.status_code == 413
+        assert not os.path.exists(os.path.join(app_module.UPLOAD_DIR, "too-big.txt"))
+        assert not os.path.exists(os.path.join(app_module.UPLOAD_DIR, "too-big.txt.part"))
+
+
+def test_reserved_names_are_rejected():
+    """Dotfiles and names of partial or temporary files can't be uploaded or deleted"""
+    with TestClient(app_module.app) as client:
+        fake = RecordingAssistant()
+        app_module.set_assistant(fake)
+        for name in (".manifest.json", "manual.pdf.part", "state.tmp"):
+            assert client.post("/upload", files={"file": (name, b"{}")}).status_code == 400
+            assert client.delete(f"/files/{name}").status_code == 400
+
+        body = client.post("/upload/batch", files=[("files", (".hidden", b"x"))]).json()
+        assert not body["success"]
+        assert body["files"][0]["error"] == "Reserved file name"
+        assert fake.uploaded == []
+
+
+def test_unreadable_manifest_is_moved_aside(tmp_path):
+    """A truncated manifest doesn't stop the app from starting; it is kept next to a fresh one"""
+    path = tmp_path / "upload_manifest.json"
+    path.write_text("{bad")
+    manifest = UploadManifest(str(path))
+    assert manifest.lookup("anything") is None
+    assert not path.exists()
+    assert [p.read_text() for p in tmp_path.glob("upload_manifest.json.corrupt-*")] == ["{bad"]
+
+    manifest.set_uploaded("digest", "remote-1", 10)
+    assert UploadManifest(str(path)).lookup("digest") == {"remote_id": "remote-1", "size": 10}
+
+
+def test_manifest_kept_outside_upload_dir():
+    """The manifest lives in DATA_DIR; one left in the upload directory by older versions is moved there"""
+    os.makedirs(app_module.UPLOAD_DIR)
+    with open(os.path.join(app_module.UPLOAD_DIR, ".manifest.json"), "w") as f:
+        f.write('{"content": {"d": {"remote_id": "r", "size": 1}}, "files": {"a.txt": "d"}}')
+
+    path = app_module._manifest_path()
+    assert path == os.path.join(app_module.DATA_DIR, "upload_manifest.json")
+    assert os.listdir(app_module.UPLOAD_DIR) == []
+    assert UploadManifest(path).digest_of("a.txt") == "d"
+
+
+def peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("VmHWM not available")
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="needs /proc to read peak RSS")
+def test_large_upload_keeps_peak_rss_flat(tmp_path):
+    """Peak server RSS barely moves between a 1 MB and a multi-hundred-MB upload"""
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, "UPLOAD_DIR": str(tmp_path / "uploads"), "DATA_DIR": str(tmp_path / "data")}
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                httpx.get(f"{base_url}/health")
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+
+        with tempfile.TemporaryDirectory() as tmp, httpx.Client(base_url=base_url, timeout=600) as client:
+            def upload(name, size_mb):
+                path = os.path.join(tmp, name)
+                with open(path, "wb") as f:
+                    f.truncate(size_mb * 1024 * 1024)
+                with open(path, "rb") as f:
+                    body = client.post("/upload", files={"file": (name, f)}).json()
+                os.remove(path)
+                assert body["success"], body
+                assert wait_for_job(client, body["job_id"], timeout=120)["status"] == "completed"
+                client.delete(f"/files/{name}")
+                return peak_rss_mb(server.pid)
+
+            baseline = upload("rss-small.bin", 1)
+            after_large = upload("rss-large.bin", LARGE_UPLOAD_MB)
+
+        print(f"Peak RSS: {baseline:.1f} MB after 1 MB upload, {after_large:.1f} MB after {LARGE_UPLOAD_MB} MB upload")
+        assert after_large - baseline < 64
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
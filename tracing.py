@@ -0,0 +1,294 @@
+import collections
+import contextvars
+import hmac
+import logging
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Default interval between stack samples of the per-request profiler
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# Default number of finished profiles kept for download
+DEFAULT_MAX_PROFILES = 20
+
+# Longest a single profile may run, so a stuck stream can't sample forever
+DEFAULT_MAX_PROFILE_SECONDS = 60.0
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    __slots__ = ("start", "spans")
+
+    def __init__(self):
+        """Time spent per phase of one request, in seconds"""
+        self.start = time.perf_counter()
+        self.spans = {}
+
+    def add(self, name: str, seconds: float):
+        """Add time to a phase; phases entered several times accumulate"""
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        """Server-Timing header value with every phase so far and the total"""
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans.items()]
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+
+class _Span:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, time.perf_counter() - self.start)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def current_trace():
+    """Trace of the request being handled, or None outside a traced request"""
+    return _current.get()
+
+
+def span(name: str):
+    """
+    Context manager timing a phase of the current request
+
+    Worker threads started through UpstreamExecutor copy the request's context,
+    so spans inside assistant calls are added to the same trace. Outside a
+    traced request this returns a shared no-op, costing one context lookup.
+
+    Args:
+        name (str): Phase name, shown in the Server-Timing header
+    """
+    trace = _current.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name)
+
+
+class Profile:
+    __slots__ = ("id", "label", "stacks", "samples", "duration")
+
+    def __init__(self, profile_id: str, label: str, stacks: dict, samples: int, duration: float):
+        self.id = profile_id
+        self.label = label
+        self.stacks = stacks
+        self.samples = samples
+        self.duration = duration
+
+    def folded(self) -> str:
+        """Stacks in the collapsed format read by flamegraph.pl and speedscope"""
+        header = f"# {self.label}: {self.samples} samples over {self.duration:.3f}s\n"
+        lines = [f"{stack} {count}" for stack, count in
+                 sorted(self.stacks.items(), key=lambda item: item[1], reverse=True)]
+        return header + "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    def __init__(self, profile_id: str, label: str, interval: float = DEFAULT_SAMPLE_INTERVAL,
+                 max_seconds: float = DEFAULT_MAX_PROFILE_SECONDS):
+        """
+        Samples the stacks of all threads from a background thread
+
+        A request runs on the event loop thread and on upstream worker threads,
+        so every thread is sampled (and labelled with its name); samples of
+        other requests served at the same time end up in the profile too.
+
+        Args:
+            profile_id (str): Id the profile is stored under
+            label (str): Description, e.g. the request line
+            interval (float): Seconds between samples
+            max_seconds (float): Sampling stops after this long
+        """
+        self.id = profile_id
+        self.label = label
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self._stacks = collections.Counter()
+        self._samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{profile_id}", daemon=True)
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> Profile:
+        self._stop.set()
+        self._thread.join()
+        return Profile(self.id, self.label, dict(self._stacks), self._samples, time.perf_counter() - self._start)
+
+    def _run(self):
+        own = threading.get_ident()
+        deadline = self._start + self.max_seconds
+        while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self._stacks[";".join(reversed(stack))] += 1
+            self._samples += 1
+
+
+class ProfileStore:
+    def __init__(self, max_profiles: int = DEFAULT_MAX_PROFILES):
+        """
+        Finished profiles, the oldest dropped beyond max_profiles
+
+        Only one profile runs at a time: the profiler samples every thread, so
+        overlapping profiles would each pay for and contain the other.
+        """
+        self.max_profiles = max_profiles
+        self._profiles = OrderedDict()
+        self._running = threading.Lock()
+
+    def start(self, label: str, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        """
+        Start profiling
+
+        Returns:
+            SamplingProfiler or None: None if another profile is running
+        """
+        if not self._running.acquire(blocking=False):
+            return None
+        profiler = SamplingProfiler(uuid.uuid4().hex, label, interval)
+        profiler.start()
+        return profiler
+
+    def finish(self, profiler: SamplingProfiler) -> Profile:
+        """Stop a profiler and keep its profile for download"""
+        try:
+            profile = profiler.stop()
+        finally:
+            self._running.release()
+        self._profiles[profile.id] = profile
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+        return profile
+
+    def get(self, profile_id: str):
+        return self._profiles.get(profile_id)
+
+
+def token_matches(expected: str, given: str) -> bool:
+    """Constant-time comparison of an admin token; an unset token never matches"""
+    return bool(expected) and hmac.compare_digest(expected.encode(), (given or "").encode())
+
+
+class TracingMiddleware:
+    def __init__(self, app, enabled: bool = True, admin_token: str = "", profiles: ProfileStore = None,
+                 sample_interval: float = DEFAULT_SAMPLE_INTERVAL):
+        """
+        ASGI middleware collecting per-request phase timings
+
+        Every request gets a Trace that span() adds to. The phases finished
+        when the response starts are sent in a Server-Timing header; for
+        streamed responses the phases of the body only appear in the log
+        line written when the request ends.
+
+        A request with an ``X-Profile`` header and an ``X-Admin-Token`` header
+        matching admin_token is also profiled; the response carries an
+        ``X-Profile-Id`` under which ``profiles`` keeps the result.
+
+        Args:
+            app: ASGI application
+            enabled (bool): Collect timings (False makes the middleware a pass-through)
+            admin_token (str): Token required to request a profile (empty disables profiling)
+            profiles (ProfileStore): Where finished profiles are kept
+            sample_interval (float): Seconds between profiler samples
+        """
+        self.app = app
+        self.enabled = enabled
+        self.admin_token = admin_token
+        self.profiles = profiles if profiles is not None else ProfileStore()
+        self.sample_interval = sample_interval
+
+    def _wants_profile(self, scope) -> bool:
+        if not self.admin_token:
+            return False
+        headers = dict(scope["headers"])
+        return b"x-profile" in headers and token_matches(
+            self.admin_token, headers.get(b"x-admin-token", b"").decode("latin-1")
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        request_line = f"{scope['method']} {scope['path']}"
+        profiler = None
+        if self._wants_profile(scope):
+            profiler = self.profiles.start(request_line, self.sample_interval)
+            if profiler is None:
+                logger.warning("Profile of %s skipped, another profile is running", request_line)
+
+        trace = Trace()
+        token = _current.set(trace)
+        status = 500
+        sent = 0
+
+        async def send_with_timing(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode()))
+                if profiler is not None:
+                    headers.append((b"x-profile-id", profiler.id.encode()))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if profiler is not None:
+                self.profiles.finish(profiler)
+            if logger.isEnabledFor(logging.INFO):
+                latency_ms = round(trace.elapsed() * 1000, 1)
+                logger.info("%s %d total=%.1fms", request_line, status, latency_ms, extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "latency_ms": latency_ms,
+                    "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in trace.spans.items()},
+                    "response_bytes": sent,
+                })
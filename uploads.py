@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+# Bytes read from the request and written to disk per step
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Largest accepted upload
+DEFAULT_MAX_UPLOAD_MB = 512
+
+# Finished jobs kept around for status queries
+DEFAULT_MAX_FINISHED_JOBS = 1000
+
+# Jobs uploading to the assistant at the same time
+DEFAULT_INGEST_CONCURRENCY = 8
+
+# Most files accepted in one batch upload
+DEFAULT_MAX_BATCH_FILES = 100
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size limit"""
+
+
+async def save_upload(upload, file_path: str, max_bytes: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> tuple:
+    """
+    Stream an uploaded file to disk in fixed-size chunks, hashing it on the way
+
+    The data goes to a temporary ``.part`` file that is renamed into place once
+    complete, so a failed or oversized upload never replaces an existing file.
+
+    Args:
+        upload: FastAPI UploadFile
+        file_path (str): Destination path
+        max_bytes (int): Size limit; exceeding it raises UploadTooLarge
+        chunk_size (int): Bytes per read/write
+
+    Returns:
+        tuple: (number of bytes written, SHA-256 hex digest of the content)
+    """
+    # Imported on first upload rather than at startup
+    import aiofiles
+
+    part_path = f"{file_path}.part"
+    written = 0
+    digest = hashlib.sha256()
+    try:
+        async with aiofiles.open(part_path, "wb") as f:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+                digest.update(chunk)
+                await f.write(chunk)
+        os.replace(part_path, file_path)
+        return written, digest.hexdigest()
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+
+class IngestionJob:
+    __slots__ = ("id", "filename", "size", "status", "error", "deduplicated",
+                 "created_at", "started_at", "finished_at")
+
+    def __init__(self, filename: str, size: int):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.size = size
+        self.status = "queued"
+        self.error = None
+        self.deduplicated = False
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self) -> dict:
+        now = time.time()
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "size": self.size,
+            "status": self.status,
+            "error": self.error,
+            "deduplicated": self.deduplicated,
+            "queued_seconds": round((self.started_at or now) - self.created_at, 3),
+            "ingest_seconds": round((self.finished_at or now) - self.started_at, 3) if self.started_at else None,
+        }
+
+
+class IngestionBatch:
+    __slots__ = ("id", "jobs", "rejected", "created_at")
+
+    def __init__(self, jobs: list, rejected: list):
+        """
+        Files uploaded together in one request
+
+        Args:
+            jobs (list): IngestionJob per accepted file
+            rejected (list): {"filename", "error"} per file that was not accepted
+        """
+        self.id = uuid.uuid4().hex
+        self.jobs = jobs
+        self.rejected = rejected
+        self.created_at = time.time()
+
+    @property
+    def finished(self) -> bool:
+        return all(job.finished for job in self.jobs)
+
+    def to_dict(self) -> dict:
+        counts = {"queued": 0, "ingesting": 0, "completed": 0, "failed": 0}
+        for job in self.jobs:
+            counts[job.status] += 1
+
+        completed = [job for job in self.jobs if job.status == "completed"]
+        end = max((job.finished_at for job in self.jobs if job.finished_at), default=None)
+        if not self.finished or end is None:
+            end = time.time()
+        elapsed = end - self.created_at
+        completed_mb = sum(job.size for job in completed) / (1024 * 1024)
+
+        return {
+            "batch_id": self.id,
+            "finished": self.finished,
+            "total": len(self.jobs) + len(self.rejected),
+            **counts,
+            "rejected": len(self.rejected),
+            "elapsed_seconds": round(elapsed, 3),
+            "files_per_s": round(len(completed) / elapsed, 2) if elapsed > 0 else 0.0,
+            "mb_per_s": round(completed_mb / elapsed, 2) if elapsed > 0 else 0.0,
+            "files": [job.to_dict() for job in self.jobs] + [
+                {"filename": item["filename"], "status": "rejected", "error": item["error"]}
+                for item in self.rejected
+            ],
+        }
+
+
+class IngestionJobs:
+    def __init__(self, max_finished: int = DEFAULT_MAX_FINISHED_JOBS,
+                 max_concurrent: int = DEFAULT_INGEST_CONCURRENCY):
+        """
+        Registry of background ingestion jobs
+
+        Args:
+            max_finished (int): Finished jobs kept for status queries; older ones are dropped
+            max_concurrent (int): Jobs ingesting at the same time; the rest stay queued
+        """
+        self.max_finished = max_finished
+        self.max_concurrent = max_concurrent
+        self._jobs = OrderedDict()
+        self._batches = OrderedDict()
+        self._tasks = set()
+        self._limit = None
+        self._limit_loop = None
+
+    def create(self, filename: str, size: int) -> IngestionJob:
+        """Register a new queued job"""
+        job = IngestionJob(filename, size)
+        self._jobs[job.id] = job
+        self._prune()
+        return job
+
+    def get(self, job_id: str):
+        """Job by id, or None if unknown or already dropped"""
+        return self._jobs.get(job_id)
+
+    def create_batch(self, jobs: list, rejected: list = None) -> IngestionBatch:
+        """Group jobs created for one batch upload"""
+        batch = IngestionBatch(jobs, rejected or [])
+        self._batches[batch.id] = batch
+        self._prune()
+        return batch
+
+    def get_batch(self, batch_id: str):
+        """Batch by id, or None if unknown or already dropped"""
+        return self._batches.get(batch_id)
+
+    def _concurrency_limit(self) -> asyncio.Semaphore:
+        # Semaphores belong to one event loop; make a fresh one if the loop changed
+        loop = asyncio.get_running_loop()
+        if self._limit is None or self._limit_loop is not loop:
+            self._limit = asyncio.Semaphore(self.max_concurrent)
+            self._limit_loop = loop
+        return self._limit
+
+    def start(self, job: IngestionJob, ingest):
+        """
+        Run a job in the background
+
+        Args:
+            job (IngestionJob): Job from create()
+            ingest: Coroutine function doing the ingestion; called without arguments
+        """
+        task = asyncio.create_task(self._run(job, ingest))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, job: IngestionJob, ingest):
+        async with self._concurrency_limit():
+            job.status = "ingesting"
+            job.started_at = time.time()
+            try:
+                await ingest()
+                job.status = "completed"
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+        self._prune()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+        finished = [batch_id for batch_id, batch in self._batches.items() if batch.finished]
+        for batch_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._batches[batch_id]